@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+DOCX run scanning benchmark
+Builds a large synthetic .docx and compares the old string-search image check
+(serializing each run's XML) with the lxml element lookup used by DocxTranslator.
+
+Usage: python benchmark_docx_run_scan.py [paragraphs] [runs_per_paragraph]
+"""
+
+import sys
+import time
+from io import BytesIO
+
+import docx
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+
+from collabtrans.ir.document import Document
+from collabtrans.translator.ai_translator.docx_translator import DocxTranslator, DocxTranslatorConfig, is_image_run, \
+    run_text
+
+
+def is_image_run_by_xml(run) -> bool:
+    """Previous implementation, kept here for comparison"""
+    return '<w:drawing' in run.element.xml or '<w:pict' in run.element.xml
+
+
+def build_docx(paragraphs: int, runs_per_paragraph: int) -> bytes:
+    doc = docx.Document()
+    for i in range(paragraphs):
+        para = doc.add_paragraph()
+        for j in range(runs_per_paragraph):
+            run = para.add_run(f"Paragraph {i} run {j}\twith some sample text.\n")
+            run.bold = j % 2 == 0
+        if i % 50 == 0:
+            # A VML picture run stands in for an image without needing real image data
+            para._p.append(parse_xml(f'<w:r {nsdecls("w")}><w:pict/></w:r>'))
+    table = doc.add_table(rows=50, cols=4)
+    for row in table.rows:
+        for cell in row.cells:
+            cell.text = "Cell text"
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def time_scan(doc, check) -> tuple[float, int]:
+    start = time.perf_counter()
+    images = sum(1 for para in doc.paragraphs for run in para.runs if check(run))
+    return time.perf_counter() - start, images
+
+
+def main():
+    paragraphs = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    runs_per_paragraph = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    content = build_docx(paragraphs, runs_per_paragraph)
+    print(f"Synthetic docx: {paragraphs} paragraphs x {runs_per_paragraph} runs, {len(content) / 1024:.0f} KB")
+
+    doc = docx.Document(BytesIO(content))
+    old_time, old_images = time_scan(doc, is_image_run_by_xml)
+    new_time, new_images = time_scan(doc, is_image_run)
+    assert old_images == new_images, "image run detection mismatch"
+    print(f"Image check   xml string search: {old_time:.3f}s, element lookup: {new_time:.3f}s "
+          f"({old_time / new_time:.1f}x), image runs: {new_images}")
+
+    runs = [run for para in doc.paragraphs for run in para.runs]
+    start = time.perf_counter()
+    old_texts = [run.text for run in runs]
+    old_time = time.perf_counter() - start
+    start = time.perf_counter()
+    new_texts = [run_text(run) for run in runs]
+    new_time = time.perf_counter() - start
+    assert old_texts == new_texts, "run text mismatch"
+    print(f"Run text      Run.text: {old_time:.3f}s, child lookup: {new_time:.3f}s ({old_time / new_time:.1f}x)")
+
+    translator = DocxTranslator(DocxTranslatorConfig(skip_translate=True))
+    start = time.perf_counter()
+    _, elements, _ = translator._pre_translate(Document.from_bytes(content, ".docx", "benchmark"))
+    print(f"_pre_translate: {time.perf_counter() - start:.3f}s, {len(elements)} text blocks")
+
+
+if __name__ == '__main__':
+    main()
@@ -38,6 +38,7 @@ class SegmentsTranslateAgent(Agent):
 - The format of the translated segments should be as close as possible to the source format.
 - For personal names and proper nouns, use the most commonly used words for translation. 
 - For special tags or other non-translatable elements (like codes, brand names, specific jargon), keep them in their original form.
+- Inline placeholders such as <g1>...</g1> or <g2/> mark formatted text. Keep every placeholder exactly once, translate the text inside it, and move placeholders only when the word order of the target language requires it.
 - If a segment is already in the target language({config.to_lang}), keep it as is.
 - Do not merge multiple segment translations into one translation.
 - (very important) All keys that appear in the input JSON must exist in the output JSON.
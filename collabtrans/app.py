@@ -3,8 +3,13 @@
 import asyncio
 import base64
 import binascii
+import hashlib
 import logging
+import mimetypes
+import multiprocessing
 import os
+import posixpath
+import re
 import shutil
 import socket
 import tempfile
@@ -12,13 +17,15 @@ import time
 import uuid
 from contextlib import asynccontextmanager, closing
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Literal, Union, Annotated, TYPE_CHECKING, Type
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Literal, Union, Annotated, TYPE_CHECKING, Type, Callable, BinaryIO
+from urllib.parse import quote
 
 import httpx
 import uvicorn
-from fastapi import FastAPI, HTTPException, APIRouter, Body, Path as FastApiPath, Request
+from fastapi import FastAPI, HTTPException, APIRouter, Body, Path as FastApiPath, Query, Request
 from fastapi.openapi.docs import get_swagger_ui_html, get_swagger_ui_oauth2_redirect_html, get_redoc_html
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field, field_validator, model_validator, AliasChoices
 
@@ -30,16 +37,19 @@ import collabtrans.logger.logger  # noqa: F401
 logger = logging.getLogger(__name__)
 from collabtrans.agents.agent import ThinkingMode
 from collabtrans.agents.glossary_agent import GlossaryAgentConfig
+from collabtrans.config.global_config import get_global_config
 from collabtrans.exporter.md.types import ConvertEngineType
 # --- 核心代码 Imports ---
 from collabtrans.global_values.conditional_import import DOCLING_EXIST
+from collabtrans.utils.process_pool import configure_process_pool, shutdown_process_pool
 from collabtrans.workflow.base import Workflow
 from collabtrans.workflow.docx_workflow import DocxWorkflow, DocxWorkflowConfig
 from collabtrans.workflow.epub_workflow import EpubWorkflow, EpubWorkflowConfig
 # --- HTML WORKFLOW IMPORT START ---
 from collabtrans.workflow.html_workflow import HtmlWorkflow, HtmlWorkflowConfig
+from collabtrans.workflow.html_site_workflow import HtmlSiteWorkflow, HtmlSiteWorkflowConfig
 # --- HTML WORKFLOW IMPORT END ---
-from collabtrans.workflow.interfaces import DocxExportable, EpubExportable
+from collabtrans.workflow.interfaces import DocxExportable, EpubExportable, PagedHTMLExportable, HtmlZipExportable
 from collabtrans.workflow.interfaces import HTMLExportable, MDFormatsExportable, TXTExportable, JsonExportable, \
     XlsxExportable, SrtExportable, CsvExportable
 from collabtrans.workflow.json_workflow import JsonWorkflow, JsonWorkflowConfig
@@ -49,7 +59,8 @@ from collabtrans.workflow.txt_workflow import TXTWorkflow, TXTWorkflowConfig
 from collabtrans.workflow.xlsx_workflow import XlsxWorkflow, XlsxWorkflowConfig
 
 if DOCLING_EXIST or TYPE_CHECKING:
-    from collabtrans.converter.x2md.converter_docling import ConverterDoclingConfig
+    from collabtrans.converter.x2md.converter_docling import ConverterDoclingConfig, docling_converter_pool, \
+        preload_docling_converters, shutdown_page_executor
 from collabtrans.converter.x2md.converter_mineru import ConverterMineruConfig
 from collabtrans.exporter.md.md2html_exporter import MD2HTMLExporterConfig
 from collabtrans.exporter.txt.txt2html_exporter import TXT2HTMLExporterConfig
@@ -77,9 +88,10 @@ from collabtrans.exporter.docx.docx2html_exporter import Docx2HTMLExporterConfig
 from collabtrans.translator.ai_translator.srt_translator import SrtTranslatorConfig
 from collabtrans.exporter.srt.srt2html_exporter import Srt2HTMLExporterConfig
 from collabtrans.translator.ai_translator.epub_translator import EpubTranslatorConfig
-from collabtrans.exporter.epub.epub2html_exporter import Epub2HTMLExporterConfig
+from collabtrans.exporter.epub.epub2html_exporter import Epub2HTMLExporterConfig, PAGED_CONTENT_SECURITY_POLICY
 # --- HTML TRANSLATOR IMPORT START ---
 from collabtrans.translator.ai_translator.html_translator import HtmlTranslatorConfig
+from collabtrans.translator.ai_translator.html_site_translator import HtmlSiteTranslatorConfig
 # --- HTML TRANSLATOR IMPORT END ---
 # ------------------------------------
 
@@ -104,11 +116,14 @@ WORKFLOW_DICT: Dict[str, Type[Workflow]] = {
     "srt": SrtWorkflow,
     "epub": EpubWorkflow,
     "html": HtmlWorkflow,
+    "html_site": HtmlSiteWorkflow,
 }
 
 # --- 媒体类型映射 ---
 MEDIA_TYPES = {
     "html": "text/html; charset=utf-8",
+    "html_paged": "text/html; charset=utf-8",
+    "html_zip": "application/zip",
     "markdown": "text/markdown; charset=utf-8",
     "markdown_zip": "application/zip",
     "txt": "text/plain; charset=utf-8",
@@ -120,6 +135,11 @@ MEDIA_TYPES = {
     "epub": "application/epub+zip",
 }
 
+# 由上传文件生成、在浏览器中直接打开的内容禁止按内容嗅探类型
+_UNTRUSTED_CONTENT_HEADERS = {"X-Content-Type-Options": "nosniff"}
+# 分章节HTML的资源中可以在浏览器中直接打开的类型
+_INLINE_RESOURCE_PREFIXES = ("image/", "text/css", "font/", "audio/", "video/")
+
 
 # --- 辅助函数 ---
 def _create_default_task_state() -> Dict[str, Any]:
@@ -132,11 +152,154 @@ def _create_default_task_state() -> Dict[str, Any]:
         "task_end_time": 0, "current_task_ref": None,
         "original_filename": None,
         "temp_dir": None,  # 用于存储临时文件的目录
-        "downloadable_files": {},  # 存储可下载文件的路径和名称
+        "downloadable_files": {},  # 存储可下载文件的名称，文件在首次下载时生成
+        "exports": None,  # TaskExports实例，按需生成并缓存导出文件
         "attachment_files": {},  # 存储附件文件的路径和标识符
+        "partial_file": None,  # 翻译过程中可下载的部分译文 {"path", "filename", "media_type"}
+        "languages": [],  # 多目标语言任务的语言列表，第一个语言的结果保存在 exports 中
+        "language_exports": {},  # 其余语言 -> TaskExports实例
     }
 
 
+CDN_CHECK_URL = "https://s4.zstatic.net/ajax/libs/KaTeX/0.16.9/contrib/auto-render.min.js"
+CDN_CHECK_TTL = 300
+_cdn_check_cache: Dict[str, Any] = {"time": 0.0, "available": True}
+
+
+async def _is_cdn_available() -> bool:
+    """检查CDN可用性，结果缓存一段时间，避免每次导出都发起请求"""
+    if time.time() - _cdn_check_cache["time"] < CDN_CHECK_TTL:
+        return _cdn_check_cache["available"]
+    try:
+        await httpx_client.head(CDN_CHECK_URL, timeout=3)
+        available = True
+    except (httpx.TimeoutException, httpx.RequestError):
+        available = False
+    _cdn_check_cache.update(time=time.time(), available=available)
+    return available
+
+
+def _write_bytes(path: str, content: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# 后台任务的强引用：事件循环只弱引用任务，未被引用的任务可能在运行中被回收
+_background_tasks: "set[asyncio.Task]" = set()
+
+
+def _run_in_background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+@dataclass
+class ExportSpec:
+    export_func: Callable[[Any], Union[str, bytes]]  # 接收导出配置（可为None）
+    filename: str
+    is_string_output: bool
+    config_factory: Optional[Callable[[bool], Any]] = None  # 根据CDN可用性构造导出配置
+    write_func: Optional[Callable[[BinaryIO, Any], None]] = None  # 流式写出到文件（接收输出流与导出配置），优先于export_func
+
+
+class TaskExports:
+    """
+    任务的导出文件管理：文件在首次请求时生成，按(格式, 导出配置)缓存在任务临时目录中，
+    同一文件的并发请求只生成一次。
+    """
+
+    def __init__(self, workflow: Workflow, temp_dir: str, specs: Dict[str, ExportSpec], task_logger: logging.Logger):
+        self.workflow = workflow
+        self.temp_dir = temp_dir
+        self.specs = specs
+        self.logger = task_logger
+        self._generated: Dict[tuple, str] = {}
+        self._pending: Dict[tuple, asyncio.Task] = {}
+
+    async def get_path(self, file_type: str) -> str:
+        spec = self.specs[file_type]
+        config = spec.config_factory(await _is_cdn_available()) if spec.config_factory else None
+        key = (file_type, repr(config))
+        path = self._generated.get(key)
+        if path and os.path.exists(path):
+            return path
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.create_task(self._generate(file_type, spec, config, key))
+            self._pending[key] = task
+        # shield：某个下载请求断开时不取消其他请求共享的生成任务
+        return await asyncio.shield(task)
+
+    async def _generate(self, file_type: str, spec: ExportSpec, config: Any, key: tuple) -> str:
+        key_hash = hashlib.md5(repr(key).encode()).hexdigest()[:8]
+        path = os.path.join(self.temp_dir, f"{file_type}_{key_hash}", spec.filename)
+
+        def run():
+            if spec.write_func is not None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    spec.write_func(f, config)
+                return
+            content = spec.export_func(config)
+            _write_bytes(path, content.encode('utf-8') if spec.is_string_output else content)
+
+        try:
+            await asyncio.to_thread(run)
+            self._generated[key] = path
+            self.logger.info(f"成功生成 {file_type} 文件")
+            return path
+        except Exception as export_error:
+            self.logger.error(f"生成 {file_type} 文件时出错: {export_error}", exc_info=True)
+            raise
+        finally:
+            self._pending.pop(key, None)
+
+    async def get_chapter_path(self, file_type: str, index: int) -> str:
+        """分章节导出的章节片段，首次请求时生成并缓存。序号超出范围时抛出 IndexError"""
+        config = self.specs[file_type].config_factory(await _is_cdn_available())
+        key = (file_type, repr(config), index)
+        path = self._generated.get(key)
+        if path and os.path.exists(path):
+            return path
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.create_task(self._generate_chapter(config, key, index))
+            self._pending[key] = task
+        return await asyncio.shield(task)
+
+    async def _generate_chapter(self, config: Any, key: tuple, index: int) -> str:
+        key_hash = hashlib.md5(repr(key[:2]).encode()).hexdigest()[:8]
+        path = os.path.join(self.temp_dir, f"{key[0]}_{key_hash}_chapters", f"{index}.html")
+
+        def run():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                with open(path, "wb") as f:
+                    self.workflow.write_html_chapter(index, f, config)
+            except BaseException:
+                os.unlink(path)
+                raise
+
+        try:
+            await asyncio.to_thread(run)
+            self._generated[key] = path
+            return path
+        finally:
+            self._pending.pop(key, None)
+
+    async def pregenerate(self):
+        """并行预生成所有格式"""
+        await asyncio.gather(*(self.get_path(file_type) for file_type in self.specs), return_exceptions=True)
+
+
 # --- 日志处理器 ---
 class QueueAndHistoryHandler(logging.Handler):
     def __init__(self, queue_ref: asyncio.Queue, history_list_ref: List[str], max_history_items: int, task_id: str):
@@ -177,6 +340,19 @@ async def lifespan(app: FastAPI):
     global_logger.propagate = False
     global_logger.setLevel(logging.INFO)
     print("应用启动完成，多任务状态已初始化。")
+    translator_settings = get_global_config().translator_settings
+    configure_process_pool(translator_settings.process_pool_workers)
+    if DOCLING_EXIST:
+        docling_converter_pool.max_idle = translator_settings.docling_pool_size
+        if translator_settings.docling_preload:
+            # 后台预加载docling模型，不阻塞服务启动
+            print("正在后台预加载docling模型。")
+            app.state.docling_preload_task = asyncio.create_task(asyncio.to_thread(
+                preload_docling_converters,
+                code_ocr=translator_settings.code_ocr,
+                formula_ocr=translator_settings.formula_ocr,
+                num_threads=translator_settings.docling_num_threads or None,
+            ))
 
     # 认证模块已在应用启动时初始化
     print(f"服务接口文档: http://127.0.0.1:{app.state.port_to_use}/docs")
@@ -192,6 +368,9 @@ async def lifespan(app: FastAPI):
             except Exception as e:
                 print(f"清理任务 '{task_id}' 的临时目录 '{temp_dir}' 时出错: {e}")
     await httpx_client.aclose()
+    shutdown_process_pool()
+    if DOCLING_EXIST:
+        shutdown_page_executor()
     print("应用关闭，资源已清理。")
 
 
@@ -299,10 +478,19 @@ class BaseWorkflowParams(BaseModel):
                                     description="要使用的LLM模型ID。当 `skip_translate` 为 `False` 时必填。",
                                     examples=["gpt-4o"])
     to_lang: str = Field(default="中文", description="目标翻译语言。", examples=["简体中文", "English"])
+    to_langs: Optional[List[str]] = Field(
+        None,
+        description="多个目标翻译语言，设置时忽略 `to_lang`。一个任务翻译为所有语言：文档解析只进行一次，"
+                    "各语言的翻译同时进行并平分 `concurrent` 并发数。第一个语言的结果通过常规下载链接获取，"
+                    "其余语言的下载链接见任务状态中的 `languages`。",
+        examples=[["简体中文", "English", "日本語"]]
+    )
     chunk_size: int = Field(default=default_params["chunk_size"], description="文本分割的块大小（字符）。")
     concurrent: int = Field(default=default_params["concurrent"], description="并发请求数。")
     temperature: float = Field(default=default_params["temperature"], description="LLM温度参数。")
     timeout: int = Field(default=default_params["timeout"], description="等待API回复的时间（秒）。")
+    pregenerate_exports: bool = Field(default=False,
+                                      description="翻译完成后是否在后台并行生成所有格式的结果文件。默认在首次下载时生成。")
     thinking: ThinkingMode = Field(default=default_params["thinking"], description="Agent的思考模式。",
                                    examples=["default", "enable", "disable"])
     retry: int = Field(default=default_params["retry"], description="某个分块翻译失败后的最大重试次数。")
@@ -339,6 +527,11 @@ class MarkdownWorkflowParams(BaseWorkflowParams):
     code_ocr: bool = Field(True, description="是否对代码块进行OCR识别。仅 `docling` 引擎有效。")
     model_version: Literal["pipeline", "vlm"] = Field("vlm",
                                                       description="Mineru模型的版本，'vlm'是更新的版本。仅 `mineru` 引擎有效。")
+    stream_translate: bool = Field(False,
+                                   description="是否边解析边翻译。解析引擎分段产出结果时（如 `docling` 分页并行解析）可缩短总耗时。")
+    html_static_assets: bool = Field(False,
+                                     description="导出HTML时以 `/static` 链接引用本地样式与脚本而非内联，减小文件体积并可被浏览器缓存。"
+                                                 "导出的文件需通过本服务访问才能正常显示。")
 
     @field_validator('mineru_token')
     def check_mineru_token(cls, v, values):
@@ -356,6 +549,18 @@ class TextWorkflowParams(BaseWorkflowParams):
         "\n",
         description="当 insert_mode 为 'append' 或 'prepend' 时，用于分隔原文和译文的分隔符。"
     )
+    window_size: Optional[int] = Field(
+        None,
+        description="流式模式下每个窗口的目标大小（与 chunk_size 单位相同）。设置后逐行读取文件，连续的非空行合并为段落片段，"
+                    "按窗口翻译并依次写出，适用于超大的文本文件；翻译过程中可通过 /service/partial/{task_id} 下载已完成的部分。"
+                    "不设置时整文件逐行翻译。",
+        gt=0
+    )
+    segment_size: Optional[int] = Field(
+        None,
+        description="流式模式下单个段落片段的最大字符数，超过时在行边界处拆分。不设置时使用默认值 1000。",
+        gt=0
+    )
 
 
 class JsonWorkflowParams(BaseWorkflowParams):
@@ -365,6 +570,12 @@ class JsonWorkflowParams(BaseWorkflowParams):
         description="一个jsonpath-ng表达式列表，用于指定需要翻译的JSON字段。",
         examples=[["$.product.name", "$.product.description", "$.features[*]"]]
     )
+    stream_window: Optional[int] = Field(
+        None,
+        description="流式模式下每个窗口的记录数。设置后，顶层为数组的JSON逐条解析记录并按窗口翻译，适用于大型的记录列表；"
+                    "jsonpath在每个窗口的记录列表上匹配，应使用 `$[*].name`、`$..name` 等不依赖数组下标的写法。",
+        gt=0
+    )
 
 
 class XlsxWorkflowParams(BaseWorkflowParams):
@@ -381,6 +592,21 @@ class XlsxWorkflowParams(BaseWorkflowParams):
         None,
         description="指定翻译区域列表。示例: ['Sheet1!A1:B10', 'C:D', 'E5']。如果不指定表名 (如 'C:D')，则应用于所有表。如果为 None，则翻译整个文件中的所有文本。"
     )
+    engine: Literal["auto", "openpyxl", "streaming"] = Field(
+        "auto",
+        description="XLSX解析引擎。'streaming' 流式扫描工作表并只重写修改过的部件，内存占用低，适合超大文件；"
+                    "'auto' 根据工作表大小自动选择。"
+    )
+    translate_shared_strings: bool = Field(
+        False,
+        description="按共享字符串表条目翻译，重复出现的文本只翻译一次。区域外也引用了该文本的单元格保持原文。"
+                    "启用后总是使用 'streaming' 引擎。"
+    )
+    csv_engine: Literal["native", "xlsx"] = Field(
+        "native",
+        description="CSV文件的翻译方式。'native' 流式逐行翻译并对重复的单元格值去重，translate_regions 只按列生效；"
+                    "'xlsx' 先转换为XLSX再翻译。"
+    )
 
 
 class DocxWorkflowParams(BaseWorkflowParams):
@@ -393,6 +619,11 @@ class DocxWorkflowParams(BaseWorkflowParams):
         "\n",
         description="当 insert_mode 为 'append' 或 'prepend' 时，用于分隔原文和译文的分隔符。"
     )
+    engine: Literal["auto", "python-docx", "streaming"] = Field(
+        "auto",
+        description="DOCX解析引擎。'streaming' 流式处理正文、页眉页脚与脚注，内存占用低，适合超大文件；"
+                    "'auto' 根据正文大小自动选择。"
+    )
 
 
 class SrtWorkflowParams(BaseWorkflowParams):
@@ -405,6 +636,12 @@ class SrtWorkflowParams(BaseWorkflowParams):
         "\n",
         description="当 insert_mode 为 'append' 或 'prepend' 时，用于分隔原文和译文的分隔符。"
     )
+    window_size: Optional[int] = Field(
+        None,
+        description="窗口模式下每个上下文窗口的目标大小（与 chunk_size 单位相同）。设置后连续的字幕被打包为窗口翻译，"
+                    "窗口完成后即写出，翻译过程中可通过 /service/partial/{task_id} 下载已完成的部分；不设置时整文件翻译。",
+        gt=0
+    )
 
 
 class EpubWorkflowParams(BaseWorkflowParams):
@@ -417,6 +654,11 @@ class EpubWorkflowParams(BaseWorkflowParams):
         "\n",
         description="当 insert_mode 为 'append' 或 'prepend' 时，用于分隔原文和译文的分隔符。"
     )
+    segment_mode: Literal["node", "block"] = Field(
+        "node",
+        description="片段粒度。'node'：每个文本节点单独翻译；'block'：将段落内的加粗、链接等行内文本合并为一个带占位符的片段翻译，"
+                    "译文语序更自然。"
+    )
 
 
 # --- HTML WORKFLOW PARAMS START ---
@@ -430,6 +672,29 @@ class HtmlWorkflowParams(BaseWorkflowParams):
         " ",
         description="当 insert_mode 为 'append' 或 'prepend' 时，用于分隔原文和译文的分隔符。"
     )
+    segment_mode: Literal["node", "block"] = Field(
+        "node",
+        description="片段粒度。'node'：每个文本节点单独翻译；'block'：将段落内的加粗、链接等行内文本合并为一个带占位符的片段翻译，"
+                    "译文语序更自然。"
+    )
+
+
+class HtmlSiteWorkflowParams(BaseWorkflowParams):
+    workflow_type: Literal['html_site'] = Field(
+        ..., description="指定使用多页面HTML站点（zip压缩包）的翻译工作流。各页面共用的页眉、页脚、导航栏等只翻译一次。")
+    insert_mode: Literal["replace", "append", "prepend"] = Field(
+        "replace",
+        description="翻译文本的插入模式。'replace'：替换原文，'append'：附加到原文后，'prepend'：附加到原文前。"
+    )
+    separator: str = Field(
+        " ",
+        description="当 insert_mode 为 'append' 或 'prepend' 时，用于分隔原文和译文的分隔符。"
+    )
+    segment_mode: Literal["node", "block"] = Field(
+        "node",
+        description="片段粒度。'node'：每个文本节点单独翻译；'block'：将段落内的加粗、链接等行内文本合并为一个带占位符的片段翻译，"
+                    "译文语序更自然。"
+    )
 
 
 # --- HTML WORKFLOW PARAMS END ---
@@ -438,7 +703,8 @@ class HtmlWorkflowParams(BaseWorkflowParams):
 # 3. 使用可辨识联合类型（Discriminated Union）将它们组合起来
 TranslatePayload = Annotated[
     Union[
-        MarkdownWorkflowParams, TextWorkflowParams, JsonWorkflowParams, XlsxWorkflowParams, DocxWorkflowParams, SrtWorkflowParams, EpubWorkflowParams, HtmlWorkflowParams],
+        MarkdownWorkflowParams, TextWorkflowParams, JsonWorkflowParams, XlsxWorkflowParams, DocxWorkflowParams, SrtWorkflowParams, EpubWorkflowParams, HtmlWorkflowParams,
+        HtmlSiteWorkflowParams],
     Field(discriminator='workflow_type')
 ]
 
@@ -632,6 +898,113 @@ class TranslateServiceRequest(BaseModel):
 
 
 # --- Background Task Logic ---
+def _build_export_map(task_id: str, payload: TranslatePayload, workflow: Workflow, filename_stem: str,
+                      paged: bool = True) -> Dict[str, ExportSpec]:
+    """
+    根据 workflow 的类型登记可下载的格式。
+    paged为False时不登记分章节HTML（其章节与资源端点只对应任务的第一个目标语言）。
+    """
+    export_map: Dict[str, ExportSpec] = {}
+    # 根据 workflow 的类型填充导出映射
+    if isinstance(workflow, HTMLExportable):
+        html_config_class = None
+        if isinstance(workflow, MarkdownBasedWorkflow):
+            html_config_class = MD2HTMLExporterConfig
+        elif isinstance(workflow, TXTWorkflow):
+            html_config_class = TXT2HTMLExporterConfig
+        elif isinstance(workflow, JsonWorkflow):
+            html_config_class = Json2HTMLExporterConfig
+        elif isinstance(workflow, XlsxWorkflow):
+            html_config_class = Xlsx2HTMLExporterConfig
+        elif isinstance(workflow, DocxWorkflow):
+            html_config_class = Docx2HTMLExporterConfig
+        elif isinstance(workflow, SrtWorkflow):
+            html_config_class = Srt2HTMLExporterConfig
+        elif isinstance(workflow, EpubWorkflow):
+            html_config_class = Epub2HTMLExporterConfig
+        html_config_factory = (lambda cdn: html_config_class(cdn=cdn)) if html_config_class else None
+        if html_config_class is MD2HTMLExporterConfig and getattr(payload, "html_static_assets", False):
+            html_config_factory = lambda cdn: MD2HTMLExporterConfig(cdn=cdn, static_url="/static")
+        export_map['html'] = ExportSpec(workflow.export_to_html, f"{filename_stem}_translated.html", True,
+                                        html_config_factory)
+    if isinstance(workflow, EpubWorkflow) and paged:
+        # 分章节导出：索引页中的章节片段与资源通过下载端点的子路径按需加载
+        paged_base_url = f"/service/download/{task_id}/html_paged/"
+        export_map['html_paged'] = ExportSpec(
+            workflow.export_to_paged_html, f"{filename_stem}_translated_paged.html", True,
+            lambda cdn: Epub2HTMLExporterConfig(cdn=cdn, paginate=True, base_url=paged_base_url),
+            workflow.write_paged_html)
+    if isinstance(workflow, MDFormatsExportable):
+        export_map['markdown'] = ExportSpec(workflow.export_to_markdown, f"{filename_stem}_translated.md", True)
+        export_map['markdown_zip'] = ExportSpec(workflow.export_to_markdown_zip,
+                                                f"{filename_stem}_translated.zip", False,
+                                                write_func=workflow.write_markdown_zip)
+    if isinstance(workflow, TXTExportable):
+        export_map['txt'] = ExportSpec(workflow.export_to_txt, f"{filename_stem}_translated.txt", True)
+    if isinstance(workflow, JsonExportable):
+        export_map['json'] = ExportSpec(workflow.export_to_json, f"{filename_stem}_translated.json", True)
+    if isinstance(workflow, XlsxExportable):
+        export_map['xlsx'] = ExportSpec(workflow.export_to_xlsx, f"{filename_stem}_translated.xlsx", False)
+    if isinstance(workflow, CsvExportable):
+        export_map['csv'] = ExportSpec(workflow.export_to_csv, f"{filename_stem}_translated.csv", False)
+    if isinstance(workflow, DocxExportable):
+        export_map['docx'] = ExportSpec(workflow.export_to_docx, f"{filename_stem}_translated.docx", False)
+    if isinstance(workflow, SrtExportable):
+        export_map['srt'] = ExportSpec(workflow.export_to_srt, f"{filename_stem}_translated.srt", True)
+    if isinstance(workflow, EpubExportable):
+        export_map['epub'] = ExportSpec(workflow.export_to_epub, f"{filename_stem}_translated.epub", False)
+    if isinstance(workflow, HtmlZipExportable):
+        export_map['html_zip'] = ExportSpec(workflow.export_to_html_zip, f"{filename_stem}_translated.zip", False,
+                                            write_func=workflow.write_html_zip)
+    return export_map
+
+
+async def _translate_workflows(workflows: List[Workflow]):
+    """并发翻译多个工作流（各目标语言），任一失败时取消其余的翻译"""
+    tasks = [asyncio.create_task(workflow.translate_async()) for workflow in workflows]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+# 语言名中不能用于文件名的字符
+_UNSAFE_FILENAME_PATTERN = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+def _language_filename_stem(filename_stem: str, language: str) -> str:
+    return f"{filename_stem}_{_UNSAFE_FILENAME_PATTERN.sub('_', language)}"
+
+
+async def _save_attachments(workflow: Workflow, temp_dir: str, task_logger: logging.Logger,
+                            language: Optional[str] = None) -> Dict[str, Dict[str, str]]:
+    """把工作流的附件写入任务临时目录，返回 标识符 -> {path, filename}。language不为空时标识符与文件名带上语言名"""
+    attachment_files = {}
+    attachment_object = workflow.get_attachment()
+    if attachment_object and attachment_object.attachment_dict:
+        task_logger.info(f"发现 {len(attachment_object.attachment_dict)} 个附件，正在处理...")
+        for identifier, doc in attachment_object.attachment_dict.items():
+            try:
+                # 'doc' is a Document object
+                attachment_filename = f"{doc.stem or identifier}{doc.suffix}"
+                if language is not None:
+                    attachment_filename = f"{_language_filename_stem(doc.stem or identifier, language)}{doc.suffix}"
+                    identifier = _language_filename_stem(identifier, language)
+                attachment_path = os.path.join(temp_dir, attachment_filename)
+                if doc.is_file_backed:
+                    # 以文件引用保存的附件（如MinerU解析结果zip）直接在磁盘上复制，不载入内存
+                    await asyncio.to_thread(shutil.copyfile, doc.path, attachment_path)
+                else:
+                    await asyncio.to_thread(_write_bytes, attachment_path, doc.content)
+                attachment_files[identifier] = {"path": attachment_path, "filename": attachment_filename}
+                task_logger.info(f"成功生成附件 '{identifier}' 文件: {attachment_filename}")
+            except Exception as attachment_error:
+                task_logger.error(f"生成附件 '{identifier}' 文件时出错: {attachment_error}", exc_info=True)
+    return attachment_files
+
+
 async def _perform_translation(
         task_id: str,
         payload: TranslatePayload,
@@ -661,6 +1034,13 @@ async def _perform_translation(
         if not workflow_class:
             raise ValueError(f"不支持的工作流类型: '{payload.workflow_type}'")
 
+        # 多目标语言：按第一个语言构建工作流，其余语言在解析完成后派生，各语言平分并发数
+        languages = list(dict.fromkeys(payload.to_langs or [])) or [payload.to_lang]
+        if payload.to_langs:
+            payload = payload.model_copy(update={"to_lang": languages[0],
+                                                 "concurrent": max(1, payload.concurrent // len(languages))})
+        task_state["languages"] = languages
+
         workflow: Workflow
 
         # 注入全局API Key的辅助函数：当未提供api_key时，从全局敏感配置回退
@@ -770,13 +1150,15 @@ async def _perform_translation(
                     logger=task_logger,
                     code_ocr=payload.code_ocr,
                     formula_ocr=payload.formula_ocr,
-                    artifact=None
+                    artifact=None,
+                    num_threads=get_global_config().translator_settings.docling_num_threads or None,
+                    parallelism=get_global_config().translator_settings.docling_parallelism or None
                 )
             html_exporter_config = MD2HTMLExporterConfig(cdn=True)
             workflow_config = MarkdownBasedWorkflowConfig(
                 convert_engine=payload.convert_engine, converter_config=converter_config,
                 translator_config=translator_config, html_exporter_config=html_exporter_config,
-                logger=task_logger
+                stream_translate=payload.stream_translate, logger=task_logger
             )
             workflow = MarkdownBasedWorkflow(config=workflow_config)
 
@@ -785,7 +1167,7 @@ async def _perform_translation(
             translator_args = payload.model_dump(include={
                 'skip_translate', 'base_url', 'api_key', 'model_id', 'to_lang', 'custom_prompt',
                 'temperature', 'thinking', 'chunk_size', 'concurrent', 'glossary_dict',
-                'insert_mode', 'separator', 'timeout', 'retry'
+                'insert_mode', 'separator', 'timeout', 'retry', 'window_size', 'segment_size'
             }, exclude_none=True)
             translator_args['glossary_generate_enable'] = payload.glossary_generate_enable
             translator_args['glossary_agent_config'] = build_glossary_agent_config()
@@ -800,6 +1182,8 @@ async def _perform_translation(
                 task_logger.info(f"已加载用户术语表，包含 {len(user_glossary)} 条术语")
             
             translator_args = inject_global_api_key(translator_args)
+            if payload.window_size:
+                temp_dir, translator_args['output_path'] = _prepare_partial_output(task_id, task_state, "txt")
             translator_config = TXTTranslatorConfig(**translator_args)
 
             html_exporter_config = TXT2HTMLExporterConfig(cdn=True)
@@ -814,7 +1198,7 @@ async def _perform_translation(
             translator_args = payload.model_dump(include={
                 'skip_translate', 'base_url', 'api_key', 'model_id', 'to_lang', 'custom_prompt',
                 'temperature', 'thinking', 'chunk_size', 'concurrent', 'glossary_dict',
-                'json_paths', 'timeout', 'retry'
+                'json_paths', 'timeout', 'retry', 'stream_window'
             }, exclude_none=True)
             translator_args['glossary_generate_enable'] = payload.glossary_generate_enable
             translator_args['glossary_agent_config'] = build_glossary_agent_config()
@@ -843,7 +1227,8 @@ async def _perform_translation(
             translator_args = payload.model_dump(include={
                 'skip_translate', 'base_url', 'api_key', 'model_id', 'to_lang', 'custom_prompt',
                 'temperature', 'thinking', 'chunk_size', 'concurrent',
-                'insert_mode', 'separator', 'translate_regions', 'glossary_dict', 'timeout', 'retry'
+                'insert_mode', 'separator', 'translate_regions', 'glossary_dict', 'timeout', 'retry', 'engine',
+                'translate_shared_strings'
             }, exclude_none=True)
             translator_args['glossary_generate_enable'] = payload.glossary_generate_enable
             translator_args['glossary_agent_config'] = build_glossary_agent_config()
@@ -864,6 +1249,7 @@ async def _perform_translation(
             workflow_config = XlsxWorkflowConfig(
                 translator_config=translator_config,
                 html_exporter_config=html_exporter_config,
+                csv_engine=payload.csv_engine,
                 logger=task_logger
             )
             workflow = XlsxWorkflow(config=workflow_config)
@@ -873,7 +1259,7 @@ async def _perform_translation(
             translator_args = payload.model_dump(include={
                 'skip_translate', 'base_url', 'api_key', 'model_id', 'to_lang', 'custom_prompt',
                 'temperature', 'thinking', 'chunk_size', 'concurrent',
-                'insert_mode', 'separator', 'glossary_dict', 'timeout', 'retry'
+                'insert_mode', 'separator', 'glossary_dict', 'timeout', 'retry', 'engine'
             }, exclude_none=True)
             translator_args['glossary_generate_enable'] = payload.glossary_generate_enable
             translator_args['glossary_agent_config'] = build_glossary_agent_config()
@@ -903,7 +1289,7 @@ async def _perform_translation(
             translator_args = payload.model_dump(include={
                 'skip_translate', 'base_url', 'api_key', 'model_id', 'to_lang', 'custom_prompt',
                 'temperature', 'thinking', 'chunk_size', 'concurrent',
-                'insert_mode', 'separator', 'glossary_dict', 'timeout', 'retry'
+                'insert_mode', 'separator', 'glossary_dict', 'timeout', 'retry', 'window_size'
             }, exclude_none=True)
             translator_args['glossary_generate_enable'] = payload.glossary_generate_enable
             translator_args['glossary_agent_config'] = build_glossary_agent_config()
@@ -918,6 +1304,8 @@ async def _perform_translation(
                 task_logger.info(f"已加载用户术语表，包含 {len(user_glossary)} 条术语")
             
             translator_args = inject_global_api_key(translator_args)
+            if payload.window_size:
+                temp_dir, translator_args['output_path'] = _prepare_partial_output(task_id, task_state, "srt")
             translator_config = SrtTranslatorConfig(**translator_args)
 
             html_exporter_config = Srt2HTMLExporterConfig(cdn=True)
@@ -933,7 +1321,7 @@ async def _perform_translation(
             translator_args = payload.model_dump(include={
                 'skip_translate', 'base_url', 'api_key', 'model_id', 'to_lang', 'custom_prompt',
                 'temperature', 'thinking', 'chunk_size', 'concurrent',
-                'insert_mode', 'separator', 'glossary_dict', 'timeout', 'retry'
+                'insert_mode', 'separator', 'segment_mode', 'glossary_dict', 'timeout', 'retry'
             }, exclude_none=True)
             translator_args['glossary_generate_enable'] = payload.glossary_generate_enable
             translator_args['glossary_agent_config'] = build_glossary_agent_config()
@@ -964,7 +1352,7 @@ async def _perform_translation(
             translator_args = payload.model_dump(include={
                 'skip_translate', 'base_url', 'api_key', 'model_id', 'to_lang', 'custom_prompt',
                 'temperature', 'thinking', 'chunk_size', 'concurrent',
-                'insert_mode', 'separator', 'glossary_dict', 'timeout', 'retry'
+                'insert_mode', 'separator', 'segment_mode', 'glossary_dict', 'timeout', 'retry'
             }, exclude_none=True)
             translator_args['glossary_generate_enable'] = payload.glossary_generate_enable
             translator_args['glossary_agent_config'] = build_glossary_agent_config()
@@ -986,6 +1374,33 @@ async def _perform_translation(
                 logger=task_logger
             )
             workflow = HtmlWorkflow(config=workflow_config)
+        elif isinstance(payload, HtmlSiteWorkflowParams):
+            task_logger.info("构建 HtmlSiteWorkflow 配置。")
+            translator_args = payload.model_dump(include={
+                'skip_translate', 'base_url', 'api_key', 'model_id', 'to_lang', 'custom_prompt',
+                'temperature', 'thinking', 'chunk_size', 'concurrent',
+                'insert_mode', 'separator', 'segment_mode', 'glossary_dict', 'timeout', 'retry'
+            }, exclude_none=True)
+            translator_args['glossary_generate_enable'] = payload.glossary_generate_enable
+            translator_args['glossary_agent_config'] = build_glossary_agent_config()
+            
+            # 合并用户选择的术语表
+            user_glossary = get_user_glossary()
+            if user_glossary:
+                if 'glossary_dict' in translator_args and translator_args['glossary_dict']:
+                    translator_args['glossary_dict'] = {**translator_args['glossary_dict'], **user_glossary}
+                else:
+                    translator_args['glossary_dict'] = user_glossary
+                task_logger.info(f"已加载用户术语表，包含 {len(user_glossary)} 条术语")
+            
+            translator_args = inject_global_api_key(translator_args)
+            translator_config = HtmlSiteTranslatorConfig(**translator_args)
+
+            workflow_config = HtmlSiteWorkflowConfig(
+                translator_config=translator_config,
+                logger=task_logger
+            )
+            workflow = HtmlSiteWorkflow(config=workflow_config)
         # --- HTML WORKFLOW LOGIC END ---
 
         else:
@@ -995,93 +1410,35 @@ async def _perform_translation(
         file_stem = Path(original_filename).stem
         file_suffix = Path(original_filename).suffix
         workflow.read_bytes(content=file_contents, stem=file_stem, suffix=file_suffix)
-        await workflow.translate_async()
-
-        # 4. 任务成功，生成所有可下载文件并存储
-        task_logger.info("翻译完成，正在生成临时结果文件...")
-        temp_dir = tempfile.mkdtemp(prefix=f"collabtrans_{task_id}_")
+        language_workflows: Dict[str, Workflow] = {}
+        if len(languages) > 1:
+            task_logger.info(f"共 {len(languages)} 个目标语言: {', '.join(languages)}，文档解析只进行一次。")
+            await workflow.prepare_async()
+            # 窗口模式的部分译文只对应第一个语言
+            overrides = {"output_path": None} if getattr(workflow.config.translator_config, "output_path", None) \
+                else {}
+            language_workflows = {lang: workflow.fork_for_language(lang, **overrides) for lang in languages[1:]}
+        await _translate_workflows([workflow, *language_workflows.values()])
+
+        # 4. 任务成功，登记可下载的格式，文件在首次下载时生成
+        temp_dir = temp_dir or tempfile.mkdtemp(prefix=f"collabtrans_{task_id}_")
         task_state["temp_dir"] = temp_dir
-        downloadable_files = {}
         filename_stem = task_state['original_filename_stem']
 
-        # 检查CDN可用性
-        is_cdn_available = True
-        try:
-            await httpx_client.head("https://s4.zstatic.net/ajax/libs/KaTeX/0.16.9/contrib/auto-render.min.js",
-                                    timeout=3)
-        except (httpx.TimeoutException, httpx.RequestError):
-            is_cdn_available = False
-            task_logger.warning("CDN连接失败，将使用本地JS进行渲染。")
-
-        # 定义导出函数映射
-        export_map = {}
-
-        # 根据 workflow 的类型填充导出映射
-        if isinstance(workflow, HTMLExportable):
-            html_config = None
-            if isinstance(workflow, MarkdownBasedWorkflow):
-                html_config = MD2HTMLExporterConfig(cdn=is_cdn_available)
-            elif isinstance(workflow, TXTWorkflow):
-                html_config = TXT2HTMLExporterConfig(cdn=is_cdn_available)
-            elif isinstance(workflow, JsonWorkflow):
-                html_config = Json2HTMLExporterConfig(cdn=is_cdn_available)
-            elif isinstance(workflow, XlsxWorkflow):
-                html_config = Xlsx2HTMLExporterConfig(cdn=is_cdn_available)
-            elif isinstance(workflow, DocxWorkflow):
-                html_config = Docx2HTMLExporterConfig(cdn=is_cdn_available)
-            elif isinstance(workflow, SrtWorkflow):
-                html_config = Srt2HTMLExporterConfig(cdn=is_cdn_available)
-            elif isinstance(workflow, EpubWorkflow):
-                html_config = Epub2HTMLExporterConfig(cdn=is_cdn_available)
-            export_map['html'] = (lambda: workflow.export_to_html(html_config), f"{filename_stem}_translated.html",
-                                  True)
-        if isinstance(workflow, MDFormatsExportable):
-            export_map['markdown'] = (workflow.export_to_markdown, f"{filename_stem}_translated.md", True)
-            export_map['markdown_zip'] = (workflow.export_to_markdown_zip, f"{filename_stem}_translated.zip", False)
-        if isinstance(workflow, TXTExportable):
-            export_map['txt'] = (workflow.export_to_txt, f"{filename_stem}_translated.txt", True)
-        if isinstance(workflow, JsonExportable):
-            export_map['json'] = (workflow.export_to_json, f"{filename_stem}_translated.json", True)
-        if isinstance(workflow, XlsxExportable):
-            export_map['xlsx'] = (workflow.export_to_xlsx, f"{filename_stem}_translated.xlsx", False)
-        if isinstance(workflow, CsvExportable):
-            export_map['csv'] = (workflow.export_to_csv, f"{filename_stem}_translated.csv", False)
-        if isinstance(workflow, DocxExportable):
-            export_map['docx'] = (workflow.export_to_docx, f"{filename_stem}_translated.docx", False)
-        if isinstance(workflow, SrtExportable):
-            export_map['srt'] = (workflow.export_to_srt, f"{filename_stem}_translated.srt", True)
-        if isinstance(workflow, EpubExportable):
-            export_map['epub'] = (workflow.export_to_epub, f"{filename_stem}_translated.epub", False)
-
-        # 循环生成文件
-        for file_type, (export_func, filename, is_string_output) in export_map.items():
-            try:
-                content = await asyncio.to_thread(export_func)
-                content_bytes = content.encode('utf-8') if is_string_output else content
-                file_path = os.path.join(temp_dir, filename)
-                with open(file_path, "wb") as f:
-                    f.write(content_bytes)
-                downloadable_files[file_type] = {"path": file_path, "filename": filename}
-                task_logger.info(f"成功生成 {file_type} 文件")
-            except Exception as export_error:
-                task_logger.error(f"生成 {file_type} 文件时出错: {export_error}", exc_info=True)
-
-        # 处理附件文件
-        attachment_files = {}
-        attachment_object = workflow.get_attachment()
-        if attachment_object and attachment_object.attachment_dict:
-            task_logger.info(f"发现 {len(attachment_object.attachment_dict)} 个附件，正在处理...")
-            for identifier, doc in attachment_object.attachment_dict.items():
-                try:
-                    # 'doc' is a Document object
-                    attachment_filename = f"{doc.stem or identifier}{doc.suffix}"
-                    attachment_path = os.path.join(temp_dir, attachment_filename)
-                    with open(attachment_path, "wb") as f:
-                        f.write(doc.content)
-                    attachment_files[identifier] = {"path": attachment_path, "filename": attachment_filename}
-                    task_logger.info(f"成功生成附件 '{identifier}' 文件: {attachment_filename}")
-                except Exception as attachment_error:
-                    task_logger.error(f"生成附件 '{identifier}' 文件时出错: {attachment_error}", exc_info=True)
+        export_map = _build_export_map(task_id, payload, workflow, filename_stem)
+        task_exports = TaskExports(workflow, temp_dir, export_map, task_logger)
+        downloadable_files = {file_type: {"filename": spec.filename} for file_type, spec in export_map.items()}
+        language_exports: Dict[str, TaskExports] = {}
+        for index, (language, language_workflow) in enumerate(language_workflows.items(), 1):
+            language_map = _build_export_map(task_id, payload, language_workflow,
+                                             _language_filename_stem(filename_stem, language), paged=False)
+            language_exports[language] = TaskExports(language_workflow, os.path.join(temp_dir, f"lang_{index}"),
+                                                     language_map, task_logger)
+
+        # 处理附件文件，其余语言的附件（如各语言生成的术语表）以带语言名的标识符登记
+        attachment_files = await _save_attachments(workflow, temp_dir, task_logger)
+        for language, language_workflow in language_workflows.items():
+            attachment_files.update(await _save_attachments(language_workflow, temp_dir, task_logger, language))
 
         # 5. 任务成功，更新最终状态
         end_time = time.time()
@@ -1092,9 +1449,16 @@ async def _perform_translation(
             "error_flag": False,
             "task_end_time": end_time,
             "downloadable_files": downloadable_files,
+            "exports": task_exports,
+            "language_exports": language_exports,
             "attachment_files": attachment_files,
         })
         task_logger.info(f"翻译成功完成，用时 {duration:.2f} 秒。")
+        if payload.pregenerate_exports:
+            task_logger.info("正在后台并行生成所有格式的结果文件...")
+            _run_in_background(task_exports.pregenerate())
+            for language_task_exports in language_exports.values():
+                _run_in_background(language_task_exports.pregenerate())
 
     except asyncio.CancelledError:
         end_time = time.time()
@@ -1124,11 +1488,25 @@ async def _perform_translation(
             shutil.rmtree(temp_dir)
             task_logger.info(f"因任务失败，已清理临时目录")
             task_state["temp_dir"] = None
+            task_state["partial_file"] = None
 
         task_logger.info(f"后台翻译任务 '{original_filename}' 处理结束。")
         task_logger.removeHandler(task_handler)
 
 
+def _prepare_partial_output(task_id: str, task_state: Dict[str, Any], file_type: str) -> tuple[str, str]:
+    """
+    为窗口模式的翻译创建任务的临时目录，译文直接写入其中，翻译过程中即可下载已完成的部分。
+    返回 (临时目录, 译文的写出路径)
+    """
+    temp_dir = tempfile.mkdtemp(prefix=f"collabtrans_{task_id}_")
+    task_state["temp_dir"] = temp_dir
+    filename = f"{task_state['original_filename_stem']}_translated.{file_type}"
+    path = os.path.join(temp_dir, "partial", filename)
+    task_state["partial_file"] = {"path": path, "filename": filename, "media_type": MEDIA_TYPES[file_type]}
+    return temp_dir, path
+
+
 # --- 核心任务启动逻辑 ---
 async def _start_translation_task(
         task_id: str,
@@ -1156,7 +1534,8 @@ async def _start_translation_task(
         "original_filename_stem": Path(original_filename).stem,
         "original_filename": original_filename,
         "task_start_time": time.time(), "task_end_time": 0, "current_task_ref": None,
-        "temp_dir": None, "downloadable_files": {}, "attachment_files": {},
+        "temp_dir": None, "downloadable_files": {}, "exports": None, "attachment_files": {},
+        "partial_file": None, "languages": [], "language_exports": {},
     })
 
     log_history = tasks_log_histories[task_id]
@@ -1303,7 +1682,8 @@ async def service_release_task(task_id: str):
 @service_router.get(
     "/status/{task_id}",
     summary="获取任务状态",
-    description="根据任务ID获取任务的当前状态。当 `download_ready` 为 `true` 时，`downloads` 和 `attachment` 对象中会包含可用的下载链接。",
+    description="根据任务ID获取任务的当前状态。当 `download_ready` 为 `true` 时，`downloads` 和 `attachment` 对象中会包含可用的下载链接；"
+                "窗口模式的任务进行中时，`partial` 为已完成部分的下载链接。",
     responses={
         200: {
             "description": "成功获取任务状态。",
@@ -1400,7 +1780,8 @@ async def service_release_task(task_id: str):
                                 "task_end_time": 1678890045.32,
                                 "downloads": {
                                     "epub": "/service/download/e9b8d7c6/epub",
-                                    "html": "/service/download/e9b8d7c6/html"
+                                    "html": "/service/download/e9b8d7c6/html",
+                                    "html_paged": "/service/download/e9b8d7c6/html_paged"
                                 },
                                 "attachment": {}
                             }
@@ -1452,7 +1833,19 @@ async def service_get_status(
     attachments = {}
     if task_state.get("download_ready") and task_state.get("attachment_files"):
         for identifier in task_state["attachment_files"].keys():
-            attachments[identifier] = f"/service/attachment/{task_id}/{identifier}"
+            attachments[identifier] = f"/service/attachment/{task_id}/{quote(identifier)}"
+
+    languages = {}
+    if task_state.get("download_ready") and task_state.get("language_exports"):
+        languages[task_state["languages"][0]] = downloads
+        for language, language_task_exports in task_state["language_exports"].items():
+            languages[language] = {file_type: f"/service/download/{task_id}/{file_type}?lang={quote(language)}"
+                                   for file_type in language_task_exports.specs}
+
+    partial_file = task_state.get("partial_file")
+    partial = None
+    if task_state["is_processing"] and partial_file and os.path.exists(partial_file["path"]):
+        partial = f"/service/partial/{task_id}"
 
     return JSONResponse(content={
         "task_id": task_id,
@@ -1465,7 +1858,9 @@ async def service_get_status(
         "task_start_time": task_state["task_start_time"],
         "task_end_time": task_state["task_end_time"],
         "downloads": downloads,
-        "attachment": attachments
+        "attachment": attachments,
+        "partial": partial,
+        "languages": languages
     })
 
 
@@ -1488,7 +1883,8 @@ async def service_get_logs(task_id: str):
     return JSONResponse(content={"logs": new_logs})
 
 
-FileType = Literal["markdown", "markdown_zip", "html", "txt", "json", "xlsx", "csv", "docx", "srt", "epub"]
+FileType = Literal["markdown", "markdown_zip", "html", "html_paged", "html_zip", "txt", "json", "xlsx", "csv", "docx",
+                   "srt", "epub"]
 
 
 @service_router.get(
@@ -1519,22 +1915,97 @@ FileType = Literal["markdown", "markdown_zip", "html", "txt", "json", "xlsx", "c
 async def service_download_file(
         task_id: str = FastApiPath(..., description="已完成任务的ID", examples=["b2865b93"]),
         file_type: FileType = FastApiPath(..., description="要下载的文件类型。",
-                                          examples=["html", "json", "csv", "docx", "srt", "epub"])
+                                          examples=["html", "json", "csv", "docx", "srt", "epub"]),
+        lang: Optional[str] = Query(None, description="多目标语言任务中要下载的语言，默认为第一个语言。",
+                                    examples=["English"])
 ):
     task_state = tasks_state.get(task_id)
     if not task_state:
         raise HTTPException(status_code=404, detail=f"找不到任务ID '{task_id}'。")
 
-    file_info = task_state.get("downloadable_files", {}).get(file_type)
-    if not file_info or not os.path.exists(file_info.get("path")):
+    file_path, filename = await _get_export_file(task_id, task_state, file_type, lang)
+    media_type = MEDIA_TYPES.get(file_type, "application/octet-stream")
+    if file_type == "html_paged":
+        # 分章节HTML需要在浏览器中打开，章节与资源由页面按需加载
+        return FileResponse(path=file_path, media_type=media_type, filename=filename, content_disposition_type="inline",
+                            headers={**_UNTRUSTED_CONTENT_HEADERS,
+                                     "Content-Security-Policy": PAGED_CONTENT_SECURITY_POLICY})
+    return FileResponse(path=file_path, media_type=media_type, filename=filename)
+
+
+async def _get_export_file(task_id: str, task_state: Dict[str, Any], file_type: str,
+                           lang: Optional[str] = None) -> tuple[str, str]:
+    """返回导出文件的路径与文件名，文件不存在时即时生成。lang为多目标语言任务中第一个语言以外的语言时，返回该语言的结果"""
+    task_exports: Optional[TaskExports] = task_state.get("exports")
+    languages = task_state.get("languages") or []
+    if lang is not None and (not languages or lang != languages[0]):
+        task_exports = task_state.get("language_exports", {}).get(lang)
+        if task_exports is None:
+            raise HTTPException(status_code=404, detail=f"任务 '{task_id}' 没有目标语言 '{lang}' 的翻译结果。")
+    if not task_state.get("download_ready") or task_exports is None or file_type not in task_exports.specs:
         raise HTTPException(status_code=404,
-                            detail=f"任务 '{task_id}' 不支持下载 '{file_type}' 类型的文件，或文件已丢失。")
+                            detail=f"任务 '{task_id}' 不支持获取 '{file_type}' 类型的文件，或文件已丢失。")
+    try:
+        file_path = await task_exports.get_path(file_type)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"生成 '{file_type}' 文件时发生内部错误: {e}")
+    return file_path, task_exports.specs[file_type].filename
 
-    file_path = file_info["path"]
-    filename = file_info["filename"]
-    media_type = MEDIA_TYPES.get(file_type, "application/octet-stream")
 
-    return FileResponse(path=file_path, media_type=media_type, filename=filename)
+def _get_paged_exports(task_id: str) -> TaskExports:
+    task_state = tasks_state.get(task_id)
+    if not task_state:
+        raise HTTPException(status_code=404, detail=f"找不到任务ID '{task_id}'。")
+    task_exports: Optional[TaskExports] = task_state.get("exports")
+    if not task_state.get("download_ready") or task_exports is None or "html_paged" not in task_exports.specs \
+            or not isinstance(task_exports.workflow, PagedHTMLExportable):
+        raise HTTPException(status_code=404, detail=f"任务 '{task_id}' 不支持分章节HTML导出。")
+    return task_exports
+
+
+@service_router.get(
+    "/download/{task_id}/html_paged/chapters/{index}",
+    summary="按需加载分章节HTML的章节片段",
+    description="分章节HTML索引页在阅读时通过此端点加载各章节的HTML片段。片段在首次请求时生成并缓存。",
+    response_class=HTMLResponse,
+    responses={404: {"description": "任务ID不存在，任务不支持分章节HTML导出，或章节序号超出范围。"}}
+)
+async def service_download_html_chapter(
+        task_id: str = FastApiPath(..., description="已完成任务的ID", examples=["e9b8d7c6"]),
+        index: int = FastApiPath(..., description="章节在阅读顺序中的序号，从0开始", examples=[0])
+):
+    task_exports = _get_paged_exports(task_id)
+    try:
+        file_path = await task_exports.get_chapter_path("html_paged", index)
+    except IndexError:
+        raise HTTPException(status_code=404, detail=f"任务 '{task_id}' 中不存在序号为 {index} 的章节。")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"生成章节 {index} 时发生内部错误: {e}")
+    return FileResponse(path=file_path, media_type=MEDIA_TYPES["html_paged"],
+                        headers={**_UNTRUSTED_CONTENT_HEADERS, "Content-Security-Policy": PAGED_CONTENT_SECURITY_POLICY})
+
+
+@service_router.get(
+    "/download/{task_id}/html_paged/resources/{resource_path:path}",
+    summary="按需加载分章节HTML引用的资源",
+    description="分章节HTML中的图片、样式表等资源不内嵌到页面中，而是通过此端点从译文EPUB中读取。",
+    responses={404: {"description": "任务ID不存在，任务不支持分章节HTML导出，或资源不存在。"}}
+)
+async def service_download_html_resource(
+        task_id: str = FastApiPath(..., description="已完成任务的ID", examples=["e9b8d7c6"]),
+        resource_path: str = FastApiPath(..., description="资源在EPUB压缩包内的路径", examples=["OEBPS/img/a.png"])
+):
+    task_exports = _get_paged_exports(task_id)
+    content = await asyncio.to_thread(task_exports.workflow.read_html_resource, resource_path)
+    if content is None:
+        raise HTTPException(status_code=404, detail=f"任务 '{task_id}' 中不存在资源 '{resource_path}'。")
+    media_type, _ = mimetypes.guess_type(resource_path)
+    media_type = media_type or "application/octet-stream"
+    headers = {"Cache-Control": "private, max-age=3600", **_UNTRUSTED_CONTENT_HEADERS}
+    # 图片、样式表、字体、音视频以外的资源（HTML、SVG等）直接打开时可能在服务的源下执行脚本，只作为附件下载
+    if not media_type.startswith(_INLINE_RESOURCE_PREFIXES) or media_type == "image/svg+xml":
+        headers["Content-Disposition"] = f"attachment; filename*=UTF-8''{quote(posixpath.basename(resource_path))}"
+    return Response(content=content, media_type=media_type, headers=headers)
 
 
 @service_router.get(
@@ -1573,6 +2044,49 @@ async def service_download_attachment(
     return FileResponse(path=file_path, media_type=media_type, filename=filename)
 
 
+@service_router.get(
+    "/partial/{task_id}",
+    summary="下载翻译中的部分结果",
+    description="窗口模式（设置了 window_size 的SRT、TXT翻译）下，返回翻译过程中已完成并写出的部分译文。"
+                "任务进行中时 `/service/status/{task_id}` 的 `partial` 字段给出此链接。",
+    responses={
+        200: {"description": "成功返回已完成部分的文件内容。",
+              "content": {"text/plain; charset=utf-8": {"schema": {"type": "string"}}}},
+        404: {"description": "任务ID不存在，或任务没有可下载的部分结果。"}
+    }
+)
+async def service_download_partial(
+        task_id: str = FastApiPath(..., description="进行中任务的ID", examples=["b2865b93"])
+):
+    task_state = tasks_state.get(task_id)
+    if not task_state:
+        raise HTTPException(status_code=404, detail=f"找不到任务ID '{task_id}'。")
+
+    partial_file = task_state.get("partial_file")
+    if not partial_file or not os.path.exists(partial_file["path"]):
+        raise HTTPException(status_code=404, detail=f"任务 '{task_id}' 没有可下载的部分结果。")
+
+    # 文件在翻译过程中持续追加，记录当前大小并只流式发送这部分内容，避免响应长度与实际发送的数据不一致
+    file = open(partial_file["path"], "rb")
+    size = os.fstat(file.fileno()).st_size
+    return StreamingResponse(_iter_file_prefix(file, size), media_type=partial_file["media_type"],
+                             headers={"Content-Length": str(size),
+                                      "Content-Disposition": f"attachment; filename*=UTF-8''{quote(partial_file['filename'])}"})
+
+
+def _iter_file_prefix(file, size: int, chunk_size: int = 64 * 1024):
+    """分块读取已打开文件的前 size 字节，读完后关闭文件"""
+    try:
+        while size > 0:
+            chunk = file.read(min(chunk_size, size))
+            if not chunk:
+                break
+            size -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
 @service_router.get(
     "/content/{task_id}/{file_type}",
     summary="下载翻译结果内容 (JSON)",
@@ -1619,23 +2133,18 @@ async def service_download_attachment(
 async def service_content(
         task_id: str = FastApiPath(..., description="已完成任务的ID", examples=["b2865b93"]),
         file_type: FileType = FastApiPath(..., description="要获取内容的文件类型。",
-                                          examples=["html", "json", "csv", "docx", "srt", "epub"])
+                                          examples=["html", "json", "csv", "docx", "srt", "epub"]),
+        lang: Optional[str] = Query(None, description="多目标语言任务中要获取的语言，默认为第一个语言。",
+                                    examples=["English"])
 ):
     task_state = tasks_state.get(task_id)
     if not task_state:
         raise HTTPException(status_code=404, detail=f"找不到任务ID '{task_id}'。")
 
-    file_info = task_state.get("downloadable_files", {}).get(file_type)
-    if not file_info or not os.path.exists(file_info.get("path")):
-        raise HTTPException(status_code=404,
-                            detail=f"任务 '{task_id}' 不支持获取 '{file_type}' 类型の内容，或文件已丢失。")
-
-    file_path = file_info["path"]
-    filename = file_info["filename"]
+    file_path, filename = await _get_export_file(task_id, task_state, file_type, lang)
 
     try:
-        with open(file_path, "rb") as f:
-            content_bytes = f.read()
+        content_bytes = await asyncio.to_thread(_read_bytes, file_path)
         final_content = base64.b64encode(content_bytes).decode('utf-8')
         return JSONResponse(content={
             "file_type": file_type,
@@ -1893,4 +2402,7 @@ def run_app(port: int | None = None):
 
 
 if __name__ == "__main__":
+    # 打包版本（PyInstaller以本文件为入口）中，进程池以spawn方式启动的工作进程会重新执行入口脚本，
+    # freeze_support 使工作进程直接进入任务循环，而不是再启动一个服务
+    multiprocessing.freeze_support()
     run_app()
\ No newline at end of file
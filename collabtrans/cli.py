@@ -1,6 +1,7 @@
 # SPDX-FileCopyrightText: 2025 QinHan
 # SPDX-License-Identifier: MPL-2.0
 import argparse
+import multiprocessing
 import sys # 用于检查命令行参数数量
 
 
@@ -58,4 +59,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # 进程池以spawn方式启动工作进程，打包版本中需要先调用
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -21,6 +21,19 @@ class TranslatorSettings:
     formula_ocr: bool = False
     code_ocr: bool = False
     skip_translate: bool = False
+    # Docling settings
+    # CPU threads used by docling models, 0 means docling default
+    docling_num_threads: int = 0
+    # Preload docling models in background at startup
+    docling_preload: bool = False
+    # Max idle warm converters kept per option set
+    docling_pool_size: int = 2
+    # Worker processes for page-range parallel PDF conversion, 0 means the default (2), 1 disables splitting.
+    # Each worker loads its own docling models (several GB of RAM), so keep this small
+    docling_parallelism: int = 2
+    # Worker processes for CPU-heavy pre/post-processing (parsing, masking, splitting),
+    # 0 means CPU cores, negative runs them in threads instead
+    process_pool_workers: int = 0
     # Detailed parsing engines configurations (non-sensitive)
     # Example:
     # {
@@ -3,7 +3,7 @@
 
 from abc import abstractmethod
 from dataclasses import dataclass
-from typing import Hashable
+from typing import AsyncIterator, Hashable
 
 from collabtrans.converter.base import Converter, ConverterConfig
 from collabtrans.ir.document import Document
@@ -29,6 +29,14 @@ class X2MarkdownConverter(Converter):
     async def convert_async(self, document: Document) -> MarkdownDocument:
         ...
 
+    async def convert_stream_async(self, document: Document) -> AsyncIterator[str]:
+        """
+        按文档顺序逐段产出markdown。默认整篇转换完成后一次性产出，
+        能分段转换的引擎可重写此方法，使翻译与转换同时进行。
+        """
+        document_md = await self.convert_async(document)
+        yield document_md.content.decode()
+
     @abstractmethod
     def support_format(self)->list[str]:
         ...
\ No newline at end of file
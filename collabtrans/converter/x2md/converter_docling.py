@@ -2,12 +2,20 @@
 # SPDX-License-Identifier: MPL-2.0
 
 import asyncio
+import logging
+import math
+import multiprocessing
 import os
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
 from io import BytesIO
 from pathlib import Path
+from typing import AsyncIterator
 
+from docling.datamodel.accelerator_options import AcceleratorDevice, AcceleratorOptions
 from docling.datamodel.base_models import InputFormat
 from docling.datamodel.document import DocumentStream
 from docling.datamodel.pipeline_options import PdfPipelineOptions
@@ -20,8 +28,192 @@ from collabtrans.converter.x2md.base import X2MarkdownConverter, X2MarkdownConve
 from collabtrans.ir.attachment_manager import AttachMent
 from collabtrans.ir.document import Document
 from collabtrans.ir.markdown_document import MarkdownDocument
+from collabtrans.utils.markdown_splitter import join_markdown_parts
 
 IMAGE_RESOLUTION_SCALE = 4
+LOCAL_ARTIFACT = Path("./docling_artifact")
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_artifact(artifact: Path | str | None) -> Path | str | None:
+    # 存在./docling_artifact时优先使用本地模型
+    if LOCAL_ARTIFACT.is_dir():
+        return LOCAL_ARTIFACT
+    return artifact
+
+
+def _build_pipeline_options(code_ocr: bool, formula_ocr: bool, artifact: Path | str | None, images_scale: float,
+                            num_threads: int | None) -> PdfPipelineOptions:
+    pipeline_options = PdfPipelineOptions(artifacts_path=artifact)
+    pipeline_options.do_ocr = False
+    pipeline_options.images_scale = images_scale
+    pipeline_options.generate_picture_images = True
+    # pipeline_options.table_structure_options.mode = TableFormerMode.FAST
+    pipeline_options.table_structure_options.do_cell_matching = False
+    if formula_ocr:
+        pipeline_options.do_formula_enrichment = True
+    if code_ocr:
+        pipeline_options.do_code_enrichment = True
+    if num_threads:
+        pipeline_options.accelerator_options = AcceleratorOptions(
+            num_threads=num_threads, device=AcceleratorDevice.AUTO
+        )
+    return pipeline_options
+
+
+class DoclingConverterPool:
+    """
+    按(code_ocr, formula_ocr, artifact, images_scale)缓存已加载模型的DocumentConverter，
+    避免每个文档都重新加载布局、表格与公式模型。
+    同一个converter同一时间只借给一个转换任务，每种配置最多保留max_idle个空闲实例。
+    """
+
+    def __init__(self, max_idle: int = 2):
+        self.max_idle = max_idle
+        self._idle: dict[tuple, list[DocumentConverter]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(code_ocr: bool, formula_ocr: bool, artifact: Path | str | None, images_scale: float) -> tuple:
+        artifact_key = str(Path(artifact).resolve()) if artifact is not None else None
+        return bool(code_ocr), bool(formula_ocr), artifact_key, float(images_scale)
+
+    def _create(self, code_ocr: bool, formula_ocr: bool, artifact: Path | str | None, images_scale: float,
+                num_threads: int | None) -> DocumentConverter:
+        pipeline_options = _build_pipeline_options(code_ocr, formula_ocr, artifact, images_scale, num_threads)
+        return DocumentConverter(format_options={
+            InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
+        })
+
+    @contextmanager
+    def acquire(self, code_ocr: bool, formula_ocr: bool, artifact: Path | str | None,
+                images_scale: float = IMAGE_RESOLUTION_SCALE, num_threads: int | None = None):
+        key = self.make_key(code_ocr, formula_ocr, artifact, images_scale)
+        with self._lock:
+            idle = self._idle.get(key)
+            converter = idle.pop() if idle else None
+        if converter is None:
+            converter = self._create(code_ocr, formula_ocr, artifact, images_scale, num_threads)
+        try:
+            yield converter
+        finally:
+            self._release(key, converter)
+
+    def _release(self, key: tuple, converter: DocumentConverter):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(converter)
+
+    def preload(self, code_ocr: bool, formula_ocr: bool, artifact: Path | str | None,
+                images_scale: float = IMAGE_RESOLUTION_SCALE, num_threads: int | None = None):
+        """创建converter并初始化PDF管线（加载模型），放入池中备用"""
+        artifact = resolve_artifact(artifact)
+        with self.acquire(code_ocr, formula_ocr, artifact, images_scale, num_threads) as converter:
+            try:
+                converter.initialize_pipeline(InputFormat.PDF)
+            except LocalEntryNotFoundError:
+                os.environ['HF_ENDPOINT'] = 'https://hf-mirror.com'
+                converter.initialize_pipeline(InputFormat.PDF)
+
+    def clear(self):
+        with self._lock:
+            self._idle.clear()
+
+
+docling_converter_pool = DoclingConverterPool()
+
+
+def preload_docling_converters(code_ocr: bool, formula_ocr: bool, num_threads: int | None = None,
+                               artifact: Path | str | None = None, images_scale: float = IMAGE_RESOLUTION_SCALE):
+    """应用启动时在后台预加载docling模型，失败不影响服务启动"""
+    time1 = time.time()
+    try:
+        docling_converter_pool.preload(code_ocr, formula_ocr, artifact, images_scale, num_threads)
+        logger.info(f"docling模型预加载完成，耗时{time.time() - time1:.2f}秒")
+    except Exception as e:
+        logger.warning(f"docling模型预加载失败，将在首次转换时加载: {e}")
+
+
+def _init_page_worker(code_ocr: bool, formula_ocr: bool, artifact: Path | str | None, images_scale: float,
+                      num_threads: int | None):
+    # 子进程启动时即加载模型，后续分段直接使用热模型
+    preload_docling_converters(code_ocr, formula_ocr, num_threads=num_threads, artifact=artifact,
+                               images_scale=images_scale)
+
+
+def _convert_page_range(content: bytes, name: str, page_range: tuple[int, int], code_ocr: bool, formula_ocr: bool,
+                        artifact: Path | str | None, images_scale: float, num_threads: int | None) -> str:
+    """在子进程中转换PDF的一个页码区间（起止页均包含，从1开始）"""
+    with docling_converter_pool.acquire(code_ocr, formula_ocr, artifact, images_scale, num_threads) as converter:
+        try:
+            conversion_result = converter.convert(DocumentStream(name=name, stream=BytesIO(content)),
+                                                  page_range=page_range)
+        except LocalEntryNotFoundError:
+            os.environ['HF_ENDPOINT'] = 'https://hf-mirror.com'
+            conversion_result = converter.convert(DocumentStream(name=name, stream=BytesIO(content)),
+                                                  page_range=page_range)
+        return conversion_result.document.export_to_markdown(image_mode=ImageRefMode.EMBEDDED)
+
+
+_page_executor: ProcessPoolExecutor | None = None
+_page_executor_key: tuple | None = None
+_page_executor_lock = threading.Lock()
+
+
+def get_page_executor(max_workers: int, init_args: tuple) -> ProcessPoolExecutor:
+    """
+    获取分页转换用的进程池，工作进程常驻并持有已加载的模型。
+    init_args仅用于新建进程时预加载模型，其他选项组合在子进程中首次使用时加载。
+    进程数变化时重建进程池，旧进程池处理完已提交的区间后退出。
+    """
+    global _page_executor, _page_executor_key
+    with _page_executor_lock:
+        key = max_workers
+        if _page_executor is not None and _page_executor_key != key:
+            _page_executor.shutdown(wait=False)
+            _page_executor = None
+        if _page_executor is None:
+            # 使用spawn避免fork已加载torch线程的进程
+            _page_executor = ProcessPoolExecutor(max_workers=max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=_init_page_worker, initargs=init_args)
+            _page_executor_key = key
+        return _page_executor
+
+
+def shutdown_page_executor():
+    global _page_executor, _page_executor_key
+    with _page_executor_lock:
+        if _page_executor is not None:
+            _page_executor.shutdown(wait=False, cancel_futures=True)
+            _page_executor = None
+            _page_executor_key = None
+
+
+def count_pdf_pages(content: bytes) -> int | None:
+    try:
+        import pypdfium2
+        pdf = pypdfium2.PdfDocument(content)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    except Exception as e:
+        logger.warning(f"无法读取PDF页数: {e}")
+        return None
+
+
+# PDF分页并行转换的默认进程数
+DEFAULT_PARALLELISM = 2
+
+
+def split_page_ranges(page_count: int, parallelism: int, min_pages: int) -> list[tuple[int, int]]:
+    # 区间数取进程数的两倍以平衡各进程负载，每个区间不少于min_pages页
+    pages_per_range = max(min_pages, math.ceil(page_count / (parallelism * 2)))
+    return [(start, min(start + pages_per_range - 1, page_count))
+            for start in range(1, page_count + 1, pages_per_range)]
 
 
 @dataclass(kw_only=True)
@@ -29,9 +221,17 @@ class ConverterDoclingConfig(X2MarkdownConverterConfig):
     code_ocr: bool = True
     formula_ocr: bool = True
     artifact: Path | str | None = None
+    images_scale: float = IMAGE_RESOLUTION_SCALE
+    # CPU线程数，None表示使用docling默认值
+    num_threads: int | None = None
+    # PDF分页并行转换的进程数，None表示使用默认值 DEFAULT_PARALLELISM，1表示不分页。
+    # 每个进程各自加载一份docling模型（数GB内存），不宜按CPU核数设置
+    parallelism: int | None = None
+    # 页数不超过该值的PDF不分页，同时也是每个页码区间的最少页数
+    min_pages_per_range: int = 8
 
     def gethash(self):
-        return self.code_ocr, self.formula_ocr
+        return self.code_ocr, self.formula_ocr, self.images_scale
 
 
 class ConverterDocling(X2MarkdownConverter):
@@ -39,20 +239,25 @@ class ConverterDocling(X2MarkdownConverter):
         super().__init__(config=config)
         self.code = config.code_ocr
         self.formula = config.formula_ocr
-        artifact = Path("./docling_artifact")
-        if artifact.is_dir():
+        self.images_scale = config.images_scale
+        self.num_threads = config.num_threads
+        self.parallelism = min(config.parallelism or DEFAULT_PARALLELISM, os.cpu_count() or 1)
+        self.min_pages_per_range = max(1, config.min_pages_per_range)
+        self.artifact = resolve_artifact(config.artifact)
+        if self.artifact is LOCAL_ARTIFACT:
             self.logger.info("使用./docling_artifact的本地模型")
-            self.artifact = artifact
-        else:
-            self.artifact = config.artifact
         self.attachments: list[AttachMent] = []
 
     def convert(self, document) -> MarkdownDocument:
         assert isinstance(document.name, str)
         self.logger.info(f"正在将文档转换为markdown")
         time1 = time.time()
-        document_stream = DocumentStream(name=document.name, stream=BytesIO(document.content))
-        content = self.file2markdown_embed_images(document_stream)
+        page_ranges = self._plan_page_ranges(document)
+        if page_ranges:
+            content = self.file2markdown_parallel(document, page_ranges)
+        else:
+            document_stream = DocumentStream(name=document.name, stream=BytesIO(document.content))
+            content = self.file2markdown_embed_images(document_stream)
         self.logger.info(f"已转换为markdown，耗时{time.time() - time1}秒")
         self.attachments.append(AttachMent("docling",MarkdownDocument.from_bytes(content=content.encode("utf-8"), suffix=".md", stem="docling")))
         md_document = MarkdownDocument.from_bytes(content=content.encode("utf-8"), suffix=".md", stem=document.stem)
@@ -68,35 +273,82 @@ class ConverterDocling(X2MarkdownConverter):
         return [".pdf", ".docx", ".pptx", ".xlsx", ".md", "html", "xhtml", "csv", ".png", ".jpg", ".jpeg", ".tiff",
                 ".bmp", ".webp"]
 
+    def _plan_page_ranges(self, document: Document) -> list[tuple[int, int]] | None:
+        if self.parallelism <= 1 or document.suffix.lower() != ".pdf":
+            return None
+        page_count = count_pdf_pages(document.content)
+        if not page_count or page_count <= self.min_pages_per_range:
+            return None
+        page_ranges = split_page_ranges(page_count, self.parallelism, self.min_pages_per_range)
+        return page_ranges if len(page_ranges) > 1 else None
+
+    def _worker_args(self) -> tuple:
+        # 各进程平分CPU线程，避免超额订阅
+        total_threads = self.num_threads or os.cpu_count() or 1
+        return self.code, self.formula, self.artifact, self.images_scale, max(1, total_threads // self.parallelism)
+
+    def _submit_page_ranges(self, document: Document, page_ranges: list[tuple[int, int]]):
+        """将PDF按页码区间分发到常驻进程池，返回按页码顺序排列的future"""
+        worker_args = self._worker_args()
+        self.logger.info(f"PDF按{len(page_ranges)}个页码区间在{self.parallelism}个进程中并行转换")
+        executor = get_page_executor(self.parallelism, worker_args)
+        content = document.content
+        return [executor.submit(_convert_page_range, content, document.name, page_range, *worker_args)
+                for page_range in page_ranges]
+
+    def file2markdown_parallel(self, document: Document, page_ranges: list[tuple[int, int]]) -> str:
+        """并行转换各页码区间，按原顺序拼接结果"""
+        futures = self._submit_page_ranges(document, page_ranges)
+        parts = []
+        try:
+            for page_range, future in zip(page_ranges, futures):
+                parts.append(future.result())
+                self.logger.info(f"已完成第{page_range[0]}-{page_range[1]}页的转换")
+        finally:
+            for future in futures:
+                future.cancel()
+        return join_markdown_parts(parts) + "\n"
+
+    async def convert_stream_async(self, document: Document) -> AsyncIterator[str]:
+        page_ranges = self._plan_page_ranges(document)
+        if not page_ranges:
+            async for part in super().convert_stream_async(document):
+                yield part
+            return
+        assert isinstance(document.name, str)
+        self.logger.info("正在将文档分段转换为markdown")
+        time1 = time.time()
+        futures = self._submit_page_ranges(document, page_ranges)
+        parts = []
+        try:
+            for page_range, future in zip(page_ranges, futures):
+                part = await asyncio.wrap_future(future)
+                self.logger.info(f"已完成第{page_range[0]}-{page_range[1]}页的转换")
+                parts.append(part)
+                yield part
+        finally:
+            for future in futures:
+                future.cancel()
+        self.logger.info(f"已转换为markdown，耗时{time.time() - time1}秒")
+        content = join_markdown_parts(parts) + "\n"
+        self.attachments.append(AttachMent("docling",MarkdownDocument.from_bytes(content=content.encode("utf-8"), suffix=".md", stem="docling")))
+
     def file2markdown_embed_images(self, file_path: Path | str | DocumentStream) -> str:
-        pipeline_options = PdfPipelineOptions(artifacts_path=self.artifact)
-        pipeline_options.do_ocr = False
-        pipeline_options.images_scale = IMAGE_RESOLUTION_SCALE
-        pipeline_options.generate_picture_images = True
-        # pipeline_options.table_structure_options.mode = TableFormerMode.FAST
-        pipeline_options.table_structure_options.do_cell_matching = False
-        if self.formula:
-            pipeline_options.do_formula_enrichment = True
-        if self.code:
-            pipeline_options.do_code_enrichment = True
-        # pipeline_options.accelerator_options= AcceleratorOptions(
-        #     num_threads=4, device=AcceleratorDevice.AUTO
-        # )
         # 打印时间
         settings.debug.profile_pipeline_timings = True
-        converter = DocumentConverter(format_options={
-            InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
-
-        })
-        try:
-            conversion_result = converter.convert(file_path)
-            result = conversion_result.document.export_to_markdown(image_mode=ImageRefMode.EMBEDDED)
-        except LocalEntryNotFoundError:
-            self.logger.info(f"无法连接huggingface，正在尝试换源")
-            os.environ['HF_ENDPOINT'] = 'https://hf-mirror.com'
-            conversion_result = converter.convert(file_path)
-            result = conversion_result.document.export_to_markdown(image_mode=ImageRefMode.EMBEDDED)
-            # translater_logger.info(f"docling转换耗时: {conversion_result.timings["pipeline_total"].times}")
+        with docling_converter_pool.acquire(self.code, self.formula, self.artifact, self.images_scale,
+                                            self.num_threads) as converter:
+            try:
+                conversion_result = converter.convert(file_path)
+                result = conversion_result.document.export_to_markdown(image_mode=ImageRefMode.EMBEDDED)
+            except LocalEntryNotFoundError:
+                self.logger.info(f"无法连接huggingface，正在尝试换源")
+                os.environ['HF_ENDPOINT'] = 'https://hf-mirror.com'
+                if isinstance(file_path, DocumentStream):
+                    file_path.stream.seek(0)
+                conversion_result = converter.convert(file_path)
+                result = conversion_result.document.export_to_markdown(image_mode=ImageRefMode.EMBEDDED)
+                # translater_logger.info(f"docling转换耗时: {conversion_result.timings["pipeline_total"].times}")
         return result
 
 
@@ -2,9 +2,12 @@
 # SPDX-License-Identifier: MPL-2.0
 
 import asyncio
+import os
+import tempfile
 import time
 import zipfile
 from dataclasses import dataclass
+from pathlib import Path
 from typing import Hashable, Literal
 
 import httpx
@@ -16,6 +19,8 @@ from collabtrans.ir.markdown_document import MarkdownDocument
 from collabtrans.utils.markdown_utils import embed_inline_image_from_zip
 
 URL = 'https://mineru.net/api/v4/file-urls/batch'
+# 流式下载解析结果时每次写入磁盘的块大小
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
 
 
 @dataclass(kw_only=True)
@@ -138,9 +143,11 @@ class ConverterMineru(X2MarkdownConverter):
         time1 = time.time()
         batch_id = self.upload(document)
         file_url = self.get_file_url(batch_id)
-        content, mineru_parsed = get_md_from_zip_url_with_inline_images(zip_url=file_url)
-        if mineru_parsed:
-            self.attachments.append(AttachMent("mineru",Document.from_bytes(content=mineru_parsed, suffix=".zip", stem="mineru")))
+        content, mineru_zip_path = get_md_from_zip_url_with_inline_images(zip_url=file_url)
+        if mineru_zip_path:
+            # 以文件引用保存解析结果，避免大体积zip常驻内存；附件对象释放时删除临时文件
+            self.attachments.append(AttachMent("mineru", Document.from_file_reference(
+                mineru_zip_path, suffix=".zip", stem="mineru", delete_on_release=True)))
         self.logger.info(f"已转换为markdown，耗时{time.time() - time1}秒")
         md_document = MarkdownDocument.from_bytes(content=content.encode("utf-8"), suffix=".md", stem=document.stem)
         return md_document
@@ -150,9 +157,11 @@ class ConverterMineru(X2MarkdownConverter):
         time1 = time.time()
         batch_id = await self.upload_async(document)
         file_url = await self.get_file_url_async(batch_id)
-        content, mineru_parsed = await get_md_from_zip_url_with_inline_images_async(zip_url=file_url)
-        if mineru_parsed:
-            self.attachments.append(AttachMent("mineru",Document.from_bytes(content=mineru_parsed, suffix=".zip", stem="mineru")))
+        content, mineru_zip_path = await get_md_from_zip_url_with_inline_images_async(zip_url=file_url)
+        if mineru_zip_path:
+            # 以文件引用保存解析结果，避免大体积zip常驻内存；附件对象释放时删除临时文件
+            self.attachments.append(AttachMent("mineru", Document.from_file_reference(
+                mineru_zip_path, suffix=".zip", stem="mineru", delete_on_release=True)))
         self.logger.info(f"已转换为markdown，耗时{time.time() - time1}秒")
         md_document = MarkdownDocument.from_bytes(content=content.encode("utf-8"), suffix=".md", stem=document.stem)
         return md_document
@@ -161,13 +170,26 @@ class ConverterMineru(X2MarkdownConverter):
         return [".pdf", ".doc", ".docx", ".ppt", ".pptx", ".png", ".jpg", ".jpeg"]
 
 
+def _new_download_path() -> Path:
+    fd, path = tempfile.mkstemp(prefix="collabtrans_mineru_", suffix=".zip")
+    os.close(fd)
+    return Path(path)
+
+
+def _remove_download(path: Path):
+    try:
+        path.unlink()
+    except OSError:
+        pass
+
+
 def get_md_from_zip_url_with_inline_images(
         zip_url: str,
         filename_in_zip: str = "full.md",
         encoding: str = "utf-8"
-) -> tuple[str, bytes]:
+) -> tuple[str, Path]:
     """
-    从给定的ZIP文件URL中下载并提取指定文件的内容，
+    从给定的ZIP文件URL中流式下载ZIP到临时文件，提取指定文件的内容，
     并将Markdown文件中的相对路径图片转换为内联Base64图片。
 
     Args:
@@ -175,26 +197,40 @@ def get_md_from_zip_url_with_inline_images(
         filename_in_zip (str): ZIP压缩包内目标Markdown文件的名称（包括路径）。
                                默认为 "full.md"。
         encoding (str): 目标文件的预期编码。默认为 "utf-8"。
+
+    Returns:
+        tuple[str, Path]: 处理后的Markdown文本，以及下载到磁盘的ZIP临时文件路径（由调用方负责清理）。
     """
+    zip_path = _new_download_path()
     try:
-        print(f"正在从 {zip_url} 下载ZIP文件 (使用 httpx.get)...")
-        response = client.get(zip_url)  # 增加超时
-        response.raise_for_status()
+        print(f"正在从 {zip_url} 流式下载ZIP文件 (使用 httpx.stream)...")
+        with client.stream("GET", zip_url) as response:
+            if response.is_error:
+                response.read()
+            response.raise_for_status()
+            with open(zip_path, "wb") as f:
+                for chunk in response.iter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
         print("ZIP文件下载完成。")
-        return embed_inline_image_from_zip(response.content, filename_in_zip=filename_in_zip,
-                                           encoding=encoding), response.content
+        return embed_inline_image_from_zip(zip_path, filename_in_zip=filename_in_zip,
+                                           encoding=encoding), zip_path
 
 
     except httpx.HTTPStatusError as e:
+        _remove_download(zip_path)
         raise Exception(
             f"HTTP 错误 (httpx): {e.response.status_code} - {e.request.url}\n响应内容: {e.response.text[:200]}...")
     except httpx.RequestError as e:
+        _remove_download(zip_path)
         raise Exception(f"下载ZIP文件时发生错误 (httpx): {e}")
     except zipfile.BadZipFile:
+        _remove_download(zip_path)
         raise Exception("错误: 下载的文件不是一个有效的ZIP压缩文件或已损坏。")
     except UnicodeDecodeError:
+        _remove_download(zip_path)
         raise Exception(f"错误: 无法使用 '{encoding}' 编码解码文件 '{filename_in_zip}' 的内容。")
     except Exception as e:
+        _remove_download(zip_path)
         import traceback
         traceback.print_exc()  # 打印完整的堆栈跟踪，便于调试
         raise Exception(f"发生未知错误: {e}")
@@ -204,10 +240,11 @@ async def get_md_from_zip_url_with_inline_images_async(
         zip_url: str,
         filename_in_zip: str = "full.md",
         encoding: str = "utf-8"
-) -> tuple[str, bytes]:
+) -> tuple[str, Path]:
     """
-    从给定的ZIP文件URL中下载并提取指定文件的内容，
+    从给定的ZIP文件URL中流式下载ZIP到临时文件，提取指定文件的内容，
     并将Markdown文件中的相对路径图片转换为内联Base64图片。
+    下载按块写入磁盘，解析时按需读取压缩包成员，内存占用与ZIP大小无关。
 
     Args:
         zip_url (str): ZIP文件的下载链接。
@@ -216,27 +253,41 @@ async def get_md_from_zip_url_with_inline_images_async(
         encoding (str): 目标文件的预期编码。默认为 "utf-8"。
 
     Returns:
-        str : 如果成功，返回处理后的Markdown文本内容。
+        tuple[str, Path]: 处理后的Markdown文本，以及下载到磁盘的ZIP临时文件路径（由调用方负责清理）。
     """
+    zip_path = _new_download_path()
     try:
-        print(f"正在从 {zip_url} 下载ZIP文件 (使用 httpx.get)...")
-        response = await client_async.get(zip_url)  # 增加超时
-        response.raise_for_status()
+        print(f"正在从 {zip_url} 流式下载ZIP文件 (使用 httpx.stream)...")
+        async with client_async.stream("GET", zip_url) as response:
+            if response.is_error:
+                await response.aread()
+            response.raise_for_status()
+            with open(zip_path, "wb") as f:
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
         print("ZIP文件下载完成。")
-        return await asyncio.to_thread(embed_inline_image_from_zip, response.content, filename_in_zip=filename_in_zip,
-                                       encoding=encoding), response.content
+        return await asyncio.to_thread(embed_inline_image_from_zip, zip_path, filename_in_zip=filename_in_zip,
+                                       encoding=encoding), zip_path
 
 
     except httpx.HTTPStatusError as e:
+        _remove_download(zip_path)
         raise Exception(
             f"HTTP 错误 (httpx): {e.response.status_code} - {e.request.url}\n响应内容: {e.response.text[:200]}...")
     except httpx.RequestError as e:
+        _remove_download(zip_path)
         raise Exception(f"下载ZIP文件时发生错误 (httpx): {e}")
     except zipfile.BadZipFile:
+        _remove_download(zip_path)
         raise Exception("错误: 下载的文件不是一个有效的ZIP压缩文件或已损坏。")
     except UnicodeDecodeError:
+        _remove_download(zip_path)
         raise Exception(f"错误: 无法使用 '{encoding}' 编码解码文件 '{filename_in_zip}' 的内容。")
+    except asyncio.CancelledError:
+        _remove_download(zip_path)
+        raise
     except Exception as e:
+        _remove_download(zip_path)
         import traceback
         traceback.print_exc()  # 打印完整的堆栈跟踪，便于调试
         raise Exception(f"发生未知错误: {e}")
@@ -7,12 +7,12 @@ from dataclasses import dataclass
 from io import BytesIO, StringIO
 from typing import Hashable
 
-# 引入 chardet 用于编码检测
-import chardet
 import openpyxl
 
 from collabtrans.converter.x2xlsx.base import X2XlsxConverter, X2XlsxConverterConfig
 from collabtrans.ir.document import Document
+from collabtrans.utils.csv_stream import (ENCODING_SAMPLE_SIZE, DIALECT_SAMPLE_SIZE, detect_csv_encoding,
+                                          sniff_csv_dialect)
 
 
 # 配置一个基本的日志记录器（如果您的项目尚未配置）
@@ -47,9 +47,7 @@ class ConverterCsv2Xlsx(X2XlsxConverter):
         try:
             # --- 1. 自动检测文件编码 ---
             # 为提高性能，只取文件头部一部分进行检测
-            detection_result = chardet.detect(document.content[:4096])
-            encoding = detection_result['encoding'] or 'utf-8'  # 提供一个默认值
-            confidence = detection_result['confidence']
+            encoding, confidence = detect_csv_encoding(document.content[:ENCODING_SAMPLE_SIZE])
             self.logger.info(f"检测到文件编码为: {encoding} (置信度: {confidence:.2%})")
 
             # --- 2. 解码并创建文本流 ---
@@ -62,15 +60,14 @@ class ConverterCsv2Xlsx(X2XlsxConverter):
             csv_text_stream = StringIO(decoded_content)
 
             # --- 3. 自动识别CSV方言（如分隔符） ---
-            try:
-                # Sniffer需要一些数据来嗅探，如果文件太小可能失败
-                dialect = csv.Sniffer().sniff(csv_text_stream.read(2048))
-                csv_text_stream.seek(0)  # 将流指针重置回文件开头
+            # Sniffer需要一些数据来嗅探，如果文件太小可能失败
+            dialect = sniff_csv_dialect(csv_text_stream.read(DIALECT_SAMPLE_SIZE))
+            csv_text_stream.seek(0)  # 将流指针重置回文件开头
+            if dialect is not None:
                 self.logger.info(f"检测到CSV分隔符为: '{dialect.delimiter}'")
-            except csv.Error:
+            else:
                 self.logger.warning("无法自动识别CSV方言，将使用默认的逗号分隔符。")
                 dialect = 'excel'  # 使用默认方言
-                csv_text_stream.seek(0)
 
             csv_reader = csv.reader(csv_text_stream, dialect)
 
@@ -2,31 +2,143 @@
 # SPDX-License-Identifier: MPL-2.0
 
 import base64
+import hashlib
+import html
 import io
 import os
+import posixpath
 import zipfile
 from dataclasses import dataclass
+from typing import BinaryIO
+from urllib.parse import quote, unquote, urlsplit
 from xml.etree import ElementTree
 from pathlib import Path
 import re
 import mimetypes
 
 from bs4 import BeautifulSoup
+from lxml import etree
 
 from collabtrans.exporter.base import ExporterConfig
 from collabtrans.exporter.epub.base import EpubExporter
 from collabtrans.ir.document import Document
+from collabtrans.utils.epub_utils import CHAPTER_MEDIA_TYPES, read_manifest, parse_chapter
+from collabtrans.utils.zip_utils import open_zip
+
+XLINK_HREF = '{http://www.w3.org/1999/xlink}href'
+XML_LANG = '{http://www.w3.org/XML/1998/namespace}lang'
+NCX_NS = {'ncx': 'http://www.daisy.org/z3986/2005/ncx/'}
+# 这些属性引用的是压缩包内的资源（图片、音视频等）
+RESOURCE_ATTRIBUTES = ('src', 'poster', 'data')
+# 章节片段嵌入与服务同源的索引页，其中可执行脚本的元素、事件属性与脚本URL都要去掉
+SCRIPT_TAGS = ('{*}script', '{*}noscript')
+URL_ATTRIBUTES = ('href', 'xlink:href', 'src', 'poster', 'data', 'action', 'formaction', 'background')
+_SCRIPT_URL_PATTERN = re.compile(r'^(javascript:|vbscript:|data:text/html)', re.IGNORECASE)
+# 浏览器解析URL时会忽略的空白与控制字符，如 "java\tscript:"
+_URL_IGNORED_CHARS = re.compile(r'[\x00-\x20]')
+
+PAGED_STYLE = """
+        body {
+            max-width: 800px;
+            margin: 0 auto;
+            padding: 20px;
+            font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif;
+            line-height: 1.6;
+            color: #333;
+        }
+        img {
+            max-width: 100%;
+            height: auto;
+        }
+        .chapter {
+            margin-bottom: 2em;
+        }
+        .chapter[data-src] {
+            min-height: 100vh;
+        }
+        .chapter-loading, .chapter-error::before {
+            color: #999;
+        }
+        .chapter-error::before {
+            content: "章节加载失败，点击目录重试";
+        }
+        pre {
+            white-space: pre-wrap;
+            word-wrap: break-word;
+        }"""
+
+# 章节进入视口附近时才请求其片段；点击目录或章节间链接时先加载目标章节再跳转
+PAGED_SCRIPT = """
+(function () {
+    const pending = new Map();
+
+    function load(section) {
+        const src = section.getAttribute('data-src');
+        if (!src) return Promise.resolve();
+        if (pending.has(section)) return pending.get(section);
+        const request = fetch(src)
+            .then(response => {
+                if (!response.ok) throw new Error(response.status);
+                return response.text();
+            })
+            .then(text => {
+                section.innerHTML = text;
+                section.removeAttribute('data-src');
+                section.classList.remove('chapter-error');
+            })
+            .catch(() => section.classList.add('chapter-error'))
+            .finally(() => pending.delete(section));
+        pending.set(section, request);
+        return request;
+    }
+
+    const sections = document.querySelectorAll('section.chapter[data-src]');
+    if ('IntersectionObserver' in window) {
+        const observer = new IntersectionObserver(entries => {
+            entries.forEach(entry => {
+                if (entry.isIntersecting) load(entry.target);
+            });
+        }, {rootMargin: '1500px 0px'});
+        sections.forEach(section => observer.observe(section));
+    } else {
+        sections.forEach(load);
+    }
+
+    document.addEventListener('click', event => {
+        const link = event.target.closest('a[href^="#chapter-"]');
+        if (!link) return;
+        const target = document.getElementById(link.getAttribute('href').slice(1));
+        if (target && target.hasAttribute('data-src')) {
+            event.preventDefault();
+            load(target).then(() => target.scrollIntoView());
+        }
+    });
+})();
+    """
+
+# 索引页的内容安全策略：只允许页面自身的脚本（按哈希），章节中残留的内联事件与脚本URL都不会执行
+PAGED_CONTENT_SECURITY_POLICY = (
+    f"script-src 'sha256-{base64.b64encode(hashlib.sha256(PAGED_SCRIPT.encode('utf-8')).digest()).decode()}'; "
+    "object-src 'none'; base-uri 'none'; form-action 'none'"
+)
 
 
 @dataclass
 class Epub2HTMLExporterConfig(ExporterConfig):
     cdn: bool = True
+    # 分章节导出：只生成目录与章节占位的索引页，章节片段与图片、样式表在阅读时按需加载，不内嵌为data URI
+    paginate: bool = False
+    # 分章节导出时的URL前缀：章节片段为 {base_url}chapters/{序号}，资源为 {base_url}resources/{压缩包内路径}
+    base_url: str = ""
 
 
 class Epub2HTMLExporter(EpubExporter):
     def __init__(self, config: Epub2HTMLExporterConfig = None):
         config = config or Epub2HTMLExporterConfig()
         super().__init__(config=config)
+        # 单次导出内的资源缓存：同一图片或样式表被多个章节引用时只读取、编码一次
+        self._data_uri_cache: dict[str, str | None] = {}
+        self._css_cache: dict[tuple[str, str], str | None] = {}
 
     def _extract_opf_path(self, zip_file):
         """从 META-INF/container.xml 中提取 OPF 文件路径"""
@@ -85,7 +197,22 @@ class Epub2HTMLExporter(EpubExporter):
 
         return manifest_items, reading_order
 
-    def _process_html_content(self, html_content, zip_file, base_path, manifest_items):
+    def _data_uri(self, zip_file, resource_path):
+        """读取压缩包内的资源并转换为 base64 data URI，资源不存在或类型未知时返回 None"""
+        if resource_path not in self._data_uri_cache:
+            data_uri = None
+            try:
+                resource_data = zip_file.read(resource_path)
+                # 获取 MIME 类型
+                mime_type, _ = mimetypes.guess_type(resource_path)
+                if mime_type:
+                    data_uri = f"data:{mime_type};base64,{base64.b64encode(resource_data).decode('utf-8')}"
+            except KeyError:
+                pass
+            self._data_uri_cache[resource_path] = data_uri
+        return self._data_uri_cache[resource_path]
+
+    def _process_html_content(self, html_content, zip_file, base_path, manifest_items) -> BeautifulSoup:
         """处理 HTML 内容，内嵌图片和样式"""
         soup = BeautifulSoup(html_content, 'html.parser')
 
@@ -93,20 +220,10 @@ class Epub2HTMLExporter(EpubExporter):
         for img in soup.find_all('img'):
             src = img.get('src')
             if src:
-                # 构建完整路径
-                img_path = self._resolve_path(base_path, src)
-                try:
-                    img_data = zip_file.read(img_path)
-                    # 获取 MIME 类型
-                    mime_type, _ = mimetypes.guess_type(img_path)
-                    if mime_type:
-                        # 转换为 base64 data URI
-                        img_base64 = base64.b64encode(img_data).decode('utf-8')
-                        data_uri = f"data:{mime_type};base64,{img_base64}"
-                        img['src'] = data_uri
-                except KeyError:
-                    # 如果图片不存在，保持原路径
-                    pass
+                # 构建完整路径，如果图片不存在，保持原路径
+                data_uri = self._data_uri(zip_file, self._resolve_path(base_path, src))
+                if data_uri:
+                    img['src'] = data_uri
 
         # 处理内联样式 (<style> 标签)
         for style_tag in soup.find_all('style'):
@@ -121,20 +238,26 @@ class Epub2HTMLExporter(EpubExporter):
             href = link.get('href')
             if href:
                 css_path = self._resolve_path(base_path, href)
-                try:
-                    css_content = zip_file.read(css_path).decode('utf-8')
-                    # 处理 CSS 中的 URL 引用
-                    css_content = self._process_css_urls(css_content, zip_file, base_path)
-
+                # CSS 中的 url() 按章节所在目录解析，缓存键需包含该目录
+                css_key = (css_path, os.path.dirname(base_path))
+                if css_key not in self._css_cache:
+                    try:
+                        css_content = zip_file.read(css_path).decode('utf-8')
+                        # 处理 CSS 中的 URL 引用
+                        self._css_cache[css_key] = self._process_css_urls(css_content, zip_file, base_path)
+                    except (KeyError, UnicodeDecodeError):
+                        self._css_cache[css_key] = None
+                css_content = self._css_cache[css_key]
+                if css_content is not None:
                     # 替换 link 标签为 style 标签
                     style_tag = soup.new_tag('style')
                     style_tag.string = css_content
                     link.replace_with(style_tag)
-                except (KeyError, UnicodeDecodeError):
+                else:
                     # 如果样式表不存在或无法解码，移除 link 标签
                     link.decompose()
 
-        return str(soup)
+        return soup
 
     def _process_css_urls(self, css_content, zip_file, base_path):
         """处理 CSS 中的 url() 引用"""
@@ -144,15 +267,9 @@ class Epub2HTMLExporter(EpubExporter):
             if url.startswith(('http://', 'https://', 'data:')):
                 return match.group(0)  # 保持外部链接不变
 
-            try:
-                resource_path = self._resolve_path(base_path, url)
-                resource_data = zip_file.read(resource_path)
-                mime_type, _ = mimetypes.guess_type(resource_path)
-                if mime_type:
-                    resource_base64 = base64.b64encode(resource_data).decode('utf-8')
-                    return f'url("data:{mime_type};base64,{resource_base64}")'
-            except KeyError:
-                pass
+            data_uri = self._data_uri(zip_file, self._resolve_path(base_path, url))
+            if data_uri:
+                return f'url("{data_uri}")'
 
             return match.group(0)  # 保持原样
 
@@ -186,14 +303,205 @@ class Epub2HTMLExporter(EpubExporter):
             print(f"文件: {file_info.filename}")
         print("==================")
 
+    # --- 分章节导出 ---
+
+    @staticmethod
+    def _epub_source(document: Document) -> bytes | Path:
+        return document.path if document.is_file_backed else document.content
+
+    def _paged_layout(self, zip_file: zipfile.ZipFile) -> tuple[list[str], dict[str, str]]:
+        """返回 (按阅读顺序排列的章节路径, 章节路径 -> 目录标题)，无法解析 OPF 时按文件名排序"""
+        try:
+            _, manifest_items, spine_itemrefs = read_manifest(zip_file)
+        except (ValueError, KeyError, AttributeError, etree.XMLSyntaxError):
+            return self._find_html_files(zip_file), {}
+        chapters = []
+        for idref in spine_itemrefs:
+            item = manifest_items.get(idref)
+            if item and item['media_type'] in CHAPTER_MEDIA_TYPES and item['href'] in zip_file.NameToInfo:
+                chapters.append(item['href'])
+        return chapters or self._find_html_files(zip_file), self._toc_titles(zip_file, manifest_items)
+
+    @staticmethod
+    def _toc_titles(zip_file: zipfile.ZipFile, manifest_items: dict) -> dict[str, str]:
+        """从 EPUB3 的导航文档或 EPUB2 的 NCX 中读取各章节的标题，不解析章节本身"""
+        titles = {}
+
+        def add(toc_path: str, href: str, text: str):
+            target = unquote(urlsplit(href).path)
+            if target and text and text.strip():
+                path = posixpath.normpath(posixpath.join(posixpath.dirname(toc_path), target))
+                titles.setdefault(path, ' '.join(text.split()))
+
+        for item in manifest_items.values():
+            try:
+                if 'nav' in item['properties']:
+                    root, _ = parse_chapter(zip_file.read(item['href']))
+                    for element in root.iter('{*}a'):
+                        if element.get('href'):
+                            add(item['href'], element.get('href'), ''.join(element.itertext()))
+                elif item['media_type'] == 'application/x-dtbncx+xml':
+                    root = etree.fromstring(zip_file.read(item['href']),
+                                            etree.XMLParser(resolve_entities=False, no_network=True))
+                    for point in root.iter('{%s}navPoint' % NCX_NS['ncx']):
+                        content = point.find('ncx:content', NCX_NS)
+                        if content is not None and content.get('src'):
+                            add(item['href'], content.get('src'), point.findtext('ncx:navLabel/ncx:text',
+                                                                                   namespaces=NCX_NS))
+            except (KeyError, etree.XMLSyntaxError):
+                continue
+        return titles
+
+    def _resource_url(self, base_path: str, url: str) -> str | None:
+        """压缩包内资源的按需加载地址；外部链接、页内锚点等返回 None"""
+        parts = urlsplit(url)
+        if parts.scheme or parts.netloc or not parts.path:
+            return None
+        path = posixpath.normpath(posixpath.join(posixpath.dirname(base_path), unquote(parts.path)))
+        return f"{self.config.base_url}resources/{quote(path)}"
+
+    def _process_paged_css(self, css_content: str, base_path: str) -> str:
+        def replace_url(match):
+            resource_url = self._resource_url(base_path, match.group(1).strip().strip('\'"'))
+            return f'url("{resource_url}")' if resource_url else match.group(0)
+
+        return re.sub(r'url\(([^)]+)\)', replace_url, css_content)
+
+    @staticmethod
+    def _remove_keeping_tail(element: etree._Element):
+        parent = element.getparent()
+        if parent is None:
+            return
+        if element.tail:
+            previous = element.getprevious()
+            if previous is not None:
+                previous.tail = (previous.tail or '') + element.tail
+            else:
+                parent.text = (parent.text or '') + element.tail
+        parent.remove(element)
+
+    def _rewrite_chapter_links(self, root: etree._Element, base_path: str, chapter_anchors: dict[str, str]):
+        """
+        去掉命名空间（片段嵌入HTML页面），并把资源引用改为按需加载地址、章节间链接改为索引页内的锚点。
+        同时去掉脚本元素、事件属性（on*）与 javascript: 等脚本URL
+        """
+        for element in list(root.iter(*SCRIPT_TAGS)):
+            self._remove_keeping_tail(element)
+        for element in root.iter():
+            if not isinstance(element.tag, str):
+                continue
+            element.tag = etree.QName(element).localname
+            for name in [name for name in element.attrib if name.startswith('{')]:
+                value = element.attrib.pop(name)
+                if name == XLINK_HREF:
+                    element.set('href', value)
+                elif name == XML_LANG:
+                    element.set('lang', value)
+            for name in list(element.attrib):
+                if name.lower().startswith('on') or name.lower() == 'srcdoc' or (
+                        name.lower() in URL_ATTRIBUTES
+                        and _SCRIPT_URL_PATTERN.match(_URL_IGNORED_CHARS.sub('', element.get(name)))):
+                    del element.attrib[name]
+            for name in RESOURCE_ATTRIBUTES:
+                resource_url = self._resource_url(base_path, element.get(name, ''))
+                if resource_url:
+                    element.set(name, resource_url)
+            href = element.get('href')
+            if href:
+                parts = urlsplit(href)
+                target = posixpath.normpath(posixpath.join(posixpath.dirname(base_path), unquote(parts.path)))
+                if parts.path and not parts.scheme and not parts.netloc and target in chapter_anchors:
+                    element.set('href', chapter_anchors[target])
+                elif element.tag != 'a' or not (parts.scheme or parts.netloc or not parts.path):
+                    element.set('href', self._resource_url(base_path, href) or href)
+            if element.get('style'):
+                element.set('style', self._process_paged_css(element.get('style'), base_path))
+            if element.tag == 'style' and element.text:
+                element.text = self._process_paged_css(element.text, base_path)
+        etree.cleanup_namespaces(root)
+
+    def write_index(self, document: Document, output: BinaryIO):
+        """流式写出分章节导出的索引页：目录与每个章节的占位，章节内容由页面脚本按需加载"""
+        with open_zip(self._epub_source(document)) as zip_file:
+            chapters, titles = self._paged_layout(zip_file)
+        base_url = html.escape(self.config.base_url)
+        output.write(f"""<!DOCTYPE html>
+<html lang="zh">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{html.escape(document.stem or "")}</title>
+    <style>{PAGED_STYLE}
+    </style>
+</head>
+<body>
+""".encode('utf-8'))
+        if titles:
+            output.write(b'    <nav class="toc">\n        <ol>\n')
+            for index, path in enumerate(chapters):
+                if path in titles:
+                    output.write(f'            <li><a href="#chapter-{index}">{html.escape(titles[path])}</a></li>\n'
+                                 .encode('utf-8'))
+            output.write(b'        </ol>\n    </nav>\n')
+        output.write(b'    <div class="epub-content">\n')
+        for index, path in enumerate(chapters):
+            label = html.escape(titles.get(path) or posixpath.basename(path))
+            output.write(f'        <section class="chapter" id="chapter-{index}" '
+                         f'data-src="{base_url}chapters/{index}"><p class="chapter-loading">{label}</p></section>\n'
+                         .encode('utf-8'))
+        output.write(f"""    </div>
+    <script>{PAGED_SCRIPT}</script>
+</body>
+</html>""".encode('utf-8'))
+
+    def write_chapter(self, document: Document, index: int, output: BinaryIO):
+        """
+        流式写出第 index 个章节的HTML片段（样式与正文），逐个序列化正文的子元素。
+        序号超出范围时抛出 IndexError。
+        """
+        with open_zip(self._epub_source(document)) as zip_file:
+            chapters, _ = self._paged_layout(zip_file)
+            if not 0 <= index < len(chapters):
+                raise IndexError(f"章节序号超出范围: {index}")
+            base_path = chapters[index]
+            root, _ = parse_chapter(zip_file.read(base_path))
+        self._rewrite_chapter_links(root, base_path, {path: f"#chapter-{i}" for i, path in enumerate(chapters)})
+        head = root.find('head')
+        body = root.find('body')
+        if head is not None:
+            for element in head.iter('style', 'link'):
+                if element.tag == 'style' or 'stylesheet' in (element.get('rel') or '').lower().split():
+                    element.tail = None
+                    output.write(etree.tostring(element, method='html', encoding='utf-8') + b'\n')
+        if body is None:
+            body = root
+        if body.text:
+            output.write(html.escape(body.text).encode('utf-8'))
+        for element in body:
+            output.write(etree.tostring(element, method='html', encoding='utf-8'))
+
+    def read_resource(self, document: Document, path: str) -> bytes | None:
+        """读取压缩包内的资源（图片、字体、样式表等），不存在时返回 None"""
+        with open_zip(self._epub_source(document)) as zip_file:
+            try:
+                return zip_file.read(path)
+            except KeyError:
+                return None
+
     def export(self, document: Document) -> Document:
         """
-        将 EPUB 文件的二进制内容转换为单个 HTML 文件。
+        将 EPUB 文件的二进制内容转换为单个 HTML 文件；分章节导出时只返回索引页。
 
         :param document: 包含 EPUB 二进制内容的 Document 对象。
         :return: 包含单个 HTML 文件内容的 Document 对象。
         """
+        if self.config.paginate:
+            output = io.BytesIO()
+            self.write_index(document, output)
+            return Document.from_bytes(content=output.getvalue(), suffix=".html", stem=document.stem)
         epub_bytes = document.content
+        self._data_uri_cache.clear()
+        self._css_cache.clear()
 
         with zipfile.ZipFile(io.BytesIO(epub_bytes), 'r') as zip_file:
             # 调试：打印 EPUB 结构
@@ -232,17 +540,13 @@ class Epub2HTMLExporter(EpubExporter):
                     for path_variant in possible_paths:
                         try:
                             html_content = zip_file.read(path_variant).decode('utf-8')
-                            processed_html = self._process_html_content(
+                            soup = self._process_html_content(
                                 html_content, zip_file, path_variant, manifest_items
                             )
 
                             # 提取 body 内容（如果存在）
-                            soup = BeautifulSoup(processed_html, 'html.parser')
                             body = soup.find('body')
-                            if body:
-                                combined_html_parts.append(str(body))
-                            else:
-                                combined_html_parts.append(processed_html)
+                            combined_html_parts.append(str(body) if body else str(soup))
 
                             processed_files.add(path_variant)
                             file_found = True
@@ -271,17 +575,13 @@ class Epub2HTMLExporter(EpubExporter):
 
                     try:
                         html_content = zip_file.read(html_file).decode('utf-8')
-                        processed_html = self._process_html_content(
+                        soup = self._process_html_content(
                             html_content, zip_file, html_file, {}
                         )
 
                         # 提取 body 内容（如果存在）
-                        soup = BeautifulSoup(processed_html, 'html.parser')
                         body = soup.find('body')
-                        if body:
-                            combined_html_parts.append(str(body))
-                        else:
-                            combined_html_parts.append(processed_html)
+                        combined_html_parts.append(str(body) if body else str(soup))
 
                         # print(f"备用方法成功处理: {html_file}")
 
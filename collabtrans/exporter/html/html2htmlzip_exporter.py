@@ -0,0 +1,15 @@
+# SPDX-FileCopyrightText: 2025 QinHan
+# SPDX-License-Identifier: MPL-2.0
+
+from collabtrans.exporter.base import ExporterConfig
+from collabtrans.exporter.html.base import HtmlExporter
+from collabtrans.ir.document import Document
+
+
+class Html2HtmlZipExporter(HtmlExporter):
+    def __init__(self, config: ExporterConfig | None = None):
+        super().__init__(config=config)
+
+    def export(self, document: Document) -> Document:
+        # 译文站点可能以文件引用保存，复制时不读入内存
+        return document.copy()
@@ -3,12 +3,10 @@
 import json
 from dataclasses import dataclass
 
-import jinja2
-
 from collabtrans.exporter.base import ExporterConfig
 from collabtrans.exporter.js.base import JsonExporter
 from collabtrans.ir.document import Document
-from collabtrans.utils.resource_utils import resource_path
+from collabtrans.utils.resource_utils import read_resource_text, load_template
 
 
 @dataclass
@@ -24,17 +22,14 @@ class Json2HTMLExporter(JsonExporter):
 
     def export(self, document: Document) -> Document:
         cdn = self.cdn
-        html_template = resource_path("template/json.html").read_text(encoding="utf-8")
+        html_template = load_template("template/json.html")
 
         # language=html
-        pico = f'<style>{resource_path("static/pico.css").read_text(encoding="utf-8")}</style>' if not cdn else r'<link rel="stylesheet" href="https://s4.zstatic.net/ajax/libs/picocss/2.1.1/pico.min.css" integrity="sha512-+4kjFgVD0n6H3xt19Ox84B56MoS7srFn60tgdWFuO4hemtjhySKyW4LnftYZn46k3THUEiTTsbVjrHai+0MOFw==" crossorigin="anonymous" referrerpolicy="no-referrer" />'
-        # language=html
-        renderjson=f'<script><{resource_path("static/renderjson.min.js").read_text(encoding="utf-8")}/script>'
+        pico = f'<style>{read_resource_text("static/pico.css")}</style>' if not cdn else r'<link rel="stylesheet" href="https://s4.zstatic.net/ajax/libs/picocss/2.1.1/pico.min.css" integrity="sha512-+4kjFgVD0n6H3xt19Ox84B56MoS7srFn60tgdWFuO4hemtjhySKyW4LnftYZn46k3THUEiTTsbVjrHai+0MOFw==" crossorigin="anonymous" referrerpolicy="no-referrer" />'
         json_data= document.content.decode()
-        render = jinja2.Template(html_template).render(
+        render = html_template.render(
             title=document.stem,
             pico=pico,
-            renderjson=renderjson,
             jsonData=json_data,
         )
         return Document.from_bytes(content=render.encode("utf-8"), suffix=".html", stem=document.stem)
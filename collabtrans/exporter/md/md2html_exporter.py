@@ -1,18 +1,199 @@
 # SPDX-FileCopyrightText: 2025 QinHan
 # SPDX-License-Identifier: MPL-2.0
-import re  # <--- 步骤 1: 导入 re 模块
+import hashlib
+import queue
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from dataclasses import dataclass
-import jinja2
+
 import markdown
+from markdown.blockprocessors import ReferenceProcessor
+
 from collabtrans.exporter.md.base import MDExporter, MDExporterConfig
 from collabtrans.ir.document import Document
 from collabtrans.ir.markdown_document import MarkdownDocument
-from collabtrans.utils.resource_utils import resource_path
+from collabtrans.utils.markdown_splitter import MarkdownBlockSplitter
+from collabtrans.utils.process_pool import get_process_pool
+from collabtrans.utils.resource_utils import read_resource_text, load_template
+
+# markdown扩展配置，公式由 arithmatex 输出后交给 KaTeX 渲染
+MARKDOWN_EXTENSIONS = [
+    'markdown.extensions.tables',
+    'pymdownx.arithmatex',
+    'pymdownx.superfences'
+]
+
+MARKDOWN_EXTENSION_CONFIGS = {
+    'pymdownx.arithmatex': {
+        'generic': True,
+        'block_tag': 'div',
+        'inline_tag': 'span',
+        'block_syntax': ['dollar', 'square'],
+        'inline_syntax': ['dollar', 'round'],
+        'tex_inline_wrap': ['\\(', '\\)'],
+        'tex_block_wrap': ['\\[', '\\]'],
+        'smart_dollar': True
+    },
+    'pymdownx.superfences': {
+        'custom_fences': [
+            {
+                'name': 'mermaid',
+                'class': 'mermaid',
+                'format': lambda source, language, css_class, options, md,
+                                 **kwargs: f'<pre class="{css_class}">{source}</pre>'
+            }
+        ]
+    }
+}
+
+# 复用已加载扩展的Markdown实例，Markdown实例不是线程安全的，每次转换独占一个
+_markdown_pool: "queue.SimpleQueue[markdown.Markdown]" = queue.SimpleQueue()
+
+
+@contextmanager
+def pooled_markdown():
+    try:
+        md = _markdown_pool.get_nowait()
+    except queue.Empty:
+        md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS, extension_configs=MARKDOWN_EXTENSION_CONFIGS)
+    try:
+        yield md
+    finally:
+        md.reset()
+        _markdown_pool.put(md)
+
+
+def render_markdown(content: str) -> str:
+    with pooled_markdown() as md:
+        return md.convert(content)
+
+
+# 分块渲染结果缓存：chunk哈希 -> html，按总字符数做LRU淘汰
+_RENDER_CACHE_MAX_CHARS = 64 * 1024 * 1024
+_render_cache: "OrderedDict[str, str]" = OrderedDict()
+_render_cache_chars = 0
+_render_cache_lock = threading.Lock()
+
+# 链接引用定义，如 `[id]: http://example.com "title"`。使用Python-Markdown自身的识别规则，
+# 使收集到的定义与整篇渲染时被当作定义的文本一致，`[Note]: 普通文本` 这样的段落不会被当作定义
+_REFERENCE_DEF_PATTERN = ReferenceProcessor.RE
+_HTML_OPEN_TAG_PATTERN = re.compile(r'^<([a-zA-Z][a-zA-Z0-9-]*)[\s>/]')
+_HTML_VOID_TAGS = {"br", "hr", "img", "input", "meta", "link", "source", "wbr", "area", "col", "embed"}
+
+
+def _render_cache_get(key: str) -> str | None:
+    with _render_cache_lock:
+        html = _render_cache.get(key)
+        if html is not None:
+            _render_cache.move_to_end(key)
+        return html
+
+
+def _render_cache_put(key: str, html: str):
+    global _render_cache_chars
+    with _render_cache_lock:
+        if key in _render_cache:
+            return
+        _render_cache[key] = html
+        _render_cache_chars += len(html)
+        while _render_cache_chars > _RENDER_CACHE_MAX_CHARS and len(_render_cache) > 1:
+            _, evicted = _render_cache.popitem(last=False)
+            _render_cache_chars -= len(evicted)
+
+
+def _opens_unclosed_html(block: str) -> bool:
+    match = _HTML_OPEN_TAG_PATTERN.match(block)
+    if not match:
+        return False
+    tag = match.group(1).lower()
+    return tag not in _HTML_VOID_TAGS and f"</{tag}" not in block.lower()
+
+
+def _can_cut_before(block: str) -> bool:
+    """该逻辑块之前是否可以断开而不改变渲染结果"""
+    first_line = block.split("\n", 1)[0]
+    if not first_line.strip() or first_line[0] in " \t":
+        # 缩进内容可能属于上面的列表项或缩进代码块
+        return False
+    # 列表、引用、表格在空行后仍可能与前文属于同一结构
+    return not re.match(r'([-*+]|\d+[.)])\s|>|\|', first_line)
+
+
+def split_markdown_for_render(content: str, chunk_size: int) -> tuple[list[str], str]:
+    """
+    将markdown按块级结构切分为可独立渲染的片段，返回(片段列表, 链接引用定义)。
+    只在顶层块之间断开，优先在标题处断开，使局部修改后其余片段保持不变从而命中缓存。
+    链接引用定义在整篇文档中生效，需附加到每个片段上渲染。
+    存在跨空行的原始HTML块时不切分。
+    """
+    blocks = MarkdownBlockSplitter()._split_into_logical_blocks(content)
+    definitions = []
+    for block in blocks:
+        if block.startswith(("```", "~~~")):
+            continue
+        if _opens_unclosed_html(block):
+            return [content], ""
+        if block.startswith(("    ", "\t")):
+            # 缩进代码块中的文本不是定义
+            continue
+        definitions.extend(match.group(0).strip() for match in _REFERENCE_DEF_PATTERN.finditer(block))
+
+    chunks = []
+    current = []
+    current_size = 0
+    math_fences = 0
+    for block in blocks:
+        # 只在空行之后断开，且不能位于 $$ 公式块内部
+        after_blank_line = bool(current) and not current[-1].strip() and current[-1].count("\n") >= 2
+        if after_blank_line and math_fences % 2 == 0 and _can_cut_before(block):
+            is_heading = block.startswith("#")
+            if current_size >= chunk_size * 2 or (is_heading and current_size >= chunk_size):
+                chunks.append("".join(current))
+                current = []
+                current_size = 0
+        current.append(block)
+        current_size += len(block)
+        if not block.startswith(("```", "~~~")):
+            math_fences += len(re.findall(r'^\s*\$\$', block, re.MULTILINE))
+    if current:
+        chunks.append("".join(current))
+    return chunks, "\n".join(definitions)
+
+
+def render_markdown_chunked(content: str, chunk_size: int = 256 * 1024) -> str:
+    """
+    分块渲染markdown：各片段在进程池中并行渲染，渲染结果按片段哈希缓存，
+    重新翻译部分内容后再次导出时只需渲染变化的片段。
+    """
+    if len(content) < chunk_size * 2:
+        chunks, definitions = [content], ""
+    else:
+        chunks, definitions = split_markdown_for_render(content, chunk_size)
+    sources = [f"{chunk}\n\n{definitions}" if definitions else chunk for chunk in chunks]
+    keys = [hashlib.md5(source.encode("utf-8")).hexdigest() for source in sources]
+    results = [_render_cache_get(key) for key in keys]
+    missing = [i for i, html in enumerate(results) if html is None]
+    if missing:
+        executor = get_process_pool() if len(missing) > 1 else None
+        if executor is None:
+            rendered = [render_markdown(sources[i]) for i in missing]
+        else:
+            rendered = list(executor.map(render_markdown, [sources[i] for i in missing]))
+        for i, html in zip(missing, rendered):
+            results[i] = html
+            _render_cache_put(keys[i], html)
+    return "\n".join(html for html in results if html)
 
 
 @dataclass
 class MD2HTMLExporterConfig(MDExporterConfig):
     cdn: bool = True
+    # 共享静态资源的URL前缀（如"/static"）。设置后本地资源以链接引用而不是内联，便于浏览器缓存
+    static_url: str | None = None
+    # 分块渲染的目标片段大小（字符数），不超过其两倍的文档整体渲染
+    render_chunk_size: int = 256 * 1024
 
 
 class MD2HTMLExporter(MDExporter):
@@ -20,15 +201,33 @@ class MD2HTMLExporter(MDExporter):
         config = config or MD2HTMLExporterConfig()
         super().__init__(config=config)
         self.cdn = config.cdn
+        self.static_url = config.static_url.rstrip("/") if config.static_url else None
+        self.render_chunk_size = config.render_chunk_size
+
+    def _local_css(self, name: str) -> str:
+        if self.static_url:
+            return f'<link rel="stylesheet" href="{self.static_url}/{name}"/>'
+        return f'<style>{read_resource_text(f"static/{name}")}</style>'
+
+    def _local_js(self, name: str) -> str:
+        if self.static_url:
+            return f'<script src="{self.static_url}/{name}"></script>'
+        return f'<script>{read_resource_text(f"static/{name}")}</script>'
 
     def export(self, document: MarkdownDocument) -> Document:
         cdn = self.cdn
+        html_content = render_markdown_chunked(document.content.decode(), self.render_chunk_size)
+        # 只引入文档实际用到的渲染资源：arithmatex输出的公式与mermaid代码块
+        uses_math = 'class="arithmatex"' in html_content
+        uses_mermaid = 'class="mermaid"' in html_content
+
         # language=html
-        pico = f'<style>{resource_path("static/pico.css").read_text(encoding="utf-8")}</style>' if not cdn else r'<link rel="stylesheet" href="https://s4.zstatic.net/ajax/libs/picocss/2.1.1/pico.min.css" integrity="sha512-+4kjFgVD0n6H3xt19Ox84B56MoS7srFn60tgdWFuO4hemtjhySKyW4LnftYZn46k3THUEiTTsbVjrHai+0MOFw==" crossorigin="anonymous" referrerpolicy="no-referrer" />'
-        html_template = resource_path("template/markdown.html").read_text(encoding="utf-8")
-        katex_css = f'<link rel="stylesheet" href="/static/katex/katex.css"/>' if not cdn else r"""<link rel="stylesheet" href="https://s4.zstatic.net/ajax/libs/KaTeX/0.16.9/katex.min.css" integrity="sha512-fHwaWebuwA7NSF5Qg/af4UeDx9XqUpYpOGgubo3yWu+b2IQR4UeQwbb42Ti7gVAjNtVoI/I9TEoYeu9omwcC6g==" crossorigin="anonymous" referrerpolicy="no-referrer" />"""
-        katex_js = f'<script src="/static/katex/katex.js"></script>' if not cdn else r"""<script src="https://s4.zstatic.net/ajax/libs/KaTeX/0.16.9/katex.min.js" integrity="sha512-LQNxIMR5rXv7o+b1l8+N1EZMfhG7iFZ9HhnbJkTp4zjNr5Wvst75AqUeFDxeRUa7l5vEDyUiAip//r+EFLLCyA==" crossorigin="anonymous" referrerpolicy="no-referrer"></script>"""
-        auto_render = f'<script>{resource_path("static/autoRender.js").read_text(encoding="utf-8")}</script>' if not cdn else r"""<script src="https://s4.zstatic.net/ajax/libs/KaTeX/0.16.9/contrib/auto-render.min.js" integrity="sha512-iWiuBS5nt6r60fCz26Nd0Zqe0nbk1ZTIQbl3Kv7kYsX+yKMUFHzjaH2+AnM6vp2Xs+gNmaBAVWJjSmuPw76Efg==" crossorigin="anonymous" referrerpolicy="no-referrer"></script>"""
+        pico = self._local_css("pico.css") if not cdn else r'<link rel="stylesheet" href="https://s4.zstatic.net/ajax/libs/picocss/2.1.1/pico.min.css" integrity="sha512-+4kjFgVD0n6H3xt19Ox84B56MoS7srFn60tgdWFuO4hemtjhySKyW4LnftYZn46k3THUEiTTsbVjrHai+0MOFw==" crossorigin="anonymous" referrerpolicy="no-referrer" />'
+        html_template = load_template("template/markdown.html")
+        static_url = self.static_url or "/static"
+        katex_css = f'<link rel="stylesheet" href="{static_url}/katex/katex.css"/>' if not cdn else r"""<link rel="stylesheet" href="https://s4.zstatic.net/ajax/libs/KaTeX/0.16.9/katex.min.css" integrity="sha512-fHwaWebuwA7NSF5Qg/af4UeDx9XqUpYpOGgubo3yWu+b2IQR4UeQwbb42Ti7gVAjNtVoI/I9TEoYeu9omwcC6g==" crossorigin="anonymous" referrerpolicy="no-referrer" />"""
+        katex_js = f'<script src="{static_url}/katex/katex.js"></script>' if not cdn else r"""<script src="https://s4.zstatic.net/ajax/libs/KaTeX/0.16.9/katex.min.js" integrity="sha512-LQNxIMR5rXv7o+b1l8+N1EZMfhG7iFZ9HhnbJkTp4zjNr5Wvst75AqUeFDxeRUa7l5vEDyUiAip//r+EFLLCyA==" crossorigin="anonymous" referrerpolicy="no-referrer"></script>"""
+        auto_render = self._local_js("autoRender.js") if not cdn else r"""<script src="https://s4.zstatic.net/ajax/libs/KaTeX/0.16.9/contrib/auto-render.min.js" integrity="sha512-iWiuBS5nt6r60fCz26Nd0Zqe0nbk1ZTIQbl3Kv7kYsX+yKMUFHzjaH2+AnM6vp2Xs+gNmaBAVWJjSmuPw76Efg==" crossorigin="anonymous" referrerpolicy="no-referrer"></script>"""
 
         # 这是正确且推荐的 JS 配置，它与 pymdownx.arithmatex 配合工作
         # 它只寻找 arithmatex 生成的 \(...\) 和 \[...\]
@@ -52,54 +251,16 @@ class MD2HTMLExporter(MDExporter):
             });
         </script>"""
 
-        mermaid = f'<script>{resource_path("static/mermaid.js").read_text(encoding="utf-8")}</script>'
-
-        # 扩展配置保持不变，我们仍然使用 arithmatex
-        extensions = [
-            'markdown.extensions.tables',
-            'pymdownx.arithmatex',
-            'pymdownx.superfences'
-        ]
-
-        extension_configs = {
-            'pymdownx.arithmatex': {
-                'generic': True,
-                'block_tag': 'div',
-                'inline_tag': 'span',
-                'block_syntax': ['dollar', 'square'],
-                'inline_syntax': ['dollar', 'round'],
-                'tex_inline_wrap': ['\\(', '\\)'],
-                'tex_block_wrap': ['\\[', '\\]'],
-                'smart_dollar': True
-            },
-            'pymdownx.superfences': {
-                'custom_fences': [
-                    {
-                        'name': 'mermaid',
-                        'class': 'mermaid',
-                        'format': lambda source, language, css_class, options, md,
-                                         **kwargs: f'<pre class="{css_class}">{source}</pre>'
-                    }
-                ]
-            }
-        }
-
-        content = document.content.decode()
-
-        html_content = markdown.markdown(
-            content,
-            extensions=extensions,
-            extension_configs=extension_configs
-        )
+        mermaid = self._local_js("mermaid.js") if uses_mermaid else ""
 
-        render = jinja2.Template(html_template).render(
+        render = html_template.render(
             title=document.stem,
             pico=pico,
-            katexCss=katex_css,
-            katexJs=katex_js,
-            autoRender=auto_render,
+            katexCss=katex_css if uses_math else "",
+            katexJs=katex_js if uses_math else "",
+            autoRender=auto_render if uses_math else "",
             markdown=html_content,
-            renderMathInElement=render_math_in_element,
+            renderMathInElement=render_math_in_element if uses_math else "",
             mermaid=mermaid,
         )
         return Document.from_bytes(content=render.encode("utf-8"), suffix=".html", stem=document.stem)
@@ -1,8 +1,11 @@
 # SPDX-FileCopyrightText: 2025 QinHan
 # SPDX-License-Identifier: MPL-2.0
+from pathlib import Path
+from typing import BinaryIO
+
 from collabtrans.exporter.md.base import MDExporter
 from collabtrans.ir.markdown_document import MarkdownDocument, Document
-from collabtrans.utils.markdown_utils import unembed_base64_images_to_zip
+from collabtrans.utils.markdown_utils import unembed_base64_images_to_zip, write_unembedded_markdown_zip
 
 
 class MD2MDZipExporter(MDExporter):
@@ -11,3 +14,7 @@ class MD2MDZipExporter(MDExporter):
         return Document.from_bytes(suffix=".zip", content=unembed_base64_images_to_zip(document.content.decode(),
                                                                                        markdown_name=document.name),
                                    stem=document.stem)
+
+    def write(self, document: MarkdownDocument, output: str | Path | BinaryIO):
+        """将zip直接写入文件路径或输出流，不在内存中保留整个zip"""
+        write_unembedded_markdown_zip(document.content.decode(), document.name, output)
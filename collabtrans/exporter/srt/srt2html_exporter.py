@@ -2,13 +2,11 @@
 # SPDX-License-Identifier: MPL-2.0
 from dataclasses import dataclass
 
-import jinja2
-
 import srt
 from collabtrans.exporter.base import ExporterConfig
 from collabtrans.exporter.srt.base import SrtExporter
 from collabtrans.ir.document import Document
-from collabtrans.utils.resource_utils import resource_path
+from collabtrans.utils.resource_utils import read_resource_text, load_template
 
 
 @dataclass
@@ -29,12 +27,12 @@ class Srt2HTMLExporter(SrtExporter):
         for sub in subs:
             sub.content = sub.content.replace('\n', '<br>')
 
-        html_template = resource_path("template/srt.html").read_text(encoding="utf-8")
+        html_template = load_template("template/srt.html")
 
         # language=html
-        pico = f'<style>{resource_path("static/pico.css").read_text(encoding="utf-8")}</style>' if not cdn else r'<link rel="stylesheet" href="https://s4.zstatic.net/ajax/libs/picocss/2.1.1/pico.min.css" integrity="sha512-+4kjFgVD0n6H3xt19Ox84B56MoS7srFn60tgdWFuO4hemtjhySKyW4LnftYZn46k3THUEiTTsbVjrHai+0MOFw==" crossorigin="anonymous" referrerpolicy="no-referrer" />'
+        pico = f'<style>{read_resource_text("static/pico.css")}</style>' if not cdn else r'<link rel="stylesheet" href="https://s4.zstatic.net/ajax/libs/picocss/2.1.1/pico.min.css" integrity="sha512-+4kjFgVD0n6H3xt19Ox84B56MoS7srFn60tgdWFuO4hemtjhySKyW4LnftYZn46k3THUEiTTsbVjrHai+0MOFw==" crossorigin="anonymous" referrerpolicy="no-referrer" />'
 
-        render = jinja2.Template(html_template).render(
+        render = html_template.render(
             title=document.stem,
             pico=pico,
             subtitles=subs
@@ -11,18 +11,22 @@ from collabtrans.ir.document import Document
 class Xlsx2CsvExporter(XlsxExporter):
 
     def export(self, document: Document) -> Document:
-        workbook = openpyxl.load_workbook(BytesIO(document.content))
-        sheet = workbook.active
-
-        # 2. 使用 StringIO 作为文本缓冲区
-        text_buffer = StringIO()
-
-        # 3. 直接将缓冲区传递给 csv.writer
-        writer = csv.writer(text_buffer)
-
-        # 遍历工作表中的每一行
-        for row in sheet.rows:
-            writer.writerow([cell.value for cell in row])
+        # 只读模式逐行流式读取，不构建完整的工作簿对象
+        workbook = openpyxl.load_workbook(BytesIO(document.content), read_only=True)
+        try:
+            sheet = workbook.active
+
+            # 2. 使用 StringIO 作为文本缓冲区
+            text_buffer = StringIO()
+
+            # 3. 直接将缓冲区传递给 csv.writer
+            writer = csv.writer(text_buffer)
+
+            # 遍历工作表中的每一行
+            for row in sheet.iter_rows(values_only=True):
+                writer.writerow(row)
+        finally:
+            workbook.close()
 
         # 4. 将文本缓冲区的内容编码为 bytes
         output_bytes = text_buffer.getvalue().encode('utf-8')
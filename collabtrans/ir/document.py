@@ -2,14 +2,52 @@
 # SPDX-License-Identifier: MPL-2.0
 import copy
 import dataclasses
+import os
+import weakref
 from pathlib import Path
 
+
+def _unlink_quietly(path: Path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class _FileOwner:
+    """临时文件的所有者：文档及其副本共同持有，全部被回收后删除文件"""
+
+    def __init__(self,path:Path):
+        self.path=path
+        weakref.finalize(self,_unlink_quietly,path)
+
+
 class Document:
-    def __init__(self,suffix:str,content:bytes,stem:str|None=None,path:Path=None):
+    # delete_on_release 的文件所有者，copy() 得到的副本共用同一个
+    _file_owner:_FileOwner|None=None
+
+    def __init__(self,suffix:str,content:bytes|None=None,stem:str|None=None,path:Path=None):
         self.suffix=suffix
-        self.content=content
+        self._content=content
         self.stem=stem
         self.path=path
+
+    @property
+    def content(self)->bytes:
+        # 以文件引用方式保存的文档，每次访问时从磁盘读取，不常驻内存
+        if self._content is None and self.path is not None:
+            return Path(self.path).read_bytes()
+        return self._content
+
+    @content.setter
+    def content(self,value:bytes):
+        self._content=value
+
+    @property
+    def is_file_backed(self)->bool:
+        """内容仅以文件引用形式存在（未加载到内存）"""
+        return self._content is None and self.path is not None
+
     @property
     def name(self)->str|None:
         if not self.stem:
@@ -26,5 +64,24 @@ class Document:
     def from_bytes(cls,content:bytes,suffix:str,stem:str|None):
         return cls(content=content,suffix=suffix,stem=stem)
 
+    @classmethod
+    def from_file_reference(cls,path:Path|str,suffix:str|None=None,stem:str|None=None,delete_on_release:bool=False):
+        """
+        以文件引用方式创建文档，内容不读入内存。
+        delete_on_release为True时，文档对象被回收后删除该文件（用于临时文件）。
+        """
+        path=Path(path)
+        document=cls(suffix=suffix if suffix is not None else path.suffix,
+                     stem=stem if stem is not None else path.stem)
+        document.set_file_reference(path,delete_on_release=delete_on_release)
+        return document
+
+    def set_file_reference(self,path:Path|str,delete_on_release:bool=False):
+        """将文档内容替换为文件引用并释放内存中的内容，用于流式写出的大文件"""
+        self._content=None
+        self.path=Path(path)
+        self._file_owner=_FileOwner(self.path) if delete_on_release else None
+
     def copy(self):
+        """浅拷贝，以文件引用保存的副本与原文档共用文件，文件在两者都被回收后才删除"""
         return copy.copy(self)
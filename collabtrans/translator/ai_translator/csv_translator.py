@@ -0,0 +1,214 @@
+# SPDX-FileCopyrightText: 2025 QinHan
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+import csv
+import io
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Self, Literal, List, Optional, Iterator, BinaryIO
+
+from collabtrans.agents.segments_agent import SegmentsTranslateAgentConfig, SegmentsTranslateAgent
+from collabtrans.ir.document import Document
+from collabtrans.translator.ai_translator.base import AiTranslatorConfig, AiTranslator
+from collabtrans.utils.csv_stream import (ENCODING_SAMPLE_SIZE, DIALECT_SAMPLE_SIZE, detect_csv_encoding,
+                                          sniff_csv_dialect, iter_csv_rows, parse_columns,
+                                          in_columns, is_translatable, writer_dialect)
+from collabtrans.utils.stream_utils import open_binary_source
+
+
+@dataclass
+class CsvTranslatorConfig(AiTranslatorConfig):
+    insert_mode: Literal["replace", "append", "prepend"] = "replace"
+    separator: str = "\n"
+    # 指定翻译的列，如 ["A", "C:E"]；也接受 "Sheet1!C:E" 等区域写法，工作表名与行范围被忽略。
+    # 如果为 None 或空列表，则翻译所有列。
+    translate_columns: Optional[List[str]] = None
+    # 每次读取并翻译的行数，内存占用只与窗口大小相关
+    window_rows: int = 5000
+    # 已翻译单元格值的缓存条目上限，跨窗口重复出现的值不会再次翻译
+    cache_size: int = 200_000
+
+
+class CsvTranslator(AiTranslator):
+    """
+    流式翻译csv：按检测到的编码与方言逐行读取，以窗口为单位对窗口内新出现的单元格值去重后翻译，
+    并逐行写出到临时文件，译文文档以文件引用保存。
+    """
+
+    def __init__(self, config: CsvTranslatorConfig):
+        super().__init__(config=config)
+        self.chunk_size = config.chunk_size
+        self.translate_agent = None
+        if not self.skip_translate:
+            agent_config = SegmentsTranslateAgentConfig(
+                custom_prompt=config.custom_prompt,
+                to_lang=config.to_lang,
+                base_url=config.base_url,
+                api_key=config.api_key,
+                model_id=config.model_id,
+                temperature=config.temperature,
+                thinking=config.thinking,
+                concurrent=config.concurrent,
+                timeout=config.timeout,
+                logger=self.logger,
+                glossary_dict=config.glossary_dict,
+                retry=config.retry
+            )
+            self.translate_agent = SegmentsTranslateAgent(agent_config)
+        self.insert_mode = config.insert_mode
+        self.separator = config.separator
+        self.translate_columns = config.translate_columns
+        self.window_rows = max(1, config.window_rows)
+        self.cache_size = config.cache_size
+        # 原文 -> 最终写入的文本
+        self._cache: dict[str, str] = {}
+
+    def _final_text(self, original_text: str, translated_text: str) -> str:
+        if self.insert_mode == "replace":
+            return translated_text
+        elif self.insert_mode == "append":
+            return original_text + self.separator + translated_text
+        elif self.insert_mode == "prepend":
+            return translated_text + self.separator + original_text
+        self.logger.error("不正确的CsvTranslatorConfig参数")
+        return translated_text
+
+    def _open_rows(self, stream: BinaryIO) -> tuple[Iterator[list[str]], type[csv.Dialect] | str]:
+        sample = stream.read(ENCODING_SAMPLE_SIZE)
+        stream.seek(0)
+        encoding, confidence = detect_csv_encoding(sample)
+        self.logger.info(f"检测到文件编码为: {encoding} (置信度: {confidence:.2%})")
+        dialect = sniff_csv_dialect(sample.decode(encoding, errors="ignore")[:DIALECT_SAMPLE_SIZE])
+        if dialect is None:
+            self.logger.warning("无法自动识别CSV方言，将使用默认的逗号分隔符。")
+            dialect = "excel"
+        else:
+            self.logger.info(f"检测到CSV分隔符为: '{dialect.delimiter}'")
+        return iter_csv_rows(stream, encoding, dialect), dialect
+
+    def _iter_windows(self, rows: Iterator[list[str]]) -> Iterator[list[list[str]]]:
+        window = []
+        for row in rows:
+            window.append(row)
+            if len(window) >= self.window_rows:
+                yield window
+                window = []
+        if window:
+            yield window
+
+    def _window_pending(self, window: list[list[str]], columns) -> tuple[dict[str, str], list[str]]:
+        """
+        返回 (窗口中已缓存的译文, 需要翻译且尚未翻译过的单元格值（去重并保持出现顺序）)。
+        已缓存的译文在淘汰前取出，保证窗口写出前所有译文都可用。
+        """
+        known = {}
+        pending = {}
+        for row in window:
+            for col_index, value in enumerate(row, start=1):
+                if value in known or value in pending:
+                    continue
+                if in_columns(columns, col_index) and is_translatable(value):
+                    cached = self._cache.get(value)
+                    if cached is None:
+                        pending[value] = None
+                    else:
+                        known[value] = cached
+        return known, list(pending)
+
+    def _remember(self, original_texts: list[str], translated_texts: list[str]) -> dict[str, str]:
+        """缓存译文（按插入顺序淘汰最早的条目），返回 原文 -> 最终文本"""
+        while self._cache and len(self._cache) + len(original_texts) > self.cache_size:
+            del self._cache[next(iter(self._cache))]
+        final_texts = {}
+        for original_text, translated_text in zip(original_texts, translated_texts):
+            final_text = self._final_text(original_text, translated_text)
+            self._cache[original_text] = final_texts[original_text] = final_text
+        return final_texts
+
+    @staticmethod
+    def _write_window(writer, window: list[list[str]], columns, known: dict[str, str]):
+        for row in window:
+            writer.writerow([known.get(value, value) if in_columns(columns, col_index) else value
+                             for col_index, value in enumerate(row, start=1)])
+
+    def _update_glossary(self, glossary_dict: dict | None):
+        if glossary_dict:
+            self.glossary_dict_gen = glossary_dict | (self.glossary_dict_gen or {})
+        if self.translate_agent:
+            self.translate_agent.update_glossary_dict(glossary_dict)
+
+    def _prepare(self, document: Document):
+        columns, warnings = parse_columns(self.translate_columns)
+        for warning in warnings:
+            self.logger.warning(warning)
+        source = open_binary_source(document.path if document.is_file_backed else document.content)
+        fd, output_path = tempfile.mkstemp(prefix="collabtrans_csv_", suffix=".csv")
+        output = io.TextIOWrapper(os.fdopen(fd, "wb"), encoding="utf-8", newline="")
+        rows, dialect = self._open_rows(source)
+        return columns, source, output, output_path, rows, csv.writer(output, **writer_dialect(dialect))
+
+    def _finish(self, document: Document, source: BinaryIO, output: io.TextIOWrapper, output_path: str,
+                row_count: int, translated_count: int):
+        source.close()
+        output.close()
+        self.logger.info(f"共处理 {row_count} 行数据，翻译 {translated_count} 个不同的单元格值。")
+        # 输出为utf-8编码，与导出csv的编码一致
+        document.set_file_reference(output_path, delete_on_release=True)
+
+    def translate(self, document: Document) -> Self:
+        columns, source, output, output_path, rows, writer = self._prepare(document)
+        row_count = translated_count = 0
+        try:
+            for window in self._iter_windows(rows):
+                known, pending = self._window_pending(window, columns)
+                if pending:
+                    if self.glossary_agent:
+                        self._update_glossary(self.glossary_agent.send_segments(pending, self.chunk_size))
+                    if self.translate_agent:
+                        translated_texts = self.translate_agent.send_segments(pending, self.chunk_size)
+                    else:
+                        translated_texts = pending
+                    known.update(self._remember(pending, translated_texts))
+                    translated_count += len(pending)
+                self._write_window(writer, window, columns, known)
+                row_count += len(window)
+        except BaseException:
+            rows.close()
+            source.close()
+            output.close()
+            os.unlink(output_path)
+            raise
+        self._finish(document, source, output, output_path, row_count, translated_count)
+        return self
+
+    async def translate_async(self, document: Document) -> Self:
+        columns, source, output, output_path, rows, writer = await asyncio.to_thread(self._prepare, document)
+        row_count = translated_count = 0
+        windows = self._iter_windows(rows)
+        try:
+            while True:
+                # 读取与写出在线程中进行，避免阻塞事件循环
+                window = await asyncio.to_thread(next, windows, None)
+                if window is None:
+                    break
+                known, pending = self._window_pending(window, columns)
+                if pending:
+                    if self.glossary_agent:
+                        self._update_glossary(await self.glossary_agent.send_segments_async(pending, self.chunk_size))
+                    if self.translate_agent:
+                        translated_texts = await self.translate_agent.send_segments_async(pending, self.chunk_size)
+                    else:
+                        translated_texts = pending
+                    known.update(self._remember(pending, translated_texts))
+                    translated_count += len(pending)
+                await asyncio.to_thread(self._write_window, writer, window, columns, known)
+                row_count += len(window)
+        except BaseException:
+            rows.close()
+            source.close()
+            output.close()
+            os.unlink(output_path)
+            raise
+        self._finish(document, source, output, output_path, row_count, translated_count)
+        return self
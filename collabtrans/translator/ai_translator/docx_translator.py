@@ -1,24 +1,41 @@
 # SPDX-FileCopyrightText: 2025 QinHan
 # SPDX-License-Identifier: MPL-2.0
 import asyncio
+import zipfile
 from dataclasses import dataclass
 from io import BytesIO
 from typing import Self, Literal, List, Dict, Any, Tuple
 
 import docx
 from docx.document import Document as DocumentObject
+from docx.oxml.ns import qn
+from docx.table import Table
 from docx.text.paragraph import Paragraph
 from docx.text.run import Run
 
 from collabtrans.agents.segments_agent import SegmentsTranslateAgentConfig, SegmentsTranslateAgent
 from collabtrans.ir.document import Document
 from collabtrans.translator.ai_translator.base import AiTranslatorConfig, AiTranslator
+from collabtrans.utils.docx_stream import DocxStreamSegments, extract_docx_stream, write_docx_stream
+
+
+# w:drawing 是嵌入式图片的标志, w:pict 是 VML 图片的标志
+_IMAGE_TAGS = (qn("w:drawing"), qn("w:pict"))
 
 
 def is_image_run(run: Run) -> bool:
     """检查一个 run 是否包含图片。"""
-    # w:drawing 是嵌入式图片的标志, w:pict 是 VML 图片的标志
-    return '<w:drawing' in run.element.xml or '<w:pict' in run.element.xml
+    # 直接在lxml元素树中查找（包括嵌套在 mc:AlternateContent 等中的后代），避免序列化整个 run 的XML
+    return next(run.element.iter(*_IMAGE_TAGS), None) is not None
+
+
+# 与 python-docx 的 Run.text 取相同的子元素，各元素通过 str() 转为对应文本（如 w:tab -> "\t"）
+_TEXT_TAGS = frozenset(qn(tag) for tag in ("w:br", "w:cr", "w:noBreakHyphen", "w:ptab", "w:t", "w:tab"))
+
+
+def run_text(run: Run) -> str:
+    """获取 run 的文本，等价于 run.text，但不必每次重新编译XPath。"""
+    return "".join(str(child) for child in run.element if child.tag in _TEXT_TAGS)
 
 
 @dataclass
@@ -28,6 +45,12 @@ class DocxTranslatorConfig(AiTranslatorConfig):
     """
     insert_mode: Literal["replace", "append", "prepend"] = "replace"
     separator: str = "\n"
+    # 解析引擎：python-docx 加载完整对象模型，只翻译正文段落与表格（不含页眉页脚、脚注尾注、文本框、内容控件）；
+    # streaming 流式处理正文、页眉页脚、脚注尾注及其中的全部段落，适合超大文件；
+    # auto 在 word/document.xml 解压后超过 stream_threshold 字节时使用流式引擎，但翻译范围与 python-docx 相同，
+    # 译文不因文件大小而不同
+    engine: Literal["auto", "python-docx", "streaming"] = "auto"
+    stream_threshold: int = 64 * 1024 * 1024
 
 
 class DocxTranslator(AiTranslator):
@@ -58,8 +81,26 @@ class DocxTranslator(AiTranslator):
             self.translate_agent = SegmentsTranslateAgent(agent_config)
         self.insert_mode = config.insert_mode
         self.separator = config.separator
+        self.engine = config.engine
+        self.stream_threshold = config.stream_threshold
 
-    def _pre_translate(self, document: Document) -> Tuple[DocumentObject, List[Dict[str, Any]], List[str]]:
+    @staticmethod
+    def _docx_source(document: Document):
+        # 以文件引用保存的文档直接从磁盘读取，不载入内存
+        return document.path if document.is_file_backed else document.content
+
+    def _use_stream_engine(self, document: Document) -> bool:
+        if self.engine != "auto":
+            return self.engine == "streaming"
+        source = self._docx_source(document)
+        try:
+            with zipfile.ZipFile(BytesIO(source) if isinstance(source, bytes) else source) as archive:
+                return archive.getinfo("word/document.xml").file_size >= self.stream_threshold
+        except (KeyError, zipfile.BadZipFile):
+            return False
+
+    def _pre_translate(self, document: Document) -> Tuple[DocumentObject | Document,
+                                                          List[Dict[str, Any]] | DocxStreamSegments, List[str]]:
         """
         [已重构] 预处理 .docx 文件，在 Run 级别上提取文本，以避免破坏图片。
         :param document: 包含 .docx 文件内容的 Document 对象。
@@ -67,7 +108,14 @@ class DocxTranslator(AiTranslator):
                  - docx.Document 对象
                  - 一个包含文本块信息的列表 (每个元素代表一组连续的文本 run)
                  - 一个包含所有待翻译原文的列表
+                 使用流式引擎时，前两项分别为原 Document 与 DocxStreamSegments
         """
+        if self._use_stream_engine(document):
+            self.logger.info("使用流式引擎解析docx")
+            # auto 自动切换时只处理 python-docx 引擎覆盖的正文段落
+            segments = extract_docx_stream(self._docx_source(document), body_only=self.engine == "auto")
+            return document, segments, segments.texts
+
         doc = docx.Document(BytesIO(document.content))
         elements_to_translate = []
         original_texts = []
@@ -89,48 +137,74 @@ class DocxTranslator(AiTranslator):
                 else:
                     # 累积文本 run
                     current_runs.append(run)
-                    current_text_segment += run.text
+                    current_text_segment += run_text(run)
 
             # 处理段落末尾的最后一个文本块
             if current_text_segment.strip():
                 elements_to_translate.append({"type": "text_runs", "runs": current_runs})
                 original_texts.append(current_text_segment)
 
+        # 合并单元格在 row.cells 中会按其跨越的网格位置重复出现（同一个 <w:tc>），
+        # 按底层元素去重，保证每个物理段落只提取和写回一次
+        visited_cells = set()
+
+        def process_table(table: Table):
+            for row in table.rows:
+                for cell in row.cells:
+                    if cell._tc in visited_cells:
+                        continue
+                    visited_cells.add(cell._tc)
+                    for para in cell.paragraphs:
+                        process_paragraph(para)
+                    # 递归处理嵌套表格
+                    for nested_table in cell.tables:
+                        process_table(nested_table)
+
         # 遍历所有段落
         for para in doc.paragraphs:
             process_paragraph(para)
 
         # 遍历所有表格
         for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    for para in cell.paragraphs:
-                        process_paragraph(para)
+            process_table(table)
 
         return doc, elements_to_translate, original_texts
 
-    def _after_translate(self, doc: DocumentObject, elements_to_translate: List[Dict[str, Any]],
+    def _final_text(self, original_text: str, translated_text: str) -> str:
+        # 根据插入模式确定最终文本
+        if self.insert_mode == "replace":
+            return translated_text
+        elif self.insert_mode == "append":
+            return original_text + self.separator + translated_text
+        elif self.insert_mode == "prepend":
+            return translated_text + self.separator + original_text
+        self.logger.error("不正确的DocxTranslatorConfig参数")
+        return translated_text
+
+    @staticmethod
+    def _save_unchanged(doc: DocumentObject | Document) -> bytes:
+        if isinstance(doc, Document):
+            return doc.content
+        output_stream = BytesIO()
+        doc.save(output_stream)
+        return output_stream.getvalue()
+
+    def _after_translate(self, doc: DocumentObject | Document,
+                         elements_to_translate: List[Dict[str, Any]] | DocxStreamSegments,
                          translated_texts: List[str], original_texts: List[str]) -> bytes:
         """
         [已重构] 将翻译后的文本写回到对应的 text runs 中，保留图片和样式。
         """
-        translation_map = dict(zip(original_texts, translated_texts))
+        if isinstance(elements_to_translate, DocxStreamSegments):
+            final_texts = [self._final_text(original_text, translated_text)
+                           for original_text, translated_text in zip(original_texts, translated_texts)]
+            output_stream = BytesIO()
+            write_docx_stream(self._docx_source(doc), elements_to_translate, final_texts, output_stream)
+            return output_stream.getvalue()
 
         for i, element_info in enumerate(elements_to_translate):
             runs = element_info["runs"]
-            original_text = original_texts[i]
-            translated_text = translated_texts[i]
-
-            # 根据插入模式确定最终文本
-            if self.insert_mode == "replace":
-                final_text = translated_text
-            elif self.insert_mode == "append":
-                final_text = original_text + self.separator + translated_text
-            elif self.insert_mode == "prepend":
-                final_text = translated_text + self.separator + original_text
-            else:
-                self.logger.error("不正确的DocxTranslatorConfig参数")
-                final_text = translated_text
+            final_text = self._final_text(original_texts[i], translated_texts[i])
 
             if not runs:
                 continue
@@ -158,9 +232,7 @@ class DocxTranslator(AiTranslator):
         doc, elements_to_translate, original_texts = self._pre_translate(document)
         if not original_texts:
             print("\n文件中没有找到需要翻译的文本内容。")
-            output_stream = BytesIO()
-            doc.save(output_stream)
-            document.content = output_stream.getvalue()
+            document.content = self._save_unchanged(doc)
             return self
 
         if self.glossary_agent:
@@ -185,10 +257,7 @@ class DocxTranslator(AiTranslator):
         doc, elements_to_translate, original_texts = await asyncio.to_thread(self._pre_translate, document)
         if not original_texts:
             print("\n文件中没有找到需要翻译的文本内容。")
-            # 在异步环境中正确保存和返回
-            output_stream = BytesIO()
-            doc.save(output_stream)
-            document.content = output_stream.getvalue()
+            document.content = self._save_unchanged(doc)
             return self
 
         if self.glossary_agent:
@@ -0,0 +1,120 @@
+# SPDX-FileCopyrightText: 2025 QinHan
+# SPDX-License-Identifier: MPL-2.0
+import asyncio
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Self, List, Tuple
+
+from collabtrans.agents.segments_agent import SegmentsTranslateAgentConfig, SegmentsTranslateAgent
+from collabtrans.ir.document import Document
+from collabtrans.translator.ai_translator.base import AiTranslator
+from collabtrans.translator.ai_translator.html_translator import HtmlTranslatorConfig
+from collabtrans.utils.html_site_utils import SITE_PAGE_SUFFIXES, HtmlSiteSegments, extract_html_site, \
+    write_html_site
+
+
+@dataclass
+class HtmlSiteTranslatorConfig(HtmlTranslatorConfig):
+    """
+    在 HtmlTranslatorConfig 的基础上:
+        page_suffixes (Tuple[str, ...]): 作为页面翻译的文件后缀，其余文件原样保留。
+    """
+    page_suffixes: Tuple[str, ...] = SITE_PAGE_SUFFIXES
+
+
+class HtmlSiteTranslator(AiTranslator):
+    """
+    翻译打包为zip的多页面HTML站点。
+    各页面按 HtmlTranslator 的黑白名单规则提取片段，但不可翻译的标签（script、style、code等）保留在页面中；
+    所有页面的片段全局去重后统一翻译，各页面共用的页眉、页脚、导航栏只翻译一次。
+    译文站点写入临时文件，文档以文件引用保存。
+    """
+
+    def __init__(self, config: HtmlSiteTranslatorConfig):
+        super().__init__(config=config)
+        self.chunk_size = config.chunk_size
+        self.translate_agent = None
+        if not self.skip_translate:
+            agent_config = SegmentsTranslateAgentConfig(
+                custom_prompt=config.custom_prompt,
+                to_lang=config.to_lang,
+                base_url=config.base_url,
+                api_key=config.api_key,
+                model_id=config.model_id,
+                temperature=config.temperature,
+                thinking=config.thinking,
+                concurrent=config.concurrent,
+                timeout=config.timeout,
+                logger=self.logger,
+                glossary_dict=config.glossary_dict,
+                retry=config.retry
+            )
+            self.translate_agent = SegmentsTranslateAgent(agent_config)
+        self.insert_mode = config.insert_mode
+        self.separator = config.separator
+        self.group_blocks = config.segment_mode == "block"
+        self.page_suffixes = tuple(suffix.lower() for suffix in config.page_suffixes)
+
+    @staticmethod
+    def _site_source(document: Document) -> bytes | Path:
+        # 以文件引用保存的文档直接从磁盘读取，不载入内存
+        return document.path if document.is_file_backed else document.content
+
+    def _pre_translate(self, document: Document) -> HtmlSiteSegments:
+        """并行解析所有页面并全局去重"""
+        segments = extract_html_site(self._site_source(document), self.group_blocks, self.page_suffixes)
+        self.logger.info(f"共 {len(segments.pages)} 个页面包含可翻译内容，{segments.total} 个片段，"
+                         f"去重后需翻译 {len(segments.texts)} 个。")
+        return segments
+
+    def _after_translate(self, document: Document, segments: HtmlSiteSegments, translated_texts: List[str]):
+        if len(segments.texts) != len(translated_texts):
+            self.logger.error("翻译前后的文本片段数量不匹配 (%d vs %d)，跳过写入操作以防损坏文件。",
+                              len(segments.texts), len(translated_texts))
+            return
+        fd, output_path = tempfile.mkstemp(prefix="collabtrans_site_", suffix=".zip")
+        try:
+            with os.fdopen(fd, "wb") as output:
+                write_html_site(self._site_source(document), segments, translated_texts, output, self.insert_mode,
+                                self.separator, self.group_blocks)
+        except BaseException:
+            os.unlink(output_path)
+            raise
+        document.set_file_reference(output_path, delete_on_release=True)
+
+    def translate(self, document: Document) -> Self:
+        segments = self._pre_translate(document)
+        if not segments.texts:
+            self.logger.info("\n站点中没有找到符合安全规则的可翻译内容。")
+            return self
+
+        if self.glossary_agent:
+            self.glossary_dict_gen = self.glossary_agent.send_segments(segments.texts, self.chunk_size)
+            if self.translate_agent:
+                self.translate_agent.update_glossary_dict(self.glossary_dict_gen)
+        if self.translate_agent:
+            translated_texts = self.translate_agent.send_segments(segments.texts, self.chunk_size)
+        else:
+            translated_texts = segments.texts
+        self._after_translate(document, segments, translated_texts)
+        return self
+
+    async def translate_async(self, document: Document) -> Self:
+        # 页面解析与写回由进程池并行处理，在线程中等待结果，避免阻塞事件循环
+        segments = await asyncio.to_thread(self._pre_translate, document)
+        if not segments.texts:
+            self.logger.info("\n站点中没有找到符合安全规则的可翻译内容。")
+            return self
+
+        if self.glossary_agent:
+            self.glossary_dict_gen = await self.glossary_agent.send_segments_async(segments.texts, self.chunk_size)
+            if self.translate_agent:
+                self.translate_agent.update_glossary_dict(self.glossary_dict_gen)
+        if self.translate_agent:
+            translated_texts = await self.translate_agent.send_segments_async(segments.texts, self.chunk_size)
+        else:
+            translated_texts = segments.texts
+        await asyncio.to_thread(self._after_translate, document, segments, translated_texts)
+        return self
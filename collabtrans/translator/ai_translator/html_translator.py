@@ -1,14 +1,21 @@
 # SPDX-FileCopyrightText: 2025 QinHan
 # SPDX-License-Identifier: MPL-2.0
-import asyncio
+import logging
+import re
 from dataclasses import dataclass
 from typing import Self, Literal, Set, Dict, List, Tuple
 
 from bs4 import BeautifulSoup, NavigableString, Comment
+from lxml import etree
 
 from collabtrans.agents.segments_agent import SegmentsTranslateAgentConfig, SegmentsTranslateAgent
 from collabtrans.ir.document import Document
 from collabtrans.translator.ai_translator.base import AiTranslatorConfig, AiTranslator
+from collabtrans.utils.html_blocks import (SLOT_TAIL, SLOT_BLOCK, local_name, iter_segments, apply_block_translation,
+                                           parse_xhtml, serialize_xhtml)
+from collabtrans.utils.process_pool import run_cpu_bound
+
+module_logger = logging.getLogger(__name__)
 
 # --- 规则定义 ---
 
@@ -56,6 +63,236 @@ SAFE_ATTRIBUTES: Dict[str, List[str]] = {
     '*': ['title']
 }
 
+def parse_html(content: bytes) -> Tuple[BeautifulSoup, List[Dict], List[str]]:
+    """
+    解析HTML文档，根据规则提取所有需要翻译的文本节点和属性。
+    步骤:
+    1. 使用黑名单移除所有不可翻译的标签，从根本上防止它们被处理。
+    2. 遍历剩余的HTML元素，根据白名单提取可翻译的文本和属性值，同时跳过注释。
+    """
+    soup = BeautifulSoup(content, 'lxml')
+
+    # 步骤 1: 移除所有不可翻译的标签及其内容
+    for tag in soup.find_all(NON_TRANSLATABLE_TAGS):
+        tag.decompose()
+
+    translatable_items = []
+    original_texts = []
+
+    # 步骤 2: 遍历所有剩余标签，提取可翻译内容
+    for tag in soup.find_all(True):
+        # --- 2a. 翻译安全标签内的文本节点 ---
+        if tag.name in SAFE_TAGS:
+            # 只处理标签的直接子节点中的文本，这是保留样式的关键。
+            for child in list(tag.children):
+                # 【关键修改】确保处理的是纯文本节点，而不是注释（Comment是NavigableString的子类）
+                if isinstance(child, NavigableString) and not isinstance(child, Comment) and child.strip():
+                    text = str(child)
+                    translatable_items.append({'type': 'node', 'object': child})
+                    original_texts.append(text)
+
+        # --- 2b. 翻译安全标签内的安全属性 ---
+        attributes_to_check = SAFE_ATTRIBUTES.get(tag.name, []) + SAFE_ATTRIBUTES.get('*', [])
+        for attr in set(attributes_to_check):  # 使用set去重
+            if tag.has_attr(attr) and tag[attr].strip():
+                value = tag[attr]
+                translatable_items.append({'type': 'attribute', 'tag': tag, 'attribute': attr})
+                original_texts.append(value)
+
+    return soup, translatable_items, original_texts
+
+
+def write_back_html(soup: BeautifulSoup, translatable_items: list, translated_texts: list[str],
+                    original_texts: list[str], insert_mode: str, separator: str,
+                    logger: logging.Logger = module_logger) -> bytes:
+    """
+    将翻译后的文本写回到BeautifulSoup对象中对应的节点或属性，并返回最终的HTML字节流。
+    """
+    for i, item in enumerate(translatable_items):
+        translated_text = translated_texts[i]
+        original_text = original_texts[i]
+
+        new_content = ""
+        if insert_mode == "replace":
+            if item['type'] == 'node':
+                # 对于文本节点，保留原文前后的空白字符，这对维持内联元素的间距至关重要。
+                leading_space = original_text[:len(original_text) - len(original_text.lstrip())]
+                trailing_space = original_text[len(original_text.rstrip()):]
+                new_content = leading_space + translated_text + trailing_space
+            else:  # 属性
+                new_content = translated_text
+
+        elif insert_mode == "append":
+            new_content = original_text + separator + translated_text
+        elif insert_mode == "prepend":
+            new_content = translated_text + separator + original_text
+        else:
+            logger.error(f"不正确的HtmlTranslatorConfig参数: insert_mode='{insert_mode}'")
+            new_content = original_text  # 出错时恢复原文
+
+        # 根据类型将内容写回
+        if item['type'] == 'node':
+            node = item['object']
+            # 检查节点是否仍然在解析树中，以防在处理过程中被移动或删除
+            if node.parent:
+                node.replace_with(NavigableString(new_content))
+        elif item['type'] == 'attribute':
+            tag = item['tag']
+            attr = item['attribute']
+            tag[attr] = new_content
+
+    # 将修改后的BeautifulSoup对象编码为utf-8字节流
+    return soup.encode('utf-8')
+
+
+# --- 按块合并片段（segment_mode="block"）：使用lxml解析，规则与上面相同，块内行内文本合并为带占位符的片段 ---
+
+# XHTML页面中的元素带命名空间
+_NON_TRANSLATABLE_ANY_NS = tuple(f"{{*}}{tag}" for tag in NON_TRANSLATABLE_TAGS)
+
+
+def _block_allowed(element: etree._Element) -> bool:
+    return local_name(element) in SAFE_TAGS
+
+
+def parse_html_blocks(content: bytes, group_blocks: bool = True, keep_non_translatable: bool = False,
+                      xhtml: bool = False) -> Tuple[etree._Element | None, List[Tuple], List[str]]:
+    """
+    返回 (根元素, 可翻译项, 原文)。可翻译项为 (元素, 槽位) 或 (元素, 'attribute', 属性名)。
+    块片段的原文为去除首尾空白的带占位符文本，文本节点与属性保留原样。
+    keep_non_translatable为True时不可翻译的标签保留在文档中（只跳过其内容），用于需要保持页面完整的场景。
+    xhtml为True时按XML解析（写回时同样需要传入xhtml=True）。
+    """
+    if not content.strip():
+        root = None
+    elif xhtml:
+        root = parse_xhtml(content)
+    else:
+        root = etree.fromstring(content, etree.HTMLParser(huge_tree=True))
+    if root is None:
+        return None, [], []
+
+    if keep_non_translatable:
+        # 步骤 1: 不可翻译标签及其所有子元素中的文本与属性都不提取
+        excluded = {descendant for element in root.iter(*_NON_TRANSLATABLE_ANY_NS) for descendant in element.iter()}
+    else:
+        # 步骤 1: 移除所有不可翻译的标签及其内容（保留其后的文本）
+        excluded = set()
+        for element in list(root.iter(*_NON_TRANSLATABLE_ANY_NS)):
+            parent = element.getparent()
+            if parent is None:
+                continue
+            if element.tail:
+                previous = element.getprevious()
+                if previous is not None:
+                    previous.tail = (previous.tail or "") + element.tail
+                else:
+                    parent.text = (parent.text or "") + element.tail
+            parent.remove(element)
+
+    if excluded:
+        def allowed(element: etree._Element) -> bool:
+            return element not in excluded and _block_allowed(element)
+    else:
+        allowed = _block_allowed
+
+    translatable_items = []
+    original_texts = []
+    # 步骤 2: 按块（或按文本节点）提取文本
+    for element, slot, text in iter_segments(root, allowed, group_blocks):
+        translatable_items.append((element, slot))
+        original_texts.append(text.strip() if slot == SLOT_BLOCK else text)
+    # 步骤 3: 提取安全属性
+    for element in root.iter():
+        name = local_name(element)
+        if name is None or element in excluded:
+            continue
+        for attr in sorted(set(SAFE_ATTRIBUTES.get(name, []) + SAFE_ATTRIBUTES.get('*', []))):
+            value = element.get(attr)
+            if value and value.strip():
+                translatable_items.append((element, 'attribute', attr))
+                original_texts.append(value)
+    return root, translatable_items, original_texts
+
+
+_META_CHARSET_PATTERN = re.compile(r"charset\s*=\s*[\w.:-]+", re.IGNORECASE)
+
+
+def encode_html_blocks(root: etree._Element | None, content: bytes, xhtml: bool = False) -> bytes:
+    if root is None:
+        return content
+    # 输出总是utf-8编码，同步修改页面中声明的字符集
+    for meta in root.iter('{*}meta'):
+        if meta.get('charset'):
+            meta.set('charset', 'utf-8')
+        elif (meta.get('http-equiv') or '').lower() == 'content-type' and meta.get('content'):
+            meta.set('content', _META_CHARSET_PATTERN.sub('charset=utf-8', meta.get('content')))
+    if xhtml:
+        return serialize_xhtml(root)
+    # HTML解析器会为没有doctype的文档补上默认的doctype，此时只序列化根元素
+    with_doctype = b'<!doctype' in content[:1024].lower()
+    return etree.tostring(root.getroottree() if with_doctype else root, encoding='utf-8', method='html')
+
+
+def write_back_html_blocks(root: etree._Element | None, content: bytes, translatable_items: list,
+                           translated_texts: list[str], original_texts: list[str], insert_mode: str, separator: str,
+                           logger: logging.Logger = module_logger, xhtml: bool = False) -> bytes:
+    if insert_mode not in ("replace", "append", "prepend"):
+        logger.error(f"不正确的HtmlTranslatorConfig参数: insert_mode='{insert_mode}'")
+        return encode_html_blocks(root, content, xhtml)
+    unmatched = 0
+    for item, translated_text, original_text in zip(translatable_items, translated_texts, original_texts):
+        element, slot = item[0], item[1]
+        if slot == SLOT_BLOCK:
+            if not apply_block_translation(element, translated_text, _block_allowed, insert_mode, separator):
+                unmatched += 1
+            continue
+        if insert_mode == "replace":
+            leading_space = original_text[:len(original_text) - len(original_text.lstrip())]
+            trailing_space = original_text[len(original_text.rstrip()):]
+            new_content = leading_space + translated_text.strip() + trailing_space
+        elif insert_mode == "append":
+            new_content = original_text + separator + translated_text
+        else:
+            new_content = translated_text + separator + original_text
+        if slot == 'attribute':
+            element.set(item[2], translated_text if insert_mode == "replace" else new_content)
+        elif slot == SLOT_TAIL:
+            element.tail = new_content
+        else:
+            element.text = new_content
+    if unmatched:
+        logger.warning(f"{unmatched} 个块的译文占位符与原文不一致，已按整段写入")
+    return encode_html_blocks(root, content, xhtml)
+
+
+# --- 供进程池使用的函数：解析结果无法跨进程传递，写回时按相同规则重新解析 ---
+
+def extract_html_texts(content: bytes, group_blocks: bool = False) -> Tuple[List[str], bytes | None]:
+    """返回可翻译文本；没有可翻译内容时同时返回清理后的HTML"""
+    if group_blocks:
+        root, translatable_items, original_texts = parse_html_blocks(content)
+        return original_texts, None if translatable_items else encode_html_blocks(root, content)
+    soup, translatable_items, original_texts = parse_html(content)
+    return original_texts, None if translatable_items else soup.encode('utf-8')
+
+
+def clean_html(content: bytes, group_blocks: bool = False) -> bytes:
+    """仅移除不可翻译标签，不写入译文"""
+    if group_blocks:
+        return encode_html_blocks(parse_html_blocks(content)[0], content)
+    return parse_html(content)[0].encode('utf-8')
+
+
+def apply_html_translations(content: bytes, translated_texts: list[str], original_texts: list[str],
+                            insert_mode: str, separator: str, group_blocks: bool = False) -> bytes:
+    if group_blocks:
+        root, translatable_items, _ = parse_html_blocks(content)
+        return write_back_html_blocks(root, content, translatable_items, translated_texts, original_texts,
+                                      insert_mode, separator)
+    soup, translatable_items, _ = parse_html(content)
+    return write_back_html(soup, translatable_items, translated_texts, original_texts, insert_mode, separator)
+
 
 @dataclass
 class HtmlTranslatorConfig(AiTranslatorConfig):
@@ -69,9 +306,14 @@ class HtmlTranslatorConfig(AiTranslatorConfig):
             - "append": 在原文后追加译文。
             - "prepend": 在原文前追加译文。
         separator (str): 在 "append" 或 "prepend" 模式下，用于分隔原文和译文的字符串。
+        segment_mode (Literal["node", "block"]):
+            片段粒度。
+            - "node": 每个文本节点一个片段。
+            - "block": 将块元素内的行内文本（加粗、链接等）合并为一个带占位符的片段，译文按占位符重新分配到各节点。
     """
     insert_mode: Literal["replace", "append", "prepend"] = "replace"
     separator: str = " "  # HTML中用空格作为默认分隔符可能更合适
+    segment_mode: Literal["node", "block"] = "node"
 
 
 class HtmlTranslator(AiTranslator):
@@ -106,100 +348,45 @@ class HtmlTranslator(AiTranslator):
             self.translate_agent = SegmentsTranslateAgent(agent_config)
         self.insert_mode = config.insert_mode
         self.separator = config.separator
+        self.group_blocks = config.segment_mode == "block"
 
-    def _pre_translate(self, document: Document) -> Tuple[BeautifulSoup, List[Dict], List[str]]:
+    def _pre_translate(self, document: Document) -> Tuple[BeautifulSoup | etree._Element | None, List, List[str]]:
         """
         解析HTML文档，根据规则提取所有需要翻译的文本节点和属性。
-        步骤:
-        1. 使用黑名单移除所有不可翻译的标签，从根本上防止它们被处理。
-        2. 遍历剩余的HTML元素，根据白名单提取可翻译的文本和属性值，同时跳过注释。
         """
-        soup = BeautifulSoup(document.content, 'lxml')
-
-        # 步骤 1: 移除所有不可翻译的标签及其内容
-        for tag in soup.find_all(NON_TRANSLATABLE_TAGS):
-            tag.decompose()
-
-        translatable_items = []
-        original_texts = []
-
-        # 步骤 2: 遍历所有剩余标签，提取可翻译内容
-        for tag in soup.find_all(True):
-            # --- 2a. 翻译安全标签内的文本节点 ---
-            if tag.name in SAFE_TAGS:
-                # 只处理标签的直接子节点中的文本，这是保留样式的关键。
-                for child in list(tag.children):
-                    # 【关键修改】确保处理的是纯文本节点，而不是注释（Comment是NavigableString的子类）
-                    if isinstance(child, NavigableString) and not isinstance(child, Comment) and child.strip():
-                        text = str(child)
-                        translatable_items.append({'type': 'node', 'object': child})
-                        original_texts.append(text)
-
-            # --- 2b. 翻译安全标签内的安全属性 ---
-            attributes_to_check = SAFE_ATTRIBUTES.get(tag.name, []) + SAFE_ATTRIBUTES.get('*', [])
-            for attr in set(attributes_to_check):  # 使用set去重
-                if tag.has_attr(attr) and tag[attr].strip():
-                    value = tag[attr]
-                    translatable_items.append({'type': 'attribute', 'tag': tag, 'attribute': attr})
-                    original_texts.append(value)
-
-        return soup, translatable_items, original_texts
-
-    def _after_translate(self, soup: BeautifulSoup, translatable_items: list,
+        if self.group_blocks:
+            return parse_html_blocks(document.content)
+        return parse_html(document.content)
+
+    def _encode(self, tree: BeautifulSoup | etree._Element | None, content: bytes) -> bytes:
+        if self.group_blocks:
+            return encode_html_blocks(tree, content)
+        return tree.encode('utf-8')
+
+    def _after_translate(self, tree: BeautifulSoup | etree._Element | None, content: bytes, translatable_items: list,
                          translated_texts: list[str], original_texts: list[str]) -> bytes:
         """
-        将翻译后的文本写回到BeautifulSoup对象中对应的节点或属性，并返回最终的HTML字节流。
+        将翻译后的文本写回到解析树中对应的节点或属性，并返回最终的HTML字节流。
         """
         if len(translatable_items) != len(translated_texts):
             self.logger.error("翻译前后的文本片段数量不匹配 (%d vs %d)，跳过写入操作以防损坏文件。",
                               len(translatable_items), len(translated_texts))
-            return soup.encode('utf-8')
-
-        for i, item in enumerate(translatable_items):
-            translated_text = translated_texts[i]
-            original_text = original_texts[i]
-
-            new_content = ""
-            if self.insert_mode == "replace":
-                if item['type'] == 'node':
-                    # 对于文本节点，保留原文前后的空白字符，这对维持内联元素的间距至关重要。
-                    leading_space = original_text[:len(original_text) - len(original_text.lstrip())]
-                    trailing_space = original_text[len(original_text.rstrip()):]
-                    new_content = leading_space + translated_text + trailing_space
-                else:  # 属性
-                    new_content = translated_text
-
-            elif self.insert_mode == "append":
-                new_content = original_text + self.separator + translated_text
-            elif self.insert_mode == "prepend":
-                new_content = translated_text + self.separator + original_text
-            else:
-                self.logger.error(f"不正确的HtmlTranslatorConfig参数: insert_mode='{self.insert_mode}'")
-                new_content = original_text  # 出错时恢复原文
-
-            # 根据类型将内容写回
-            if item['type'] == 'node':
-                node = item['object']
-                # 检查节点是否仍然在解析树中，以防在处理过程中被移动或删除
-                if node.parent:
-                    node.replace_with(NavigableString(new_content))
-            elif item['type'] == 'attribute':
-                tag = item['tag']
-                attr = item['attribute']
-                tag[attr] = new_content
-
-        # 将修改后的BeautifulSoup对象编码为utf-8字节流
-        return soup.encode('utf-8')
+            return self._encode(tree, content)
+        if self.group_blocks:
+            return write_back_html_blocks(tree, content, translatable_items, translated_texts, original_texts,
+                                          self.insert_mode, self.separator, self.logger)
+        return write_back_html(tree, translatable_items, translated_texts, original_texts,
+                               self.insert_mode, self.separator, self.logger)
 
     def translate(self, document: Document) -> Self:
         """
         同步翻译HTML文档。
         """
-        soup, translatable_items, original_texts = self._pre_translate(document)
+        tree, translatable_items, original_texts = self._pre_translate(document)
         if not translatable_items:
             self.logger.info("\nHTML文件中没有找到符合安全规则的可翻译内容。")
             # 即使没有翻译内容，也返回经过清理（移除非翻译标签）的文档内容
-            document.content = soup.encode('utf-8')
+            document.content = self._encode(tree, document.content)
             return self
 
         if self.glossary_agent:
@@ -210,18 +397,19 @@ class HtmlTranslator(AiTranslator):
             translated_texts = self.translate_agent.send_segments(original_texts, self.chunk_size)
         else:
             translated_texts = original_texts
-        document.content = self._after_translate(soup, translatable_items, translated_texts, original_texts)
+        document.content = self._after_translate(tree, document.content, translatable_items, translated_texts,
+                                                 original_texts)
         return self
 
     async def translate_async(self, document: Document) -> Self:
         """
-        异步翻译HTML文档。
+        异步翻译HTML文档。解析与写回在进程池中进行，文档以bytes传递。
         """
-        soup, translatable_items, original_texts = await asyncio.to_thread(self._pre_translate, document)
+        original_texts, cleaned_content = await run_cpu_bound(extract_html_texts, document.content, self.group_blocks)
 
-        if not translatable_items:
+        if not original_texts:
             self.logger.info("\nHTML文件中没有找到符合安全规则的可翻译内容。")
-            document.content = await asyncio.to_thread(soup.encode, 'utf-8')
+            document.content = cleaned_content
             return self
 
         if self.glossary_agent:
@@ -232,7 +420,11 @@ class HtmlTranslator(AiTranslator):
             translated_texts = await self.translate_agent.send_segments_async(original_texts, self.chunk_size)
         else:
             translated_texts = original_texts
-        document.content = await asyncio.to_thread(
-            self._after_translate, soup, translatable_items, translated_texts, original_texts
-        )
+        if len(original_texts) != len(translated_texts):
+            self.logger.error("翻译前后的文本片段数量不匹配 (%d vs %d)，跳过写入操作以防损坏文件。",
+                              len(original_texts), len(translated_texts))
+            document.content = await run_cpu_bound(clean_html, document.content, self.group_blocks)
+            return self
+        document.content = await run_cpu_bound(apply_html_translations, document.content, translated_texts,
+                                               original_texts, self.insert_mode, self.separator, self.group_blocks)
         return self
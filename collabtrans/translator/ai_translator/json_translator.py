@@ -1,19 +1,30 @@
 # SPDX-FileCopyrightText: 2025 QinHan
 # SPDX-License-Identifier: MPL-2.0
+import asyncio
+import io
 import json
+import os
+import tempfile
 from dataclasses import dataclass
-from typing import Self, Any, Tuple, List
-
-from jsonpath_ng.ext import parse
+from typing import Self, Any, Tuple, List, Optional, Iterator, TextIO
 
 from collabtrans.agents.segments_agent import SegmentsTranslateAgentConfig, SegmentsTranslateAgent
 from collabtrans.ir.document import Document
 from collabtrans.translator.ai_translator.base import AiTranslatorConfig, AiTranslator
+from collabtrans.utils.json_stream import compile_json_path, peek_json_type, iter_json_array, dump_array_items, \
+    close_array
+from collabtrans.utils.stream_utils import open_binary_source
 
 
 @dataclass
 class JsonTranslatorConfig(AiTranslatorConfig):
     json_paths: list[str]
+    # 流式模式下每个窗口的记录数。设置后，顶层为数组的文件逐条解析记录，按窗口翻译并写出，内存占用只与窗口大小相关；
+    # jsonpath在每个窗口的记录列表上匹配，应使用 $[*].name、$..name 等不依赖数组下标的写法。
+    # 为 None 或顶层不是数组时整文件解析
+    stream_window: Optional[int] = None
+    # 流式模式下已翻译字符串的缓存条目上限，跨窗口重复出现的字符串不会再次翻译
+    cache_size: int = 200_000
 
 
 class JsonTranslator(AiTranslator):
@@ -38,6 +49,10 @@ class JsonTranslator(AiTranslator):
             )
             self.translate_agent = SegmentsTranslateAgent(agent_config)
         self.json_paths = config.json_paths
+        self.stream_window = config.stream_window
+        self.cache_size = config.cache_size
+        # 原文 -> 译文
+        self._cache: dict[str, str] = {}
 
     def _get_key_or_index_from_path(self, path) -> Any:
         """从jsonpath_ng的Path对象中提取键或索引。"""
@@ -82,7 +97,7 @@ class JsonTranslator(AiTranslator):
         # 1. 查找所有顶层匹配项
         all_matches = []
         for path_str in self.json_paths:
-            jsonpath_expr = parse(path_str)
+            jsonpath_expr = compile_json_path(path_str)
             all_matches.extend(jsonpath_expr.find(content))
 
         # 2. 遍历匹配项并启动递归收集
@@ -108,6 +123,141 @@ class JsonTranslator(AiTranslator):
             if container is not None and key_or_index is not None:
                 container[key_or_index] = text
 
+    @staticmethod
+    def _unique_texts(original_texts: List[str]) -> List[str]:
+        """去重并保持出现顺序，相同的字符串只翻译一次"""
+        return list(dict.fromkeys(original_texts))
+
+    def _update_glossary(self, glossary_dict: dict | None):
+        if glossary_dict:
+            self.glossary_dict_gen = glossary_dict | (self.glossary_dict_gen or {})
+        if self.translate_agent:
+            self.translate_agent.update_glossary_dict(glossary_dict)
+
+    def _open_records(self, document: Document) -> tuple[TextIO, bool]:
+        """打开文档的文本流，返回 (文本流, 是否按记录流式处理)"""
+        source = open_binary_source(document.path if document.is_file_backed else document.content)
+        text_stream = io.TextIOWrapper(source, encoding="utf-8-sig")
+        if not self.stream_window:
+            return text_stream, False
+        if peek_json_type(text_stream) != "[":
+            self.logger.info("JSON顶层不是数组，将整文件解析。")
+            return text_stream, False
+        return text_stream, True
+
+    def _iter_windows(self, records: Iterator[Any]) -> Iterator[list[Any]]:
+        window = []
+        for record in records:
+            window.append(record)
+            if len(window) >= self.stream_window:
+                yield window
+                window = []
+        if window:
+            yield window
+
+    def _window_pending(self, window: list[Any]) -> tuple[List[str], List[Tuple[Any, Any]], dict[str, str], List[str]]:
+        """
+        收集窗口中需要翻译的字符串，返回 (原文列表, 更新目标, 已缓存的译文, 需要翻译的去重原文)。
+        已缓存的译文在淘汰前取出，保证窗口写出前所有译文都可用。
+        """
+        original_texts, update_targets = self._collect_strings_for_translation(window)
+        known = {}
+        pending = []
+        for text in self._unique_texts(original_texts):
+            cached = self._cache.get(text)
+            if cached is None:
+                pending.append(text)
+            else:
+                known[text] = cached
+        return original_texts, update_targets, known, pending
+
+    def _remember(self, original_texts: List[str], translated_texts: List[str]):
+        while self._cache and len(self._cache) + len(original_texts) > self.cache_size:
+            del self._cache[next(iter(self._cache))]
+        for original_text, translated_text in zip(original_texts, translated_texts):
+            self._cache[original_text] = translated_text
+
+    def _write_window(self, output: TextIO, window: list[Any], first: bool):
+        output.write(dump_array_items(window, first))
+
+    def _prepare_stream(self, document: Document):
+        text_stream, streaming = self._open_records(document)
+        if not streaming:
+            content = json.load(text_stream)
+            text_stream.close()
+            return content, None, None, None
+        fd, output_path = tempfile.mkstemp(prefix="collabtrans_json_", suffix=".json")
+        output = io.TextIOWrapper(os.fdopen(fd, "wb"), encoding="utf-8")
+        return None, text_stream, output, output_path
+
+    def _finish_stream(self, document: Document, text_stream: TextIO, output: TextIO, output_path: str,
+                       record_count: int, text_count: int, translated_count: int):
+        output.write(close_array(record_count == 0))
+        text_stream.close()
+        output.close()
+        self.logger.info(f"共处理 {record_count} 条记录，{text_count} 个字符串，翻译 {translated_count} 个不同的字符串。")
+        document.set_file_reference(output_path, delete_on_release=True)
+
+    @staticmethod
+    def _abort_stream(text_stream: TextIO, output: TextIO, output_path: str):
+        text_stream.close()
+        output.close()
+        os.unlink(output_path)
+
+    def _translate_stream(self, document: Document, text_stream: TextIO, output: TextIO, output_path: str):
+        record_count = text_count = translated_count = 0
+        try:
+            for window in self._iter_windows(iter_json_array(text_stream)):
+                original_texts, update_targets, known, pending = self._window_pending(window)
+                if pending:
+                    if self.glossary_agent:
+                        self._update_glossary(self.glossary_agent.send_segments(pending, self.chunk_size))
+                    if self.translate_agent:
+                        translated_texts = self.translate_agent.send_segments(pending, self.chunk_size)
+                    else:
+                        translated_texts = pending
+                    self._remember(pending, translated_texts)
+                    known.update(zip(pending, translated_texts))
+                    translated_count += len(pending)
+                self._apply_translations(update_targets, [known[text] for text in original_texts])
+                self._write_window(output, window, record_count == 0)
+                record_count += len(window)
+                text_count += len(original_texts)
+        except BaseException:
+            self._abort_stream(text_stream, output, output_path)
+            raise
+        self._finish_stream(document, text_stream, output, output_path, record_count, text_count, translated_count)
+
+    async def _translate_stream_async(self, document: Document, text_stream: TextIO, output: TextIO,
+                                      output_path: str):
+        record_count = text_count = translated_count = 0
+        windows = self._iter_windows(iter_json_array(text_stream))
+        try:
+            while True:
+                # 读取与写出在线程中进行，避免阻塞事件循环
+                window = await asyncio.to_thread(next, windows, None)
+                if window is None:
+                    break
+                original_texts, update_targets, known, pending = self._window_pending(window)
+                if pending:
+                    if self.glossary_agent:
+                        self._update_glossary(await self.glossary_agent.send_segments_async(pending, self.chunk_size))
+                    if self.translate_agent:
+                        translated_texts = await self.translate_agent.send_segments_async(pending, self.chunk_size)
+                    else:
+                        translated_texts = pending
+                    self._remember(pending, translated_texts)
+                    known.update(zip(pending, translated_texts))
+                    translated_count += len(pending)
+                self._apply_translations(update_targets, [known[text] for text in original_texts])
+                await asyncio.to_thread(self._write_window, output, window, record_count == 0)
+                record_count += len(window)
+                text_count += len(original_texts)
+        except BaseException:
+            self._abort_stream(text_stream, output, output_path)
+            raise
+        self._finish_stream(document, text_stream, output, output_path, record_count, text_count, translated_count)
+
     def translate(self, document: Document) -> Self:
         """
         主方法：提取、翻译并更新JSON文档中的指定内容。
@@ -115,64 +265,74 @@ class JsonTranslator(AiTranslator):
         流程:
         1. 解析输入的JSON文档。
         2. 根据jsonpath找到匹配对象，并递归遍历它们以提取所有字符串。
-        3. 批量发送提取的字符串进行翻译。
-        4. 将翻译回来的文本根据其原始位置，更新回JSON对象中。
+        3. 对提取的字符串去重后批量发送翻译。
+        4. 将翻译回来的文本分发到所有相同原文的原始位置，更新回JSON对象中。
         5. 将更新后的 content 写回 document。
         """
-        content = json.loads(document.content.decode())
+        content, text_stream, output, output_path = self._prepare_stream(document)
+        if text_stream is not None:
+            self._translate_stream(document, text_stream, output, output_path)
+            return self
 
         # 步骤 1: 提取所有需要翻译的字符串及其位置
         original_texts, update_targets = self._collect_strings_for_translation(content)
 
         if not original_texts:
             return self
+        unique_texts = self._unique_texts(original_texts)
 
         if self.glossary_agent:
-            self.glossary_dict_gen = self.glossary_agent.send_segments(original_texts, self.chunk_size)
+            self.glossary_dict_gen = self.glossary_agent.send_segments(unique_texts, self.chunk_size)
             if self.translate_agent:
                 self.translate_agent.update_glossary_dict(self.glossary_dict_gen)
 
-        # 步骤 2: 批量翻译提取出的文本
+        # 步骤 2: 批量翻译去重后的文本
         if self.translate_agent:
-            translated_texts = self.translate_agent.send_segments(original_texts, self.chunk_size)
+            translated_texts = self.translate_agent.send_segments(unique_texts, self.chunk_size)
         else:
-            translated_texts = original_texts
+            translated_texts = unique_texts
 
-        if len(original_texts) != len(translated_texts):
+        if len(unique_texts) != len(translated_texts):
             raise ValueError("翻译服务返回的项目数量与发送的数量不匹配。")
 
-        # 步骤 3: 将翻译结果写回原始JSON对象
-        self._apply_translations(update_targets, translated_texts)
+        # 步骤 3: 将翻译结果分发到所有相同原文的位置，写回原始JSON对象
+        translations = dict(zip(unique_texts, translated_texts))
+        self._apply_translations(update_targets, [translations[text] for text in original_texts])
 
         document.content = json.dumps(content, ensure_ascii=False, indent=2).encode('utf-8')
 
         return self
 
     async def translate_async(self, document: Document) -> Self:
-        content = json.loads(document.content.decode())
+        content, text_stream, output, output_path = await asyncio.to_thread(self._prepare_stream, document)
+        if text_stream is not None:
+            await self._translate_stream_async(document, text_stream, output, output_path)
+            return self
 
         # 步骤 1: 提取所有需要翻译的字符串及其位置
         original_texts, update_targets = self._collect_strings_for_translation(content)
 
         if not original_texts:
             return self
+        unique_texts = self._unique_texts(original_texts)
 
         if self.glossary_agent:
-            self.glossary_dict_gen = await self.glossary_agent.send_segments_async(original_texts, self.chunk_size)
+            self.glossary_dict_gen = await self.glossary_agent.send_segments_async(unique_texts, self.chunk_size)
             if self.translate_agent:
                 self.translate_agent.update_glossary_dict(self.glossary_dict_gen)
 
-        # 步骤 2: 批量翻译提取出的文本
+        # 步骤 2: 批量翻译去重后的文本
         if self.translate_agent:
-            translated_texts = await self.translate_agent.send_segments_async(original_texts, self.chunk_size)
+            translated_texts = await self.translate_agent.send_segments_async(unique_texts, self.chunk_size)
         else:
-            translated_texts = original_texts
+            translated_texts = unique_texts
 
-        if len(original_texts) != len(translated_texts):
+        if len(unique_texts) != len(translated_texts):
             raise ValueError("翻译服务返回的项目数量与发送的数量不匹配。")
 
-        # 步骤 3: 将翻译结果写回原始JSON对象
-        self._apply_translations(update_targets, translated_texts)
+        # 步骤 3: 将翻译结果分发到所有相同原文的位置，写回原始JSON对象
+        translations = dict(zip(unique_texts, translated_texts))
+        self._apply_translations(update_targets, [translations[text] for text in original_texts])
 
         document.content = json.dumps(content, ensure_ascii=False, indent=2).encode('utf-8')
         return self
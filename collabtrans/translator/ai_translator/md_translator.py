@@ -2,14 +2,32 @@
 # SPDX-License-Identifier: MPL-2.0
 import asyncio
 from dataclasses import dataclass
-from typing import Self
+from typing import AsyncIterable, Self
 
 from collabtrans.agents import MDTranslateAgent
 from collabtrans.agents.markdown_agent import MDTranslateAgentConfig
 from collabtrans.context.md_mask_context import MDMaskUrisContext
 from collabtrans.ir.markdown_document import MarkdownDocument
 from collabtrans.translator.ai_translator.base import AiTranslatorConfig, AiTranslator
-from collabtrans.utils.markdown_splitter import split_markdown_text, join_markdown_texts
+from collabtrans.utils.markdown_splitter import split_markdown_text, join_markdown_texts, join_markdown_parts
+from collabtrans.utils.markdown_utils import MaskDict, uris2placeholder, placeholder2uris
+from collabtrans.utils.process_pool import run_cpu_bound
+
+
+def mask_and_split_markdown(content: bytes, chunk_size: int) -> tuple[list[str], dict[str, str]]:
+    """遮罩图片链接并分块，返回分块与占位符映射（可在子进程中执行）"""
+    mask_dict = MaskDict()
+    chunks = split_markdown_text(uris2placeholder(content.decode(), mask_dict), chunk_size)
+    return chunks, mask_dict.to_dict()
+
+
+def join_and_unmask_markdown(chunks: list[str], mask_mapping: dict[str, str]) -> bytes:
+    """拼接译文分块并还原占位符（可在子进程中执行）"""
+    content = join_markdown_texts(chunks)
+    # 做一些加强鲁棒性的操作
+    content = content.replace(r'\（', r'\(')
+    content = content.replace(r'\）', r'\)')
+    return placeholder2uris(content, MaskDict.from_dict(mask_mapping)).encode()
 
 
 @dataclass
@@ -59,29 +77,68 @@ class MDTranslator(AiTranslator):
         self.logger.info("翻译完成")
         return self
 
-    async def translate_async(self, document: MarkdownDocument) -> Self:
+    async def _translate_chunks_async(self, chunks: list[str]) -> list[str]:
+        if self.glossary_agent:
+            glossary_dict = await self.glossary_agent.send_segments_async(chunks, self.chunk_size)
+            if glossary_dict:
+                self.glossary_dict_gen = (self.glossary_dict_gen or {}) | glossary_dict
+            if self.translate_agent:
+                self.translate_agent.update_glossary_dict(self.glossary_dict_gen)
+        if self.translate_agent:
+            return await self.translate_agent.send_chunks_async(chunks)
+        return chunks
+
+    async def translate_async(self, document: MarkdownDocument,
+                              segmented: tuple[list[str], dict[str, str]] | None = None) -> Self:
+        """segmented为 mask_and_split_markdown 对document内容的结果（多个目标语言共用一份），为空时即时计算"""
         self.logger.info("正在翻译markdown")
-        with MDMaskUrisContext(document):
-            chunks: list[str] = split_markdown_text(document.content.decode(), self.chunk_size)
+        if segmented is None:
+            # 遮罩与分块、拼接与还原均为整篇正则扫描，放到进程池中执行以免阻塞事件循环
+            segmented = await run_cpu_bound(mask_and_split_markdown, document.content, self.chunk_size)
+        # 分块列表可能被各语言的翻译共用，使用副本
+        chunks, mask_mapping = list(segmented[0]), segmented[1]
+        self.logger.info(f"markdown分为{len(chunks)}块")
+        result = await self._translate_chunks_async(chunks)
+        document.content = await run_cpu_bound(join_and_unmask_markdown, result, mask_mapping)
+        self.logger.info("翻译完成")
+        return self
 
-            if self.glossary_agent:
-                self.glossary_dict_gen = await self.glossary_agent.send_segments_async(chunks, self.chunk_size)
-                if self.translate_agent:
-                    self.translate_agent.update_glossary_dict(self.glossary_dict_gen)
+    async def _translate_part_async(self, part: str) -> str:
+        chunks, mask_mapping = await run_cpu_bound(mask_and_split_markdown, part.encode(), self.chunk_size)
+        self.logger.info(f"本段markdown分为{len(chunks)}块")
+        result = await self._translate_chunks_async(chunks)
+        translated = await run_cpu_bound(join_and_unmask_markdown, result, mask_mapping)
+        return translated.decode()
 
-            self.logger.info(f"markdown分为{len(chunks)}块")
-            if self.translate_agent:
-                result: list[str] = await self.translate_agent.send_chunks_async(chunks)
-            else:
-                result = chunks
+    async def translate_stream_async(self, parts: AsyncIterable[str], document: MarkdownDocument) -> Self:
+        """
+        流水线翻译：parts按文档顺序逐段产出markdown（如解析引擎分页转换的结果），
+        每段就绪后立即遮罩、分块并翻译，同时继续接收后续段落，最终按顺序拼接写入document。
+        每段使用各自的遮罩映射，在该段译文拼接后即还原，占位符不会跨段出现。
+        """
+        self.logger.info("正在以流水线方式翻译markdown")
+        queue: asyncio.Queue[str | None] = asyncio.Queue()
+
+        async def produce():
+            try:
+                async for part in parts:
+                    await queue.put(part)
+            finally:
+                await queue.put(None)
 
-            def run():
-                content = join_markdown_texts(result)
-                # 做一些加强鲁棒性的操作
-                content = content.replace(r'\（', r'\(')
-                content = content.replace(r'\）', r'\)')
-                document.content = content.encode()
+        producer = asyncio.create_task(produce())
+        translated_parts: list[str] = []
+        try:
+            while (part := await queue.get()) is not None:
+                self.logger.info(f"开始翻译第{len(translated_parts) + 1}段")
+                translated_parts.append(await self._translate_part_async(part))
+            # 传递解析过程中的异常
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
 
-            await asyncio.to_thread(run)
+        # 与解析结果一致以换行结尾，使两种翻译方式得到相同的文本
+        document.content = (join_markdown_parts(translated_parts) + "\n").encode()
         self.logger.info("翻译完成")
         return self
@@ -1,26 +1,52 @@
 # SPDX-FileCopyrightText: 2025 QinHan
 # SPDX-License-Identifier: MPL-2.0
 import asyncio
+import io
+import os
+import tempfile
+from collections import deque
 from dataclasses import dataclass
-from typing import Self, Literal
+from typing import Self, Literal, Optional, Iterator, TextIO
 
 import srt  # 导入srt库来处理字幕文件
 
 from collabtrans.agents.segments_agent import SegmentsTranslateAgentConfig, SegmentsTranslateAgent
 from collabtrans.ir.document import Document
 from collabtrans.translator.ai_translator.base import AiTranslatorConfig, AiTranslator
+from collabtrans.utils.json_utils import get_json_size
+from collabtrans.utils.stream_utils import open_binary_source
 
 
 @dataclass
 class SrtTranslatorConfig(AiTranslatorConfig):
     insert_mode: Literal["replace", "append", "prepend"] = "replace"
     separator: str = "\n"
+    # 每个上下文窗口的目标大小（与chunk_size相同，按JSON字节数计算）。
+    # 设置后逐块读取字幕，将连续的字幕打包为窗口翻译，并在窗口完成后按顺序写出；为 None 时整文件解析与翻译
+    window_size: Optional[int] = None
+    # 窗口模式下译文的写出路径，翻译过程中可读取已完成的部分；为 None 时写入临时文件
+    output_path: Optional[str] = None
+
+
+def iter_srt_blocks(stream: TextIO) -> Iterator[str]:
+    """按空行切分字幕块，逐块产出，不把整个文件读入内存"""
+    block = []
+    for line in stream:
+        if line.strip():
+            block.append(line)
+        elif block:
+            yield "".join(block)
+            block = []
+    if block:
+        yield "".join(block)
 
 
 class SrtTranslator(AiTranslator):
     """
     一个用于翻译 SRT (.srt) 字幕文件的翻译器。
     它会提取每个字幕块的文本内容，进行翻译，然后根据配置将译文写回。
+    设置 window_size 时以窗口模式流式处理：连续的字幕打包为窗口，每个窗口作为一次请求翻译，
+    字幕的序号与时间轴保持不变，窗口完成后按顺序追加写出，译文文档以文件引用保存。
     """
 
     def __init__(self, config: SrtTranslatorConfig):
@@ -45,6 +71,9 @@ class SrtTranslator(AiTranslator):
             self.translate_agent = SegmentsTranslateAgent(agent_config)
         self.insert_mode = config.insert_mode
         self.separator = config.separator
+        self.window_size = config.window_size
+        self.output_path = config.output_path
+        self.concurrent = max(1, config.concurrent)
 
     def _pre_translate(self, document: Document):
         """
@@ -72,6 +101,19 @@ class SrtTranslator(AiTranslator):
 
         return subtitles, original_texts
 
+    def _final_text(self, original_text: str, translated_text: str) -> str:
+        """根据插入模式组合原文与译文"""
+        if self.insert_mode == "replace":
+            return translated_text
+        elif self.insert_mode == "append":
+            # strip() 避免在原文和译文间产生多余的空白
+            return original_text.strip() + self.separator + translated_text.strip()
+        elif self.insert_mode == "prepend":
+            return translated_text.strip() + self.separator + original_text.strip()
+        self.logger.error(f"不正确的SrtTranslatorConfig参数: insert_mode='{self.insert_mode}'")
+        # 默认回退到替换模式，避免程序中断
+        return translated_text
+
     def _after_translate(self, subtitles: list[srt.Subtitle], translated_texts: list[str],
                          original_texts: list[str]) -> bytes:
         """
@@ -80,22 +122,8 @@ class SrtTranslator(AiTranslator):
         Returns:
             bytes: 新的SRT文件内容的字节流。
         """
-        for i, sub in enumerate(subtitles):
-            translated_text = translated_texts[i]
-            original_text = original_texts[i]
-
-            # 根据插入模式更新字幕内容
-            if self.insert_mode == "replace":
-                sub.content = translated_text
-            elif self.insert_mode == "append":
-                # strip() 避免在原文和译文间产生多余的空白
-                sub.content = original_text.strip() + self.separator + translated_text.strip()
-            elif self.insert_mode == "prepend":
-                sub.content = translated_text.strip() + self.separator + original_text.strip()
-            else:
-                self.logger.error(f"不正确的SrtTranslatorConfig参数: insert_mode='{self.insert_mode}'")
-                # 默认回退到替换模式，避免程序中断
-                sub.content = translated_text
+        for sub, translated_text, original_text in zip(subtitles, translated_texts, original_texts):
+            sub.content = self._final_text(original_text, translated_text)
 
         # 使用 srt 库将修改后的字幕对象列表重新合成为SRT格式的字符串
         new_srt_content_str = srt.compose(subtitles)
@@ -103,10 +131,169 @@ class SrtTranslator(AiTranslator):
         # 返回UTF-8编码的字节流
         return new_srt_content_str.encode('utf-8')
 
+    def _iter_windows(self, stream: TextIO) -> Iterator[list[srt.Subtitle | str]]:
+        """
+        将连续的字幕打包为窗口，窗口内字幕文本的JSON大小达到window_size时产出。
+        无法解析的块以原始文本保留在窗口中，写出时原样输出。
+        """
+        window: list[srt.Subtitle | str] = []
+        size = 0
+        for block in iter_srt_blocks(stream):
+            try:
+                items = list(srt.parse(block))
+            except srt.SRTParseError:
+                self.logger.warning(f"无法解析的字幕块，将原样保留: {block[:50]!r}")
+                items = [block]
+            for item in items:
+                window.append(item)
+                if isinstance(item, srt.Subtitle):
+                    size += get_json_size({str(len(window)): item.content})
+            if size >= self.window_size:
+                yield window
+                window = []
+                size = 0
+        if window:
+            yield window
+
+    @staticmethod
+    def _window_texts(window: list[srt.Subtitle | str]) -> list[str]:
+        return [item.content for item in window if isinstance(item, srt.Subtitle)]
+
+    def _compose_window(self, window: list[srt.Subtitle | str], translated_texts: list[str]) -> str:
+        """写回窗口的译文，保留原有的序号与时间轴"""
+        translated = iter(translated_texts)
+        parts = []
+        for item in window:
+            if isinstance(item, srt.Subtitle):
+                item.content = self._final_text(item.content, next(translated))
+                parts.append(item.to_srt())
+            else:
+                parts.append(item.rstrip("\n") + "\n\n")
+        return "".join(parts)
+
+    def _window_chunk_size(self) -> int:
+        # 保证一个窗口在一次请求中发送，窗口内的字幕共享上下文
+        return max(self.chunk_size, self.window_size * 2)
+
+    def _update_glossary(self, glossary_dict: dict | None):
+        if glossary_dict:
+            self.glossary_dict_gen = glossary_dict | (self.glossary_dict_gen or {})
+        if self.translate_agent:
+            self.translate_agent.update_glossary_dict(glossary_dict)
+
+    def _prepare_windowed(self, document: Document):
+        source = open_binary_source(document.path if document.is_file_backed else document.content)
+        text_stream = io.TextIOWrapper(source, encoding="utf-8-sig", newline=None)
+        if self.output_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.output_path)), exist_ok=True)
+            output_path = self.output_path
+            output = open(output_path, "w", encoding="utf-8", newline="")
+        else:
+            fd, output_path = tempfile.mkstemp(prefix="collabtrans_srt_", suffix=".srt")
+            output = io.TextIOWrapper(os.fdopen(fd, "wb"), encoding="utf-8", newline="")
+        return text_stream, output, output_path
+
+    @staticmethod
+    def _write_window(output: TextIO, text: str):
+        output.write(text)
+        # 每个窗口写出后立即刷新，翻译过程中即可读取已完成的部分
+        output.flush()
+
+    def _abort_windowed(self, text_stream: TextIO, output: TextIO, output_path: str):
+        text_stream.close()
+        output.close()
+        os.unlink(output_path)
+
+    def _finish_windowed(self, document: Document, text_stream: TextIO, output: TextIO, output_path: str,
+                         cue_count: int):
+        text_stream.close()
+        output.close()
+        if cue_count == 0:
+            self.logger.info("\n文件中没有找到需要翻译的字幕内容。")
+        else:
+            self.logger.info(f"共翻译 {cue_count} 条字幕。")
+        # 指定了输出路径时由调用方管理该文件
+        document.set_file_reference(output_path, delete_on_release=not self.output_path)
+
+    def _translate_window(self, window: list[srt.Subtitle | str]) -> tuple[str, int]:
+        texts = self._window_texts(window)
+        if texts and self.glossary_agent:
+            self._update_glossary(self.glossary_agent.send_segments(texts, self._window_chunk_size()))
+        if texts and self.translate_agent:
+            translated_texts = self.translate_agent.send_segments(texts, self._window_chunk_size())
+        else:
+            translated_texts = texts
+        return self._compose_window(window, translated_texts), len(texts)
+
+    async def _translate_window_async(self, window: list[srt.Subtitle | str]) -> tuple[str, int]:
+        texts = self._window_texts(window)
+        if texts and self.glossary_agent:
+            self._update_glossary(await self.glossary_agent.send_segments_async(texts, self._window_chunk_size()))
+        if texts and self.translate_agent:
+            translated_texts = await self.translate_agent.send_segments_async(texts, self._window_chunk_size())
+        else:
+            translated_texts = texts
+        return self._compose_window(window, translated_texts), len(texts)
+
+    def _translate_windowed(self, document: Document) -> Self:
+        text_stream, output, output_path = self._prepare_windowed(document)
+        cue_count = 0
+        try:
+            for window in self._iter_windows(text_stream):
+                text, count = self._translate_window(window)
+                self._write_window(output, text)
+                cue_count += count
+                self.logger.info(f"已完成 {cue_count} 条字幕的翻译")
+        except UnicodeDecodeError as e:
+            # 与整文件模式一致：记录错误，文档保持不变
+            self._abort_windowed(text_stream, output, output_path)
+            self.logger.error(f"无法解码SRT文件内容，请确保文件编码为UTF-8: {e}")
+            return self
+        except BaseException:
+            self._abort_windowed(text_stream, output, output_path)
+            raise
+        self._finish_windowed(document, text_stream, output, output_path, cue_count)
+        return self
+
+    async def _translate_windowed_async(self, document: Document) -> Self:
+        text_stream, output, output_path = await asyncio.to_thread(self._prepare_windowed, document)
+        windows = self._iter_windows(text_stream)
+        # 最多同时翻译 concurrent 个窗口，完成的窗口按原顺序写出
+        in_flight: deque[asyncio.Task] = deque()
+        cue_count = 0
+        try:
+            while True:
+                window = await asyncio.to_thread(next, windows, None)
+                if window is not None:
+                    in_flight.append(asyncio.create_task(self._translate_window_async(window)))
+                    if len(in_flight) < self.concurrent:
+                        continue
+                if not in_flight:
+                    break
+                text, count = await in_flight.popleft()
+                await asyncio.to_thread(self._write_window, output, text)
+                cue_count += count
+                self.logger.info(f"已完成 {cue_count} 条字幕的翻译")
+        except UnicodeDecodeError as e:
+            for task in in_flight:
+                task.cancel()
+            self._abort_windowed(text_stream, output, output_path)
+            self.logger.error(f"无法解码SRT文件内容，请确保文件编码为UTF-8: {e}")
+            return self
+        except BaseException:
+            for task in in_flight:
+                task.cancel()
+            self._abort_windowed(text_stream, output, output_path)
+            raise
+        self._finish_windowed(document, text_stream, output, output_path, cue_count)
+        return self
+
     def translate(self, document: Document) -> Self:
         """
         同步翻译SRT文档。
         """
+        if self.window_size:
+            return self._translate_windowed(document)
         subtitles, original_texts = self._pre_translate(document)
 
         if not original_texts:
@@ -129,6 +316,8 @@ class SrtTranslator(AiTranslator):
         """
         异步翻译SRT文档。
         """
+        if self.window_size:
+            return await self._translate_windowed_async(document)
         # I/O密集型操作在线程中运行
         subtitles, original_texts = await asyncio.to_thread(self._pre_translate, document)
 
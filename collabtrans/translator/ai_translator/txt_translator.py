@@ -1,12 +1,21 @@
 # SPDX-FileCopyrightText: 2025 QinHan
 # SPDX-License-Identifier: MPL-2.0
 import asyncio
+import io
+import os
+import tempfile
+from collections import deque
 from dataclasses import dataclass
-from typing import Self, Literal, List
+from typing import Self, Literal, List, Optional, Iterator, TextIO
 
 from collabtrans.agents.segments_agent import SegmentsTranslateAgentConfig, SegmentsTranslateAgent
 from collabtrans.ir.document import Document
 from collabtrans.translator.ai_translator.base import AiTranslatorConfig, AiTranslator
+from collabtrans.utils.json_utils import get_json_size
+from collabtrans.utils.stream_utils import open_binary_source
+
+# 流式模式下单个窗口的最大单元数，避免大量空行使窗口无限增长
+_MAX_WINDOW_UNITS = 10000
 
 
 @dataclass
@@ -24,15 +33,54 @@ class TXTTranslatorConfig(AiTranslatorConfig):
         separator (str):
             在 "append" 或 "prepend" 模式下，用于分隔原文和译文的字符串。
             默认为换行符 "\n"。
+        window_size (Optional[int]):
+            流式模式下每个窗口的目标大小（与chunk_size相同，按JSON字节数计算）。
+            设置后逐行读取文件，连续的非空行合并为段落片段，按窗口翻译并依次写出，内存占用只与窗口大小相关；
+            为 None 时整文件读取并逐行翻译。默认为 None。
+        segment_size (int):
+            流式模式下单个段落片段的最大字符数，超过时在行边界处拆分。默认为 1000。
+        output_path (Optional[str]):
+            流式模式下译文的写出路径，翻译过程中可读取已完成的部分；为 None 时写入临时文件。
     """
     insert_mode: Literal["replace", "append", "prepend"] = "replace"
     separator: str = "\n"
+    window_size: Optional[int] = None
+    segment_size: int = 1000
+    output_path: Optional[str] = None
+
+
+def iter_txt_units(stream: TextIO, segment_size: int) -> Iterator[tuple[str, bool]]:
+    """
+    逐个产出文本单元 (文本, 是否需要翻译)：连续的非空行合并为一个段落（以换行符连接，超过segment_size时在行边界拆分），
+    空行与仅含空白的行单独产出且不翻译。各单元以换行符连接即为原文。
+    """
+    paragraph = []
+    size = 0
+    for line in stream:
+        line = line.rstrip("\n")
+        if not line.strip():
+            if paragraph:
+                yield "\n".join(paragraph), True
+                paragraph = []
+                size = 0
+            yield line, False
+            continue
+        if paragraph and size + len(line) > segment_size:
+            yield "\n".join(paragraph), True
+            paragraph = []
+            size = 0
+        paragraph.append(line)
+        size += len(line) + 1
+    if paragraph:
+        yield "\n".join(paragraph), True
 
 
 class TXTTranslator(AiTranslator):
     """
     一个用于翻译纯文本 (.txt) 文件的翻译器。
     它会按行读取文件内容，对每一行进行翻译，然后根据配置将译文写回。
+    设置 window_size 时以流式模式处理：逐行读取，段落作为片段按窗口翻译，每个窗口作为一次请求发送，最多 concurrent 个窗口同时翻译，
+    完成的窗口按顺序追加写出，译文文档以文件引用保存。
     """
 
     def __init__(self, config: TXTTranslatorConfig):
@@ -63,6 +111,10 @@ class TXTTranslator(AiTranslator):
             self.translate_agent = SegmentsTranslateAgent(agent_config)
         self.insert_mode = config.insert_mode
         self.separator = config.separator
+        self.window_size = config.window_size
+        self.segment_size = max(1, config.segment_size)
+        self.output_path = config.output_path
+        self.concurrent = max(1, config.concurrent)
 
     def _pre_translate(self, document: Document) -> List[str]:
         """
@@ -86,6 +138,19 @@ class TXTTranslator(AiTranslator):
 
         return original_texts
 
+    def _final_text(self, original_text: str, translated_text: str) -> str:
+        """根据插入模式组合原文与译文"""
+        if self.insert_mode == "replace":
+            return translated_text
+        elif self.insert_mode == "append":
+            # strip() 避免在原文和译文间产生多余的空白
+            return original_text.strip() + self.separator + translated_text.strip()
+        elif self.insert_mode == "prepend":
+            return translated_text.strip() + self.separator + original_text.strip()
+        self.logger.error(f"不正确的TxtTranslatorConfig参数: insert_mode='{self.insert_mode}'")
+        # 默认回退到替换模式，避免程序中断
+        return translated_text
+
     def _after_translate(self, translated_texts: List[str], original_texts: List[str]) -> bytes:
         """
         翻译后处理步骤：将译文根据配置模式与原文合并，并生成新的TXT文件内容。
@@ -104,20 +169,7 @@ class TXTTranslator(AiTranslator):
                 processed_lines.append(original_text)
                 continue
 
-            translated_text = translated_texts[i]
-
-            # 根据插入模式更新内容
-            if self.insert_mode == "replace":
-                processed_lines.append(translated_text)
-            elif self.insert_mode == "append":
-                # strip() 避免在原文和译文间产生多余的空白
-                processed_lines.append(original_text.strip() + self.separator + translated_text.strip())
-            elif self.insert_mode == "prepend":
-                processed_lines.append(translated_text.strip() + self.separator + original_text.strip())
-            else:
-                self.logger.error(f"不正确的TxtTranslatorConfig参数: insert_mode='{self.insert_mode}'")
-                # 默认回退到替换模式，避免程序中断
-                processed_lines.append(translated_text)
+            processed_lines.append(self._final_text(original_text, translated_texts[i]))
 
         # 将所有处理后的行重新合成为一个字符串，以换行符分隔
         new_txt_content_str = "\n".join(processed_lines)
@@ -125,6 +177,152 @@ class TXTTranslator(AiTranslator):
         # 返回UTF-8编码的字节流
         return new_txt_content_str.encode('utf-8')
 
+    def _iter_windows(self, stream: TextIO) -> Iterator[list[tuple[str, bool]]]:
+        """将连续的文本单元打包为窗口，窗口内待翻译片段的JSON大小达到window_size（或单元数达到上限）时产出"""
+        window = []
+        size = 0
+        for text, translatable in iter_txt_units(stream, self.segment_size):
+            window.append((text, translatable))
+            if translatable:
+                size += get_json_size({str(len(window)): text})
+            if size >= self.window_size or len(window) >= _MAX_WINDOW_UNITS:
+                yield window
+                window = []
+                size = 0
+        if window:
+            yield window
+
+    @staticmethod
+    def _window_texts(window: list[tuple[str, bool]]) -> list[str]:
+        """窗口中需要翻译的片段（去重并保持出现顺序）"""
+        return list(dict.fromkeys(text for text, translatable in window if translatable))
+
+    def _compose_window(self, window: list[tuple[str, bool]], texts: list[str], translated_texts: list[str],
+                        first: bool) -> str:
+        translations = dict(zip(texts, translated_texts))
+        lines = [self._final_text(text, translations[text]) if translatable else text for text, translatable in window]
+        # 各单元之间以换行符连接，与整文件模式的输出一致
+        return ("" if first else "\n") + "\n".join(lines)
+
+    def _update_glossary(self, glossary_dict: dict | None):
+        if glossary_dict:
+            self.glossary_dict_gen = glossary_dict | (self.glossary_dict_gen or {})
+        if self.translate_agent:
+            self.translate_agent.update_glossary_dict(glossary_dict)
+
+    def _prepare_stream(self, document: Document):
+        source = open_binary_source(document.path if document.is_file_backed else document.content)
+        text_stream = io.TextIOWrapper(source, encoding="utf-8-sig", newline=None)
+        if self.output_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.output_path)), exist_ok=True)
+            output_path = self.output_path
+            output = open(output_path, "w", encoding="utf-8", newline="")
+        else:
+            fd, output_path = tempfile.mkstemp(prefix="collabtrans_txt_", suffix=".txt")
+            output = io.TextIOWrapper(os.fdopen(fd, "wb"), encoding="utf-8", newline="")
+        return text_stream, output, output_path
+
+    @staticmethod
+    def _write_window(output: TextIO, text: str):
+        output.write(text)
+        # 每个窗口写出后立即刷新，翻译过程中即可读取已完成的部分
+        output.flush()
+
+    @staticmethod
+    def _abort_stream(text_stream: TextIO, output: TextIO, output_path: str):
+        text_stream.close()
+        output.close()
+        os.unlink(output_path)
+
+    def _finish_stream(self, document: Document, text_stream: TextIO, output: TextIO, output_path: str,
+                       segment_count: int):
+        text_stream.close()
+        output.close()
+        if segment_count == 0:
+            self.logger.info("\n文件中没有找到需要翻译的文本内容。")
+        else:
+            self.logger.info(f"共翻译 {segment_count} 个段落。")
+        # 指定了输出路径时由调用方管理该文件
+        document.set_file_reference(output_path, delete_on_release=not self.output_path)
+
+    def _window_chunk_size(self) -> int:
+        # 保证一个窗口在一次请求中发送，并发请求数由同时翻译的窗口数限制在 concurrent 以内
+        return max(self.chunk_size, self.window_size * 2)
+
+    def _translate_window(self, window: list[tuple[str, bool]], first: bool) -> tuple[str, int]:
+        texts = self._window_texts(window)
+        if texts and self.glossary_agent:
+            self._update_glossary(self.glossary_agent.send_segments(texts, self._window_chunk_size()))
+        if texts and self.translate_agent:
+            translated_texts = self.translate_agent.send_segments(texts, self._window_chunk_size())
+        else:
+            translated_texts = texts
+        return self._compose_window(window, texts, translated_texts, first), len(texts)
+
+    async def _translate_window_async(self, window: list[tuple[str, bool]], first: bool) -> tuple[str, int]:
+        texts = self._window_texts(window)
+        if texts and self.glossary_agent:
+            self._update_glossary(await self.glossary_agent.send_segments_async(texts, self._window_chunk_size()))
+        if texts and self.translate_agent:
+            translated_texts = await self.translate_agent.send_segments_async(texts, self._window_chunk_size())
+        else:
+            translated_texts = texts
+        return self._compose_window(window, texts, translated_texts, first), len(texts)
+
+    def _translate_stream(self, document: Document) -> Self:
+        text_stream, output, output_path = self._prepare_stream(document)
+        segment_count = 0
+        try:
+            for index, window in enumerate(self._iter_windows(text_stream)):
+                text, count = self._translate_window(window, index == 0)
+                self._write_window(output, text)
+                segment_count += count
+                self.logger.info(f"已完成 {segment_count} 个段落的翻译")
+        except UnicodeDecodeError as e:
+            # 与整文件模式一致：记录错误，文档保持不变
+            self._abort_stream(text_stream, output, output_path)
+            self.logger.error(f"无法解码TXT文件内容，请确保文件编码为UTF-8: {e}")
+            return self
+        except BaseException:
+            self._abort_stream(text_stream, output, output_path)
+            raise
+        self._finish_stream(document, text_stream, output, output_path, segment_count)
+        return self
+
+    async def _translate_stream_async(self, document: Document) -> Self:
+        text_stream, output, output_path = await asyncio.to_thread(self._prepare_stream, document)
+        windows = self._iter_windows(text_stream)
+        # 最多同时翻译 concurrent 个窗口，完成的窗口按原顺序写出
+        in_flight: deque[asyncio.Task] = deque()
+        window_count = segment_count = 0
+        try:
+            while True:
+                window = await asyncio.to_thread(next, windows, None)
+                if window is not None:
+                    in_flight.append(asyncio.create_task(self._translate_window_async(window, window_count == 0)))
+                    window_count += 1
+                    if len(in_flight) < self.concurrent:
+                        continue
+                if not in_flight:
+                    break
+                text, count = await in_flight.popleft()
+                await asyncio.to_thread(self._write_window, output, text)
+                segment_count += count
+                self.logger.info(f"已完成 {segment_count} 个段落的翻译")
+        except UnicodeDecodeError as e:
+            for task in in_flight:
+                task.cancel()
+            self._abort_stream(text_stream, output, output_path)
+            self.logger.error(f"无法解码TXT文件内容，请确保文件编码为UTF-8: {e}")
+            return self
+        except BaseException:
+            for task in in_flight:
+                task.cancel()
+            self._abort_stream(text_stream, output, output_path)
+            raise
+        self._finish_stream(document, text_stream, output, output_path, segment_count)
+        return self
+
     def translate(self, document: Document) -> Self:
         """
         同步翻译TXT文档。
@@ -135,6 +333,8 @@ class TXTTranslator(AiTranslator):
         Returns:
             Self: 返回翻译器实例，以支持链式调用。
         """
+        if self.window_size:
+            return self._translate_stream(document)
         original_texts = self._pre_translate(document)
 
         if not original_texts:
@@ -173,6 +373,8 @@ class TXTTranslator(AiTranslator):
         Returns:
             Self: 返回翻译器实例，以支持链式调用。
         """
+        if self.window_size:
+            return await self._translate_stream_async(document)
         # I/O密集型操作在线程中运行
         original_texts = await asyncio.to_thread(self._pre_translate, document)
 
@@ -1,6 +1,7 @@
 # SPDX-FileCopyrightText: 2025 QinHan
 # SPDX-License-Identifier: MPL-2.0
-import asyncio
+import logging
+import zipfile
 from dataclasses import dataclass
 from io import BytesIO
 from typing import Self, Literal, List, Optional
@@ -11,6 +12,155 @@ from openpyxl.cell import Cell
 from collabtrans.agents.segments_agent import SegmentsTranslateAgentConfig, SegmentsTranslateAgent
 from collabtrans.ir.document import Document
 from collabtrans.translator.ai_translator.base import AiTranslatorConfig, AiTranslator
+from collabtrans.utils.process_pool import run_cpu_bound
+from collabtrans.utils.xlsx_stream import XlsxStreamSegments, extract_xlsx_stream, write_xlsx_stream
+
+module_logger = logging.getLogger(__name__)
+
+
+def collect_xlsx_cells(workbook, translate_regions: Optional[List[str]]) -> tuple[list[dict], list[str]]:
+    """
+    收集需要翻译的文本单元格，返回单元格信息与无效区域的警告信息。
+    """
+    cells_to_translate = []
+    warnings = []
+
+    # --- 步骤 1: 根据是否指定区域，收集需要翻译的文本单元格 ---
+
+    # 如果未指定翻译区域，则沿用旧逻辑，翻译所有单元格
+    if not translate_regions:  # 也处理 None 或空列表的情况
+        for sheet in workbook.worksheets:
+            for row in sheet.iter_rows():
+                for cell in row:
+                    if isinstance(cell.value, str) and cell.data_type == "s":
+                        cells_to_translate.append({
+                            "sheet_name": sheet.title,
+                            "coordinate": cell.coordinate,
+                            "original_text": cell.value,
+                        })
+    # 如果指定了翻译区域，则只在这些区域内查找
+    else:
+        processed_coordinates = set()
+
+        regions_by_sheet = {}
+        all_sheet_regions = []
+        for region in translate_regions:
+            if '!' in region:
+                sheet_name, cell_range = region.split('!', 1)
+                if sheet_name not in regions_by_sheet:
+                    regions_by_sheet[sheet_name] = []
+                regions_by_sheet[sheet_name].append(cell_range)
+            else:
+                all_sheet_regions.append(region)
+
+        for sheet in workbook.worksheets:
+            sheet_specific_ranges = regions_by_sheet.get(sheet.title, [])
+            total_ranges_for_this_sheet = sheet_specific_ranges + all_sheet_regions
+
+            if not total_ranges_for_this_sheet:
+                continue
+
+            for cell_range in total_ranges_for_this_sheet:
+                try:
+                    cells_in_range = sheet[cell_range]
+
+                    # --- START: 这是修改的关键部分 ---
+                    # 无论返回的是单个cell、一维元组(行/列)还是二维元组(矩形)，都将其展平为一维列表
+                    flat_cells = []
+                    if isinstance(cells_in_range, Cell):
+                        flat_cells.append(cells_in_range)
+                    elif isinstance(cells_in_range, tuple):
+                        for item in cells_in_range:
+                            if isinstance(item, Cell):
+                                flat_cells.append(item)  # 处理一维元组
+                            elif isinstance(item, tuple):
+                                for cell in item:  # 处理二维元组
+                                    flat_cells.append(cell)
+                    # --- END: 修改结束 ---
+
+                    # 使用简化后的单层循环
+                    for cell in flat_cells:
+                        full_coordinate = (sheet.title, cell.coordinate)
+                        if full_coordinate in processed_coordinates:
+                            continue
+
+                        if isinstance(cell.value, str) and cell.data_type == "s":
+                            cell_info = {
+                                "sheet_name": sheet.title,
+                                "coordinate": cell.coordinate,
+                                "original_text": cell.value,
+                            }
+                            cells_to_translate.append(cell_info)
+                            processed_coordinates.add(full_coordinate)
+
+                except Exception as e:
+                    warnings.append(f"跳过无效的区域 '{cell_range}' 在工作表 '{sheet.title}'. 错误: {e}")
+
+    return cells_to_translate, warnings
+
+
+def write_xlsx_cells(workbook, cells_to_translate, translated_texts, original_texts, insert_mode: str, separator: str,
+                     logger: logging.Logger = module_logger) -> bytes:
+    for i, cell_info in enumerate(cells_to_translate):
+        sheet_name = cell_info["sheet_name"]
+        coordinate = cell_info["coordinate"]
+        translated_text = translated_texts[i]
+        original_text = original_texts[i]
+
+        # 定位到工作表和单元格
+        sheet = workbook[sheet_name]
+        if insert_mode == "replace":
+            sheet[coordinate] = translated_text
+        elif insert_mode == "append":
+            sheet[coordinate] = original_text + separator + translated_text
+        elif insert_mode == "prepend":
+            sheet[coordinate] = translated_text + separator + original_text
+        else:
+            logger.error("不正确的XlsxTranslatorConfig参数")
+
+    workbook_output_stream = BytesIO()
+    # 保存修改后的工作簿到新文件
+    try:
+        workbook.save(workbook_output_stream)
+    finally:
+        workbook.close()
+    return workbook_output_stream.getvalue()
+
+
+# --- 供进程池使用的函数：工作簿无法跨进程传递，写回时重新加载 ---
+
+def extract_xlsx_cells(content: bytes, translate_regions: Optional[List[str]]) -> tuple[list[dict], list[str]]:
+    workbook = openpyxl.load_workbook(BytesIO(content))
+    try:
+        return collect_xlsx_cells(workbook, translate_regions)
+    finally:
+        workbook.close()
+
+
+def apply_xlsx_translations(content: bytes, cells_to_translate: list[dict], translated_texts: list[str],
+                            original_texts: list[str], insert_mode: str, separator: str) -> bytes:
+    workbook = openpyxl.load_workbook(BytesIO(content))
+    return write_xlsx_cells(workbook, cells_to_translate, translated_texts, original_texts, insert_mode, separator)
+
+
+def final_xlsx_texts(translated_texts: list[str], original_texts: list[str], insert_mode: str, separator: str,
+                     logger: logging.Logger = module_logger) -> list[str]:
+    if insert_mode == "replace":
+        return list(translated_texts)
+    elif insert_mode == "append":
+        return [original + separator + translated for original, translated in zip(original_texts, translated_texts)]
+    elif insert_mode == "prepend":
+        return [translated + separator + original for original, translated in zip(original_texts, translated_texts)]
+    logger.error("不正确的XlsxTranslatorConfig参数")
+    return list(original_texts)
+
+
+def apply_xlsx_stream_translations(content: bytes, segments: XlsxStreamSegments, translated_texts: list[str],
+                                   insert_mode: str, separator: str) -> bytes:
+    output = BytesIO()
+    write_xlsx_stream(content, segments,
+                      final_xlsx_texts(translated_texts, segments.texts, insert_mode, separator), output)
+    return output.getvalue()
 
 
 @dataclass
@@ -22,6 +172,13 @@ class XlsxTranslatorConfig(AiTranslatorConfig):
     # 如果不指定表名 (如 "C:D")，则应用于所有表。
     # 如果为 None 或空列表，则翻译整个文件中的所有文本。
     translate_regions: Optional[List[str]] = None
+    # 解析引擎：openpyxl 加载完整工作簿；streaming 流式扫描工作表XML并只重写修改过的部件，适合超大文件；
+    # auto 在工作表解压后总大小超过 stream_threshold 字节时使用 streaming
+    engine: Literal["auto", "openpyxl", "streaming"] = "auto"
+    stream_threshold: int = 32 * 1024 * 1024
+    # 按共享字符串表条目翻译：区域内引用到的每个共享字符串只翻译一次，引用它的单元格自动得到译文。
+    # 条目同时被区域外的单元格引用时会复制为新条目，区域外的单元格保持原文。该模式总是使用 streaming 引擎
+    translate_shared_strings: bool = False
 
 
 class XlsxTranslator(AiTranslator):
@@ -49,117 +206,50 @@ class XlsxTranslator(AiTranslator):
         self.separator = config.separator
         # --- 新增功能 ---
         self.translate_regions = config.translate_regions
+        self.engine = config.engine
+        self.stream_threshold = config.stream_threshold
+        self.translate_shared_strings = config.translate_shared_strings
+
+    def _use_stream_engine(self, document: Document) -> bool:
+        if self.translate_shared_strings:
+            return True
+        if self.engine != "auto":
+            return self.engine == "streaming"
+        try:
+            with zipfile.ZipFile(BytesIO(document.content)) as archive:
+                sheets_size = sum(info.file_size for info in archive.infolist()
+                                  if info.filename.startswith("xl/worksheets/"))
+        except zipfile.BadZipFile:
+            return False
+        return sheets_size >= self.stream_threshold
 
     def _pre_translate(self, document: Document):
         workbook = openpyxl.load_workbook(BytesIO(document.content))
-        cells_to_translate = []
-
-        # --- 步骤 1: 根据是否指定区域，收集需要翻译的文本单元格 ---
-
-        # 如果未指定翻译区域，则沿用旧逻辑，翻译所有单元格
-        if not self.translate_regions:  # 也处理 None 或空列表的情况
-            for sheet in workbook.worksheets:
-                for row in sheet.iter_rows():
-                    for cell in row:
-                        if isinstance(cell.value, str) and cell.data_type == "s":
-                            cells_to_translate.append({
-                                "sheet_name": sheet.title,
-                                "coordinate": cell.coordinate,
-                                "original_text": cell.value,
-                            })
-        # 如果指定了翻译区域，则只在这些区域内查找
-        else:
-            processed_coordinates = set()
-
-            regions_by_sheet = {}
-            all_sheet_regions = []
-            for region in self.translate_regions:
-                if '!' in region:
-                    sheet_name, cell_range = region.split('!', 1)
-                    if sheet_name not in regions_by_sheet:
-                        regions_by_sheet[sheet_name] = []
-                    regions_by_sheet[sheet_name].append(cell_range)
-                else:
-                    all_sheet_regions.append(region)
-
-            for sheet in workbook.worksheets:
-                sheet_specific_ranges = regions_by_sheet.get(sheet.title, [])
-                total_ranges_for_this_sheet = sheet_specific_ranges + all_sheet_regions
-
-                if not total_ranges_for_this_sheet:
-                    continue
-
-                for cell_range in total_ranges_for_this_sheet:
-                    try:
-                        cells_in_range = sheet[cell_range]
-
-                        # --- START: 这是修改的关键部分 ---
-                        # 无论返回的是单个cell、一维元组(行/列)还是二维元组(矩形)，都将其展平为一维列表
-                        flat_cells = []
-                        if isinstance(cells_in_range, Cell):
-                            flat_cells.append(cells_in_range)
-                        elif isinstance(cells_in_range, tuple):
-                            for item in cells_in_range:
-                                if isinstance(item, Cell):
-                                    flat_cells.append(item)  # 处理一维元组
-                                elif isinstance(item, tuple):
-                                    for cell in item:  # 处理二维元组
-                                        flat_cells.append(cell)
-                        # --- END: 修改结束 ---
-
-                        # 使用简化后的单层循环
-                        for cell in flat_cells:
-                            full_coordinate = (sheet.title, cell.coordinate)
-                            if full_coordinate in processed_coordinates:
-                                continue
-
-                            if isinstance(cell.value, str) and cell.data_type == "s":
-                                cell_info = {
-                                    "sheet_name": sheet.title,
-                                    "coordinate": cell.coordinate,
-                                    "original_text": cell.value,
-                                }
-                                cells_to_translate.append(cell_info)
-                                processed_coordinates.add(full_coordinate)
-
-                    except Exception as e:
-                        self.logger.warning(f"跳过无效的区域 '{cell_range}' 在工作表 '{sheet.title}'. 错误: {e}")
-
+        cells_to_translate, warnings = collect_xlsx_cells(workbook, self.translate_regions)
+        for warning in warnings:
+            self.logger.warning(warning)
         original_texts = [cell["original_text"] for cell in cells_to_translate]
         return workbook, cells_to_translate, original_texts
 
     def _after_translate(self, workbook, cells_to_translate, translated_texts, original_texts):
-        for i, cell_info in enumerate(cells_to_translate):
-            sheet_name = cell_info["sheet_name"]
-            coordinate = cell_info["coordinate"]
-            translated_text = translated_texts[i]
-            original_text = original_texts[i]
-
-            # 定位到工作表和单元格
-            sheet = workbook[sheet_name]
-            if self.insert_mode == "replace":
-                sheet[coordinate] = translated_text
-            elif self.insert_mode == "append":
-                sheet[coordinate] = original_text + self.separator + translated_text
-            elif self.insert_mode == "prepend":
-                sheet[coordinate] = translated_text + self.separator + original_text
-            else:
-                self.logger.error("不正确的XlsxTranslatorConfig参数")
-
-        workbook_output_stream = BytesIO()
-        # 保存修改后的工作簿到新文件
-        try:
-            workbook.save(workbook_output_stream)
-        finally:
-            workbook.close()
-        return workbook_output_stream.getvalue()
+        return write_xlsx_cells(workbook, cells_to_translate, translated_texts, original_texts,
+                                self.insert_mode, self.separator, self.logger)
 
     def translate(self, document: Document) -> Self:
-
-        workbook, cells_to_translate, original_texts = self._pre_translate(document)
-        if not cells_to_translate:
+        segments = None
+        workbook = None
+        if self._use_stream_engine(document):
+            self.logger.info("使用流式引擎解析xlsx")
+            segments = extract_xlsx_stream(document.content, self.translate_regions, self.translate_shared_strings)
+            for warning in segments.warnings:
+                self.logger.warning(warning)
+            original_texts = segments.texts
+        else:
+            workbook, cells_to_translate, original_texts = self._pre_translate(document)
+        if not original_texts:
             print("\n在指定区域中没有找到需要翻译的纯文本内容。")
-            workbook.close()
+            if workbook is not None:
+                workbook.close()
             return self
         if self.glossary_agent:
             self.glossary_dict_gen = self.glossary_agent.send_segments(original_texts, self.chunk_size)
@@ -171,15 +261,30 @@ class XlsxTranslator(AiTranslator):
         else:
             translated_texts = original_texts
 
-        document.content = self._after_translate(workbook, cells_to_translate, translated_texts, original_texts)
+        if segments is not None:
+            document.content = apply_xlsx_stream_translations(document.content, segments, translated_texts,
+                                                              self.insert_mode, self.separator)
+        else:
+            document.content = self._after_translate(workbook, cells_to_translate, translated_texts, original_texts)
         return self
 
     async def translate_async(self, document: Document) -> Self:
-
-        workbook, cells_to_translate, original_texts = await asyncio.to_thread(self._pre_translate, document)
-        if not cells_to_translate:
+        # 解析与写回在进程池中进行，文档以bytes传递
+        segments = None
+        if self._use_stream_engine(document):
+            self.logger.info("使用流式引擎解析xlsx")
+            segments = await run_cpu_bound(extract_xlsx_stream, document.content, self.translate_regions,
+                                           self.translate_shared_strings)
+            warnings = segments.warnings
+            original_texts = segments.texts
+        else:
+            cells_to_translate, warnings = await run_cpu_bound(extract_xlsx_cells, document.content,
+                                                               self.translate_regions)
+            original_texts = [cell["original_text"] for cell in cells_to_translate]
+        for warning in warnings:
+            self.logger.warning(warning)
+        if not original_texts:
             print("\n在指定区域中没有找到需要翻译的纯文本内容。")
-            workbook.close()
             return self
 
         if self.glossary_agent:
@@ -192,6 +297,11 @@ class XlsxTranslator(AiTranslator):
             translated_texts = await self.translate_agent.send_segments_async(original_texts, self.chunk_size)
         else:
             translated_texts = original_texts
-        document.content = await asyncio.to_thread(self._after_translate, workbook, cells_to_translate,
-                                                   translated_texts, original_texts)
+        if segments is not None:
+            document.content = await run_cpu_bound(apply_xlsx_stream_translations, document.content, segments,
+                                                   translated_texts, self.insert_mode, self.separator)
+        else:
+            document.content = await run_cpu_bound(apply_xlsx_translations, document.content, cells_to_translate,
+                                                   translated_texts, original_texts, self.insert_mode,
+                                                   self.separator)
         return self
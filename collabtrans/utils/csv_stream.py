@@ -0,0 +1,104 @@
+# SPDX-FileCopyrightText: 2025 QinHan
+# SPDX-License-Identifier: MPL-2.0
+"""
+csv的流式读写：编码检测与方言识别只使用文件头部的样本，之后逐行读取，不把整个文件解码到内存中。
+"""
+import codecs
+import csv
+import io
+import re
+from typing import BinaryIO, Iterator, Optional, List
+
+import chardet
+from openpyxl.utils.cell import range_boundaries
+
+ENCODING_SAMPLE_SIZE = 4096
+DIALECT_SAMPLE_SIZE = 2048
+# 限定候选分隔符，避免样本被截断时把换行符等误判为分隔符
+CSV_DELIMITERS = ",;\t|"
+
+# 不需要翻译的单元格：空白、数字、日期、电话号码等只由数字和符号组成的值
+_NON_TEXT_PATTERN = re.compile(r"^[\d\s.,:;+\-*/%()#$€£¥]*$")
+
+
+def detect_csv_encoding(sample: bytes) -> tuple[str, float]:
+    """
+    返回 (编码, 置信度)，带BOM的utf-8返回utf-8-sig，以便读取时去掉BOM。
+    样本是合法的UTF-8（包括纯ASCII）时按UTF-8读取：chardet对纯ASCII的样本返回ascii或单字节编码，
+    文件后部的非ASCII字符会被错误解码。chardet未给出结果或给出ascii时同样按UTF-8读取。
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig", 1.0
+    try:
+        # 样本末尾可能截断在多字节字符中间，不作为错误
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8", 1.0
+    except UnicodeDecodeError:
+        pass
+    detection_result = chardet.detect(sample)
+    encoding, confidence = detection_result['encoding'], detection_result['confidence']
+    if not encoding or encoding.lower() == "ascii":
+        return "utf-8", confidence
+    return encoding, confidence
+
+
+def sniff_csv_dialect(sample: str) -> type[csv.Dialect] | str | None:
+    """识别CSV方言（如分隔符），无法识别时返回None"""
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS)
+    except csv.Error:
+        return None
+
+
+def writer_dialect(dialect) -> dict:
+    """写出时沿用识别到的分隔符与引号，其余按excel方言（引号加倍转义），保证任意内容都能写出"""
+    if isinstance(dialect, str):
+        return {"dialect": dialect}
+    return {"dialect": "excel", "delimiter": dialect.delimiter, "quotechar": dialect.quotechar or '"'}
+
+
+def iter_csv_rows(stream: BinaryIO, encoding: str, dialect) -> Iterator[list[str]]:
+    """以给定编码逐行解析CSV，严格解码，遇到无法解码的字节时抛出 ValueError，不静默替换"""
+    text_stream = io.TextIOWrapper(stream, encoding=encoding, newline="")
+    try:
+        yield from csv.reader(text_stream, dialect)
+    except UnicodeDecodeError as e:
+        raise ValueError(f"无法以编码 '{encoding}' 解码CSV文件: {e}。请将文件转换为UTF-8编码后重试。") from e
+    finally:
+        # 由调用方负责关闭底层的二进制流
+        text_stream.detach()
+
+
+def parse_columns(translate_columns: Optional[List[str]]) -> tuple[list[tuple[int, int | None]] | None, list[str]]:
+    """
+    将列选择（如 "A"、"C:E"，也接受 "Sheet1!C:E"、"B2:B10" 形式的区域）解析为 (最小列, 最大列) 列表，列号从1开始。
+    CSV只有一张表，工作表名与行范围被忽略。未指定时返回None，表示翻译全部列。
+    """
+    if not translate_columns:
+        return None, []
+    columns = []
+    warnings = []
+    for region in translate_columns:
+        cell_range = region.split("!", 1)[1] if "!" in region else region
+        try:
+            min_col, min_row, max_col, max_row = range_boundaries(cell_range)
+        except (ValueError, TypeError) as e:
+            warnings.append(f"跳过无效的列 '{region}'. 错误: {e}")
+            continue
+        if min_row is not None or max_row is not None:
+            warnings.append(f"CSV按列选择翻译区域，忽略 '{region}' 中的行范围")
+        columns.append((min_col or 1, max_col))
+    return columns, warnings
+
+
+def in_columns(columns: list[tuple[int, int | None]] | None, col: int) -> bool:
+    if columns is None:
+        return True
+    for min_col, max_col in columns:
+        if col >= min_col and (max_col is None or col <= max_col):
+            return True
+    return False
+
+
+def is_translatable(value: str) -> bool:
+    return not _NON_TEXT_PATTERN.match(value)
@@ -0,0 +1,196 @@
+# SPDX-FileCopyrightText: 2025 QinHan
+# SPDX-License-Identifier: MPL-2.0
+"""
+超大docx的流式处理：以iterparse逐个读取正文、页眉页脚、脚注尾注部件中的顶层元素，
+只记录紧凑的 (部件序号, 段落序号, run起止下标) 引用，不构建python-docx对象。
+写回时只重写包含译文的部件，其余zip条目按原始压缩数据复制。
+内存占用与文本量相关，而不是与元素数量相关。
+"""
+import re
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+from lxml import etree
+
+from collabtrans.utils.ooxml_stream import XML_SPACE, iter_units, rewrite_part
+from collabtrans.utils.zip_utils import open_zip, copy_zip_entry_raw, new_zip_info
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def _w(tag: str) -> str:
+    return f"{{{W_NS}}}{tag}"
+
+
+W_BODY = _w("body")
+W_P = _w("p")
+W_R = _w("r")
+W_T = _w("t")
+W_RPR = _w("rPr")
+W_TYPE = _w("type")
+_IMAGE_TAGS = (_w("drawing"), _w("pict"))
+_TAB_TAGS = frozenset((_w("tab"), _w("ptab")))
+_CR_TAG = _w("cr")
+_BR_TAG = _w("br")
+_HYPHEN_TAG = _w("noBreakHyphen")
+# python-docx 引擎遍历的表格结构：正文中的表格、行、单元格（可嵌套）
+_TABLE_TAGS = frozenset((_w("tbl"), _w("tr"), _w("tc")))
+
+# 需要翻译的部件：正文、页眉、页脚、脚注、尾注
+TEXT_PART_PATTERN = re.compile(r"^word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml$")
+BODY_PART = "word/document.xml"
+
+
+@dataclass
+class DocxStreamSegments:
+    """流式提取的结果，refs[i] 为 texts[i] 对应的 (部件序号, 段落序号, 起始run, 结束run)"""
+    parts: list[str] = field(default_factory=list)
+    refs: list[tuple[int, int, int, int]] = field(default_factory=list)
+    texts: list[str] = field(default_factory=list)
+
+
+def _is_image_run(run: etree._Element) -> bool:
+    return next(run.iter(*_IMAGE_TAGS), None) is not None
+
+
+def _run_text(run: etree._Element) -> str:
+    """与 python-docx 的 Run.text 规则一致"""
+    parts = []
+    for child in run:
+        tag = child.tag
+        if tag == W_T:
+            parts.append(child.text or "")
+        elif tag in _TAB_TAGS:
+            parts.append("\t")
+        elif tag == _CR_TAG:
+            parts.append("\n")
+        elif tag == _BR_TAG:
+            parts.append("\n" if child.get(W_TYPE, "textWrapping") == "textWrapping" else "")
+        elif tag == _HYPHEN_TAG:
+            parts.append("-")
+    return "".join(parts)
+
+
+def _set_run_text(run: etree._Element, text: str):
+    """与 python-docx 的 Run.text 赋值规则一致：保留 w:rPr，制表符写为 w:tab，换行写为 w:br"""
+    for child in list(run):
+        if child.tag != W_RPR:
+            run.remove(child)
+    buffer = []
+
+    def flush():
+        if buffer:
+            value = "".join(buffer)
+            t = etree.SubElement(run, W_T)
+            t.text = value
+            if len(value.strip()) < len(value):
+                t.set(XML_SPACE, "preserve")
+            buffer.clear()
+
+    for char in text:
+        if char == "\t":
+            flush()
+            etree.SubElement(run, _w("tab"))
+        elif char in "\r\n":
+            flush()
+            etree.SubElement(run, _BR_TAG)
+        else:
+            buffer.append(char)
+    flush()
+
+
+def _iter_paragraph_segments(paragraph: etree._Element) -> Iterator[tuple[int, int, str]]:
+    """按图片run切分段落，产出 (起始run, 结束run, 文本)，规则与 DocxTranslator 一致"""
+    runs = [child for child in paragraph if child.tag == W_R]
+    start = 0
+    text = ""
+    for i, run in enumerate(runs):
+        if _is_image_run(run):
+            if text.strip():
+                yield start, i, text
+            start = i + 1
+            text = ""
+        else:
+            text += _run_text(run)
+    if text.strip():
+        yield start, len(runs), text
+
+
+def _is_body_paragraph(paragraph: etree._Element, unit: etree._Element) -> bool:
+    """是否为 python-docx 引擎处理的段落：正文的直接段落，或（嵌套）表格单元格中的直接段落"""
+    element = paragraph
+    while element is not unit:
+        element = element.getparent()
+        if element.tag not in _TABLE_TAGS:
+            return False
+    return True
+
+
+def _iter_paragraphs(stream: BinaryIO) -> Iterator[tuple[etree._Element, etree._Element]]:
+    """按文档顺序产出部件中的全部段落（包括表格、文本框中的段落）及其所在的顶层单元"""
+    for unit in iter_units(stream, W_BODY):
+        for paragraph in unit.iter(W_P):
+            yield paragraph, unit
+
+
+def extract_docx_stream(source: bytes | str | Path | BinaryIO, body_only: bool = False) -> DocxStreamSegments:
+    """
+    提取正文、页眉页脚、脚注尾注中的待翻译文本。
+    body_only 时只提取 word/document.xml 中 python-docx 引擎处理的段落（不含文本框、内容控件等），
+    使两种引擎的翻译范围一致。
+    """
+    segments = DocxStreamSegments()
+    with open_zip(source) as archive:
+        for name in archive.namelist():
+            if not (name == BODY_PART if body_only else TEXT_PART_PATTERN.match(name)):
+                continue
+            part_index = len(segments.parts)
+            segments.parts.append(name)
+            with archive.open(name) as stream:
+                # 段落序号按部件中的全部段落计数，与写回时的遍历顺序一致
+                for paragraph_index, (paragraph, unit) in enumerate(_iter_paragraphs(stream)):
+                    if body_only and not _is_body_paragraph(paragraph, unit):
+                        continue
+                    for start, end, text in _iter_paragraph_segments(paragraph):
+                        segments.refs.append((part_index, paragraph_index, start, end))
+                        segments.texts.append(text)
+    return segments
+
+
+def _rewrite_part(stream: BinaryIO, output: BinaryIO, paragraph_texts: dict[int, list[tuple[int, int, str]]]):
+    paragraph_index = 0
+
+    def transform(unit: etree._Element):
+        nonlocal paragraph_index
+        for paragraph in list(unit.iter(W_P)):
+            writes = paragraph_texts.get(paragraph_index)
+            paragraph_index += 1
+            if not writes:
+                continue
+            runs = [child for child in paragraph if child.tag == W_R]
+            for start, end, text in writes:
+                _set_run_text(runs[start], text)
+                for run in runs[start + 1:end]:
+                    _set_run_text(run, "")
+
+    rewrite_part(stream, output, W_BODY, transform)
+
+
+def write_docx_stream(source: bytes | str | Path | BinaryIO, segments: DocxStreamSegments, final_texts: list[str],
+                      target: str | Path | BinaryIO):
+    """将译文写回，只重写包含译文的部件，其余条目原样复制"""
+    part_writes: dict[int, dict[int, list[tuple[int, int, str]]]] = {}
+    for (part_index, paragraph_index, start, end), text in zip(segments.refs, final_texts):
+        part_writes.setdefault(part_index, {}).setdefault(paragraph_index, []).append((start, end, text))
+    modified = {segments.parts[i]: writes for i, writes in part_writes.items()}
+
+    with open_zip(source) as archive, zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as output:
+        for info in archive.infolist():
+            writes = modified.get(info.filename)
+            if writes is None:
+                copy_zip_entry_raw(archive, info, output)
+                continue
+            with archive.open(info) as stream, output.open(new_zip_info(info), "w", force_zip64=True) as out:
+                _rewrite_part(stream, out, writes)
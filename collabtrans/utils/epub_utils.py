@@ -0,0 +1,218 @@
+# SPDX-FileCopyrightText: 2025 QinHan
+# SPDX-License-Identifier: MPL-2.0
+"""
+epub的解析与写回。
+各章节（XHTML）由lxml在进程池中并行解析，主进程只接收紧凑的 (章节序号, 元素序号, 槽位) 引用与原文，
+不保留解析树；写回时只重新解析并序列化包含译文的章节（同样在进程池中完成压缩），
+其余条目按原始压缩数据复制。
+"""
+import posixpath
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO
+from urllib.parse import unquote
+
+from lxml import etree
+
+from collabtrans.utils.html_blocks import (SLOT_TEXT, SLOT_TAIL, SLOT_BLOCK, XML_PARSER_OPTIONS, local_name,
+                                           iter_segments, apply_block_translation, replace_html_entities,
+                                           parse_xhtml, serialize_xhtml)
+from collabtrans.utils.process_pool import map_batched
+from collabtrans.utils.zip_utils import (open_zip, copy_zip_entry_raw, deflate_data, new_zip_info,
+                                        write_compressed_entry)
+
+CONTAINER_NS = {'cn': 'urn:oasis:names:tc:opendocument:xmlns:container'}
+OPF_NS = {'opf': 'http://www.idpf.org/2007/opf'}
+CHAPTER_MEDIA_TYPES = ('application/xhtml+xml', 'text/html')
+
+# 直接位于这些元素中的文本不翻译
+SKIP_PARENT_TAGS = frozenset(('style', 'script', 'head', 'title', 'meta'))
+
+# 每批提交给进程池的章节数，限制同时驻留内存的章节数据量
+_CHAPTER_BATCH_SIZE = 64
+
+# 只有 .html/.htm 章节允许按HTML解析与写回，其余（.xhtml 等）必须保持为格式良好的XML
+_HTML_CHAPTER_SUFFIXES = ('.html', '.htm')
+
+
+@dataclass
+class EpubSegments:
+    """
+    解析结果，refs[i] 为 texts[i] 对应的 (章节序号, 元素序号, 槽位)，元素序号为 root.iter() 中的位置，
+    槽位见 html_blocks 中的 SLOT_TEXT、SLOT_TAIL、SLOT_BLOCK
+    """
+    chapters: list[str] = field(default_factory=list)
+    refs: list[tuple[int, int, int]] = field(default_factory=list)
+    texts: list[str] = field(default_factory=list)
+
+
+def read_manifest(archive: zipfile.ZipFile) -> tuple[str, dict[str, dict[str, str]], list[str]]:
+    """返回 (opf路径, manifest条目 id -> {href, media_type, properties}, spine中的idref列表)，href为zip内的完整路径"""
+    try:
+        container_xml = archive.read('META-INF/container.xml')
+    except KeyError:
+        raise ValueError("无效的 EPUB：找不到 META-INF/container.xml")
+    rootfile = etree.fromstring(container_xml).find('cn:rootfiles/cn:rootfile', CONTAINER_NS)
+    opf_path = rootfile.get('full-path')
+    opf_dir = posixpath.dirname(opf_path)
+    try:
+        opf_root = etree.fromstring(archive.read(opf_path))
+    except KeyError:
+        raise ValueError(f"无效的 EPUB：找不到 {opf_path}")
+
+    manifest_items = {}
+    for item in opf_root.iterfind('opf:manifest/opf:item', OPF_NS):
+        # 路径需要相对于 .opf 文件的位置
+        href = posixpath.normpath(posixpath.join(opf_dir, unquote(item.get('href', ''))))
+        manifest_items[item.get('id')] = {'href': href, 'media_type': item.get('media-type'),
+                                          'properties': item.get('properties', '').split()}
+    spine_itemrefs = [item.get('idref') for item in opf_root.iterfind('opf:spine/opf:itemref', OPF_NS)]
+    return opf_path, manifest_items, spine_itemrefs
+
+
+def chapter_paths(archive: zipfile.ZipFile) -> list[str]:
+    """manifest中所有的 xhtml/html 文件"""
+    _, manifest_items, _ = read_manifest(archive)
+    return [item['href'] for item in manifest_items.values() if item['media_type'] in CHAPTER_MEDIA_TYPES]
+
+
+def is_xhtml_chapter(path: str) -> bool:
+    return not path.lower().endswith(_HTML_CHAPTER_SUFFIXES)
+
+
+def parse_chapter(data: bytes, xhtml: bool = False) -> tuple[etree._Element, bool]:
+    """
+    按XHTML（XML）解析，返回 (根元素, 是否按XML写回)。
+    不是格式良好的XML时：xhtml为True的章节以可恢复的XML解析器解析，仍按XML写回；其余章节退回HTML解析器。
+    """
+    if xhtml:
+        return parse_xhtml(data), True
+    data = replace_html_entities(data)
+    try:
+        return etree.fromstring(data, etree.XMLParser(**XML_PARSER_OPTIONS)), True
+    except etree.XMLSyntaxError:
+        return etree.fromstring(data, etree.HTMLParser(huge_tree=True)), False
+
+
+def serialize_chapter(root: etree._Element, is_xml: bool, with_doctype: bool = True) -> bytes:
+    if is_xml:
+        return serialize_xhtml(root)
+    # HTML解析器会为没有doctype的文档补上默认的doctype，此时只序列化根元素
+    return etree.tostring(root.getroottree() if with_doctype else root, encoding='utf-8', method='html')
+
+
+def _epub_allowed(element: etree._Element) -> bool:
+    return local_name(element) not in SKIP_PARENT_TAGS
+
+
+def extract_chapter(data: bytes, group_blocks: bool = False, xhtml: bool = False) -> list[tuple[int, int, str]]:
+    """
+    进程池任务：提取章节中需要翻译的文本，返回 (元素序号, 槽位, 去除首尾空白的文本)。
+    group_blocks为True时，只含行内内容的块元素整体作为一个带占位符的片段。
+    """
+    root, _ = parse_chapter(data, xhtml)
+    indexes = {element: index for index, element in enumerate(root.iter())}
+    return [(indexes[element], slot, text.strip())
+            for element, slot, text in iter_segments(root, _epub_allowed, group_blocks)]
+
+
+def apply_chapter(data: bytes, writes: list[tuple[int, int, str]], insert_mode: str = "replace",
+                  separator: str = "\n", xhtml: bool = False) -> bytes:
+    """
+    进程池任务：将 (元素序号, 槽位, 文本) 写回章节并重新序列化。
+    文本节点写入最终文本并保留原文本节点首尾的空白；块写入带占位符的译文，按insert_mode与原文组合。
+    """
+    root, is_xml = parse_chapter(data, xhtml)
+    targets = {(index, slot): text for index, slot, text in writes}
+    # 先收集元素再写入：块的写回可能调整子元素顺序
+    elements = list(root.iter())
+    for index, element in enumerate(elements):
+        for slot in (SLOT_TEXT, SLOT_TAIL, SLOT_BLOCK):
+            text = targets.get((index, slot))
+            if text is None:
+                continue
+            if slot == SLOT_BLOCK:
+                apply_block_translation(element, text, _epub_allowed, insert_mode, separator)
+                continue
+            original = element.tail if slot == SLOT_TAIL else element.text
+            leading = original[:len(original) - len(original.lstrip())]
+            trailing = original[len(original.rstrip()):]
+            if slot == SLOT_TAIL:
+                element.tail = leading + text + trailing
+            else:
+                element.text = leading + text + trailing
+    return serialize_chapter(root, is_xml, with_doctype=b'<!doctype' in data[:1024].lower())
+
+
+def final_text(original_text: str, translated_text: str, insert_mode: str, separator: str) -> str:
+    if insert_mode == "append":
+        return original_text + separator + translated_text
+    elif insert_mode == "prepend":
+        return translated_text + separator + original_text
+    return translated_text
+
+
+def extract_epub(source: bytes | str | Path | BinaryIO, logger=None, group_blocks: bool = False) -> EpubSegments:
+    """提取epub中所有章节需要翻译的文本"""
+    segments = EpubSegments()
+    with open_zip(source) as archive:
+        paths = []
+        for path in chapter_paths(archive):
+            if path in archive.NameToInfo:
+                paths.append(path)
+            elif logger is not None:
+                logger.warning(f"在 EPUB 中找不到文件: {path}")
+        results = map_batched(extract_chapter,
+                              ((archive.read(path), group_blocks, is_xhtml_chapter(path)) for path in paths),
+                              _CHAPTER_BATCH_SIZE)
+        for path, slots in zip(paths, results):
+            if not slots:
+                continue
+            chapter_index = len(segments.chapters)
+            segments.chapters.append(path)
+            for index, slot, text in slots:
+                segments.refs.append((chapter_index, index, slot))
+                segments.texts.append(text)
+    return segments
+
+
+def apply_chapter_compressed(data: bytes, writes: list[tuple[int, int, str]], insert_mode: str,
+                             separator: str, xhtml: bool) -> tuple[bytes, int, int]:
+    """进程池任务：写回译文后直接在工作进程中压缩，返回 deflate_data 的结果"""
+    return deflate_data(apply_chapter(data, writes, insert_mode, separator, xhtml))
+
+
+def translate_chapters(archive: zipfile.ZipFile, segments: EpubSegments, translated_texts: list[str],
+                       insert_mode: str, separator: str) -> dict[str, tuple[bytes, int, int]]:
+    """并行写回译文并压缩，返回 章节路径 -> (压缩数据, CRC32, 原始大小)，只包含被修改的章节"""
+    writes: dict[int, list[tuple[int, int, str]]] = {}
+    for (chapter_index, index, slot), original_text, translated_text in zip(segments.refs, segments.texts,
+                                                                           translated_texts):
+        if slot != SLOT_BLOCK:
+            translated_text = final_text(original_text, translated_text, insert_mode, separator)
+        writes.setdefault(chapter_index, []).append((index, slot, translated_text))
+    chapter_indexes = sorted(writes)
+    results = map_batched(apply_chapter_compressed,
+                          ((archive.read(segments.chapters[i]), writes[i], insert_mode, separator,
+                            is_xhtml_chapter(segments.chapters[i])) for i in chapter_indexes), _CHAPTER_BATCH_SIZE)
+    return {segments.chapters[i]: data for i, data in zip(chapter_indexes, results)}
+
+
+def write_epub(source: bytes | str | Path | BinaryIO, segments: EpubSegments, translated_texts: list[str],
+               target: str | Path | BinaryIO, insert_mode: str = "replace", separator: str = "\n"):
+    """
+    写回译文并重新打包。mimetype 必须是第一个条目且不压缩；
+    修改过的章节写入预先压缩好的数据，其余条目（图片、字体、样式表等）按原始压缩数据复制。
+    """
+    with open_zip(source) as archive:
+        modified = translate_chapters(archive, segments, translated_texts, insert_mode, separator)
+        with zipfile.ZipFile(target, 'w') as output:
+            for info in sorted(archive.infolist(), key=lambda i: i.filename != 'mimetype'):
+                compressed = modified.get(info.filename)
+                if compressed is not None:
+                    write_compressed_entry(output, info, compressed)
+                elif info.filename == 'mimetype' and info.compress_type != zipfile.ZIP_STORED:
+                    output.writestr(new_zip_info(info, zipfile.ZIP_STORED), archive.read(info))
+                else:
+                    copy_zip_entry_raw(archive, info, output)
@@ -0,0 +1,285 @@
+# SPDX-FileCopyrightText: 2025 QinHan
+# SPDX-License-Identifier: MPL-2.0
+"""
+按块级元素合并翻译片段（基于lxml）。
+块内的行内元素以轻量占位符表示，如 "点击<g1>这里</g1>查看<g2/>"，整段作为一个片段翻译；
+写回时按占位符把译文重新分配到各文本节点（允许译文调整行内元素的顺序），
+占位符结构与原文不一致时，将去掉占位符的整段译文写入块元素开头，并清空行内元素中的文本。
+"""
+import copy
+import re
+from html.entities import name2codepoint
+from typing import Callable, Iterator
+
+from lxml import etree
+
+# 片段槽位：元素的text、元素的tail、整个块
+SLOT_TEXT = 0
+SLOT_TAIL = 1
+SLOT_BLOCK = 2
+
+INLINE_TAGS = frozenset((
+    'a', 'abbr', 'b', 'bdi', 'bdo', 'big', 'br', 'cite', 'code', 'data', 'del', 'dfn', 'em', 'font', 'i', 'img',
+    'ins', 'kbd', 'mark', 'q', 's', 'samp', 'small', 'span', 'strike', 'strong', 'sub', 'sup', 'time', 'tt', 'u',
+    'var', 'wbr',
+))
+# 内容不参与翻译、整体作为一个占位符的行内元素（如注音）
+OPAQUE_INLINE_TAGS = frozenset(('ruby', 'svg', 'math'))
+
+_PLACEHOLDER_PATTERN = re.compile(r"<(/?)g(\d+)(/?)>")
+
+XML_PARSER_OPTIONS = dict(resolve_entities=False, huge_tree=True, no_network=True)
+_NAMED_ENTITY_PATTERN = re.compile(rb'&([A-Za-z][A-Za-z0-9]*);')
+_XML_PREDEFINED_ENTITIES = frozenset(('amp', 'lt', 'gt', 'quot', 'apos'))
+
+# 判断元素中的文本是否可以翻译
+Allowed = Callable[[etree._Element], bool]
+
+
+def replace_html_entities(data: bytes) -> bytes:
+    """
+    把XML未预定义的HTML命名实体（如 &nbsp;）换成数字字符引用。
+    否则没有DTD的XHTML不是格式良好的XML，带DTD时未解析的实体节点会把一句话拆成多个片段
+    """
+    def replace(match: re.Match) -> bytes:
+        name = match.group(1).decode('ascii')
+        if name in _XML_PREDEFINED_ENTITIES or name not in name2codepoint:
+            return match.group(0)
+        return b'&#%d;' % name2codepoint[name]
+
+    return _NAMED_ENTITY_PATTERN.sub(replace, data) if b'&' in data else data
+
+
+def parse_xhtml(data: bytes) -> etree._Element:
+    """按XML解析XHTML文档，不是格式良好的XML时以可恢复的XML解析器解析，写回时应使用 serialize_xhtml"""
+    data = replace_html_entities(data)
+    try:
+        return etree.fromstring(data, etree.XMLParser(**XML_PARSER_OPTIONS))
+    except etree.XMLSyntaxError:
+        root = etree.fromstring(data, etree.XMLParser(recover=True, **XML_PARSER_OPTIONS))
+    if root is None:
+        root = etree.fromstring(data, etree.HTMLParser(huge_tree=True))
+    return root
+
+
+def serialize_xhtml(root: etree._Element) -> bytes:
+    return etree.tostring(root.getroottree(), encoding='utf-8', xml_declaration=True)
+
+
+def local_name(element: etree._Element) -> str | None:
+    """元素的小写本地名，注释与处理指令返回None"""
+    tag = element.tag
+    if not isinstance(tag, str):
+        return None
+    return tag.rsplit('}', 1)[-1].lower()
+
+
+def _is_opaque(element: etree._Element, allowed: Allowed) -> bool:
+    name = local_name(element)
+    return name is None or name in OPAQUE_INLINE_TAGS or not allowed(element)
+
+
+def _inline_compatible(element: etree._Element, allowed: Allowed) -> bool:
+    """元素能否作为块内的行内内容：注释、行内元素（其子元素同样是行内内容），或作为整体占位的元素"""
+    name = local_name(element)
+    if name is None or name in OPAQUE_INLINE_TAGS:
+        return True
+    if name not in INLINE_TAGS:
+        return False
+    if not allowed(element):
+        return True
+    return all(_inline_compatible(child, allowed) for child in element)
+
+
+def _is_space(text: str | None) -> bool:
+    return not text or text.isspace()
+
+
+def _number_nodes(block: etree._Element, allowed: Allowed) -> list[tuple[etree._Element, int, bool]]:
+    """按文档顺序为块内的行内元素编号，返回 (元素, 父节点编号, 是否整体占位)，编号从1开始，块本身为0"""
+    nodes = []
+
+    def visit(element: etree._Element, parent_number: int):
+        for child in element:
+            opaque = _is_opaque(child, allowed)
+            nodes.append((child, parent_number, opaque))
+            if not opaque:
+                visit(child, len(nodes))
+
+    visit(block, 0)
+    return nodes
+
+
+def render_block(block: etree._Element, allowed: Allowed) -> str:
+    """将块渲染为带占位符的文本，编号规则与 _number_nodes 一致（先序遍历）"""
+    parts = [block.text or ""]
+    number = 0
+
+    def visit(element: etree._Element):
+        nonlocal number
+        for child in element:
+            number += 1
+            current = number
+            if _is_opaque(child, allowed) or (len(child) == 0 and not child.text):
+                parts.append(f"<g{current}/>")
+            else:
+                parts.append(f"<g{current}>")
+                parts.append(child.text or "")
+                visit(child)
+                parts.append(f"</g{current}>")
+            parts.append(child.tail or "")
+
+    visit(block)
+    return "".join(parts)
+
+
+def strip_placeholders(text: str) -> str:
+    return _PLACEHOLDER_PATTERN.sub("", text)
+
+
+def iter_segments(root: etree._Element, allowed: Allowed, group_blocks: bool = True
+                  ) -> Iterator[tuple[etree._Element, int, str]]:
+    """
+    按文档顺序产出需要翻译的片段 (元素, 槽位, 未去除首尾空白的文本)。
+    group_blocks为True时，子元素全部为行内内容的元素作为一个块整体产出（SLOT_BLOCK），
+    其余文本节点逐个产出（SLOT_TEXT、SLOT_TAIL）。
+    """
+
+    def visit(element: etree._Element) -> Iterator[tuple[etree._Element, int, str]]:
+        element_allowed = allowed(element)
+        if group_blocks and element_allowed and len(element) and \
+                all(_inline_compatible(child, allowed) for child in element):
+            text = render_block(element, allowed)
+            if not _is_space(strip_placeholders(text)):
+                yield element, SLOT_BLOCK, text
+            return
+        if element_allowed and not _is_space(element.text):
+            yield element, SLOT_TEXT, element.text
+        for child in element:
+            if local_name(child) is not None:
+                yield from visit(child)
+            if element_allowed and not _is_space(child.tail):
+                yield child, SLOT_TAIL, child.tail
+
+    if local_name(root) is not None:
+        yield from visit(root)
+
+
+def _parse_placeholders(text: str, nodes: list[tuple[etree._Element, int, bool]]
+                        ) -> tuple[dict[int, str], dict[int, str], dict[int, list[int]]] | None:
+    """
+    解析译文中的占位符，返回 (各节点的text, 各节点的tail, 各节点的子节点顺序)，块本身编号为0。
+    占位符缺失、重复或嵌套关系与原文不一致时返回None。
+    """
+    texts: dict[int, str] = {0: ""}
+    tails: dict[int, str] = {}
+    children: dict[int, list[int]] = {0: []}
+    stack = [0]
+    # 当前文本写入的位置：(节点编号, 是否为tail)
+    target = (0, False)
+    position = 0
+    for match in _PLACEHOLDER_PATTERN.finditer(text):
+        segment = text[position:match.start()]
+        position = match.end()
+        if segment:
+            store = tails if target[1] else texts
+            store[target[0]] = store.get(target[0], "") + segment
+        closing, number, self_closing = match.group(1), int(match.group(2)), match.group(3)
+        if not 1 <= number <= len(nodes):
+            return None
+        _, parent_number, opaque = nodes[number - 1]
+        if closing:
+            if self_closing or stack[-1] != number:
+                return None
+            stack.pop()
+            target = (number, True)
+            continue
+        if number in texts or parent_number != stack[-1]:
+            return None
+        children[parent_number].append(number)
+        texts[number] = ""
+        if self_closing:
+            target = (number, True)
+        else:
+            if opaque:
+                return None
+            children[number] = []
+            stack.append(number)
+            target = (number, False)
+    if len(stack) != 1 or len(texts) != len(nodes) + 1:
+        return None
+    segment = text[position:]
+    if segment:
+        store = tails if target[1] else texts
+        store[target[0]] = store.get(target[0], "") + segment
+    return texts, tails, children
+
+
+def distribute_translation(block: etree._Element, translated: str, allowed: Allowed) -> bool:
+    """将带占位符的译文写回块中，保留原文首尾的空白。占位符结构无法对应时退化为整段写入，返回False"""
+    original = render_block(block, allowed)
+    leading = original[:len(original) - len(original.lstrip())]
+    trailing = original[len(original.rstrip()):]
+    text = leading + translated.strip() + trailing
+    nodes = _number_nodes(block, allowed)
+    parsed = _parse_placeholders(text, nodes)
+    if parsed is None:
+        block.text = strip_placeholders(text)
+        for element, _, opaque in nodes:
+            if not opaque:
+                element.text = None
+            element.tail = None
+        return False
+
+    texts, tails, children = parsed
+    elements = [block] + [element for element, _, _ in nodes]
+    block.text = texts[0] or None
+    for number, (element, _, opaque) in enumerate(nodes, 1):
+        if not opaque:
+            element.text = texts.get(number) or None
+        element.tail = tails.get(number) or None
+    # 按译文中的顺序重新排列行内元素
+    for number, order in children.items():
+        parent = elements[number]
+        if list(parent) != [elements[child] for child in order]:
+            for child in list(parent):
+                parent.remove(child)
+            parent.extend(elements[child] for child in order)
+    return True
+
+
+def apply_block_translation(block: etree._Element, translated: str, allowed: Allowed, insert_mode: str,
+                            separator: str) -> bool:
+    """
+    按插入模式写回块的译文。append/prepend 时将原块内容复制一份写入译文，与原文以separator连接。
+    返回占位符是否成功对应。
+    """
+    if insert_mode not in ("append", "prepend"):
+        return distribute_translation(block, translated, allowed)
+    scratch = copy.deepcopy(block)
+    scratch.tail = None
+    matched = distribute_translation(scratch, translated, allowed)
+    translated_children = list(scratch)
+    # 复制出的元素不能与原文中的元素使用相同的id
+    for child in translated_children:
+        for element in child.iter():
+            if isinstance(element.tag, str):
+                element.attrib.pop('id', None)
+    if insert_mode == "append":
+        if len(block):
+            last = block[-1]
+            last.tail = (last.tail or "") + separator + (scratch.text or "")
+        else:
+            block.text = (block.text or "") + separator + (scratch.text or "")
+        block.extend(translated_children)
+    else:
+        original_text = block.text or ""
+        block.text = scratch.text
+        if translated_children:
+            last = translated_children[-1]
+            last.tail = (last.tail or "") + separator + original_text
+            for index, child in enumerate(translated_children):
+                block.insert(index, child)
+        else:
+            block.text = (scratch.text or "") + separator + original_text
+    return matched
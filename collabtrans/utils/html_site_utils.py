@@ -0,0 +1,108 @@
+# SPDX-FileCopyrightText: 2025 QinHan
+# SPDX-License-Identifier: MPL-2.0
+"""
+多页面HTML站点（zip压缩包）的解析与写回。
+各页面由lxml在进程池中并行解析，按 html_translator 中的黑白名单规则提取片段；
+页眉、页脚、导航栏等在各页面中重复出现的片段全局去重，只翻译一次。
+写回时只重新解析并压缩包含译文的页面，其余条目（图片、脚本、样式表等）按原始压缩数据复制，保持站点的目录结构。
+"""
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO
+
+from collabtrans.translator.ai_translator.html_translator import parse_html_blocks, write_back_html_blocks
+from collabtrans.utils.process_pool import map_batched
+from collabtrans.utils.zip_utils import open_zip, copy_zip_entry_raw, deflate_data, write_compressed_entry
+
+SITE_PAGE_SUFFIXES = ('.html', '.htm', '.xhtml')
+
+# 每批提交给进程池的页面数，限制同时驻留内存的页面数据量
+_PAGE_BATCH_SIZE = 64
+
+
+@dataclass
+class HtmlSiteSegments:
+    """
+    解析结果。texts 为去重（去除首尾空白）后的片段，refs[i] 为 pages[i] 中各片段在 texts 中的序号，
+    total 为去重前的片段总数
+    """
+    pages: list[str] = field(default_factory=list)
+    refs: list[list[int]] = field(default_factory=list)
+    texts: list[str] = field(default_factory=list)
+    total: int = 0
+
+
+def is_xhtml_page(path: str) -> bool:
+    """.xhtml 页面按XML解析与写回，保持为格式良好的XML"""
+    return path.lower().endswith('.xhtml')
+
+
+def extract_site_page(content: bytes, group_blocks: bool, xhtml: bool = False) -> list[str]:
+    """进程池任务：提取页面中需要翻译的片段（去除首尾空白），不可翻译的标签保留在页面中"""
+    _, _, original_texts = parse_html_blocks(content, group_blocks, keep_non_translatable=True, xhtml=xhtml)
+    return [text.strip() for text in original_texts]
+
+
+def apply_site_page_compressed(content: bytes, translated_texts: list[str], insert_mode: str, separator: str,
+                               group_blocks: bool, xhtml: bool = False) -> tuple[bytes, int, int]:
+    """进程池任务：按相同规则重新解析页面，写回译文后在工作进程中压缩，返回 deflate_data 的结果"""
+    root, translatable_items, original_texts = parse_html_blocks(content, group_blocks, keep_non_translatable=True,
+                                                                 xhtml=xhtml)
+    return deflate_data(write_back_html_blocks(root, content, translatable_items, translated_texts, original_texts,
+                                               insert_mode, separator, xhtml=xhtml))
+
+
+def site_pages(archive: zipfile.ZipFile, page_suffixes: tuple[str, ...] = SITE_PAGE_SUFFIXES) -> list[str]:
+    return [info.filename for info in archive.infolist()
+            if not info.is_dir() and info.filename.lower().endswith(page_suffixes)]
+
+
+def extract_html_site(source: bytes | str | Path | BinaryIO, group_blocks: bool = False,
+                      page_suffixes: tuple[str, ...] = SITE_PAGE_SUFFIXES) -> HtmlSiteSegments:
+    """并行提取站点中所有页面的片段，并对所有页面的片段全局去重"""
+    segments = HtmlSiteSegments()
+    indexes: dict[str, int] = {}
+    with open_zip(source) as archive:
+        paths = site_pages(archive, page_suffixes)
+        results = map_batched(extract_site_page,
+                              ((archive.read(path), group_blocks, is_xhtml_page(path)) for path in paths),
+                              _PAGE_BATCH_SIZE)
+        for path, texts in zip(paths, results):
+            if not texts:
+                continue
+            refs = []
+            for text in texts:
+                index = indexes.get(text)
+                if index is None:
+                    index = indexes[text] = len(segments.texts)
+                    segments.texts.append(text)
+                refs.append(index)
+            segments.pages.append(path)
+            segments.refs.append(refs)
+            segments.total += len(refs)
+    return segments
+
+
+def write_html_site(source: bytes | str | Path | BinaryIO, segments: HtmlSiteSegments, translated_texts: list[str],
+                    target: str | Path | BinaryIO, insert_mode: str = "replace", separator: str = " ",
+                    group_blocks: bool = False):
+    """
+    并行写回各页面的译文并重新打包，条目顺序与原压缩包一致。
+    页面顺序与压缩包中的条目顺序相同，处理结果边产出边写入，不在内存中累积。
+    """
+    with open_zip(source) as archive:
+        results = map_batched(apply_site_page_compressed,
+                              ((archive.read(path), [translated_texts[index] for index in refs], insert_mode,
+                                separator, group_blocks, is_xhtml_page(path))
+                               for path, refs in zip(segments.pages, segments.refs)),
+                              _PAGE_BATCH_SIZE)
+        pending = zip(segments.pages, results)
+        next_page = next(pending, None)
+        with zipfile.ZipFile(target, 'w') as output:
+            for info in archive.infolist():
+                if next_page is not None and info.filename == next_page[0]:
+                    write_compressed_entry(output, info, next_page[1])
+                    next_page = next(pending, None)
+                else:
+                    copy_zip_entry_raw(archive, info, output)
@@ -0,0 +1,119 @@
+# SPDX-FileCopyrightText: 2025 QinHan
+# SPDX-License-Identifier: MPL-2.0
+"""
+json的流式读写：顶层为数组的文件（如记录列表、API导出数据）逐条解析记录，
+缓冲区中只保留当前记录与一次读取的数据，内存占用与文件大小无关。
+"""
+import json
+from functools import lru_cache
+from typing import Any, Iterator, TextIO
+
+from jsonpath_ng.ext import parse
+
+READ_SIZE = 1024 * 1024
+
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = "0123456789+-.eE"
+
+
+@lru_cache(maxsize=256)
+def compile_json_path(path: str):
+    """编译jsonpath表达式，相同的表达式在各任务间共用编译结果"""
+    return parse(path)
+
+
+class _Reader:
+    """按需从文本流读取数据的缓冲区，已解析的部分被丢弃"""
+
+    def __init__(self, stream: TextIO, read_size: int):
+        self.stream = stream
+        self.read_size = read_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """读取更多数据，文件已读完时返回False。缓冲区中未解析的数据较多时按其大小读取，避免大记录被反复解析"""
+        if self.eof:
+            return False
+        data = self.stream.read(max(self.read_size, len(self.buffer) - self.pos))
+        if not data:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """跳过空白，返回下一个字符，文件结束时返回空字符串"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+
+def peek_json_type(stream: TextIO) -> str:
+    """返回文本流中第一个非空白字符（不消耗数据，要求流可以seek）"""
+    position = stream.tell()
+    while True:
+        data = stream.read(4096)
+        if not data:
+            stream.seek(position)
+            return ""
+        stripped = data.lstrip(_WHITESPACE)
+        if stripped:
+            stream.seek(position)
+            return stripped[0]
+
+
+def iter_json_array(stream: TextIO, read_size: int = READ_SIZE) -> Iterator[Any]:
+    """逐个产出顶层数组中的元素，顶层不是数组或格式错误时抛出 json.JSONDecodeError"""
+    decoder = json.JSONDecoder()
+    reader = _Reader(stream, read_size)
+    if reader.peek() != "[":
+        raise json.JSONDecodeError("顶层不是数组", reader.buffer, reader.pos)
+    reader.pos += 1
+    if reader.peek() == "]":
+        reader.pos += 1
+    else:
+        while True:
+            reader.peek()
+            while True:
+                try:
+                    value, end = decoder.raw_decode(reader.buffer, reader.pos)
+                except json.JSONDecodeError:
+                    if reader.fill():
+                        continue
+                    raise
+                # 位于缓冲区末尾的数字可能被截断，读取更多数据后重新解析
+                if isinstance(value, (int, float)) and not reader.eof and \
+                        (end == len(reader.buffer) or reader.buffer[end] in _NUMBER_CHARS) and reader.fill():
+                    continue
+                break
+            reader.pos = end
+            yield value
+            separator = reader.peek()
+            reader.pos += 1
+            if separator == "]":
+                break
+            if separator != ",":
+                raise json.JSONDecodeError("数组元素之间缺少逗号", reader.buffer, reader.pos - 1)
+    if reader.peek():
+        raise json.JSONDecodeError("数组之后存在多余的数据", reader.buffer, reader.pos)
+
+
+def dump_array_items(values: list[Any], first: bool) -> str:
+    """
+    将一批数组元素序列化为与 json.dumps(array, ensure_ascii=False, indent=2) 中相同的文本。
+    整批序列化一次，避免逐条调用编码器的开销
+    """
+    text = json.dumps(values, ensure_ascii=False, indent=2)
+    # 去掉外层的 "[\n" 与 "\n]"，保留元素的缩进
+    return ("[\n" if first else ",\n") + text[2:-2]
+
+
+def close_array(empty: bool) -> str:
+    return "[]" if empty else "\n]"
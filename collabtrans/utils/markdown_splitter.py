@@ -209,6 +209,107 @@ def join_markdown_texts(markdown_texts: List[str]) -> str:
     return joined_text
 
 
+_HEADING_PATTERN = re.compile(r'^(#{1,6})(?=\s)')
+_TABLE_SEPARATOR_PATTERN = re.compile(r'^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?$')
+_FENCE_PATTERN = re.compile(r'^\s*(```|~~~)')
+# 以这些字符开头的行属于标题、列表、表格、引用、代码、图片、公式或HTML等，不视为普通段落
+_NON_PARAGRAPH_PATTERN = re.compile(r'^\s*(#|\||>|[-*+]\s|\d+[.)]\s|!\[|<|```|~~~|\$\$|([-*_])\s*\2\s*\2)')
+# 以这些字符结尾的段落视为已完整结束
+_PARAGRAPH_TERMINATORS = tuple('.!?:;。！？：；…"”’」』')
+_CJK_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af\uff00-\uffef]')
+
+
+def _is_table_row(line: str) -> bool:
+    line = line.strip()
+    return len(line) > 1 and line.startswith('|') and line.endswith('|')
+
+
+def _is_paragraph_line(line: str) -> bool:
+    return bool(line.strip()) and not _NON_PARAGRAPH_PATTERN.match(line)
+
+
+def _heading_levels(lines: List[str]) -> List[int]:
+    """代码块之外各标题行的级别"""
+    levels = []
+    in_fence = False
+    for line in lines:
+        if _FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+        elif not in_fence and (match := _HEADING_PATTERN.match(line)):
+            levels.append(len(match.group(1)))
+    return levels
+
+
+def _demote_title_headings(lines: List[str], level: int) -> List[str]:
+    """将代码块之外的一级标题改为指定级别"""
+    result = []
+    in_fence = False
+    for line in lines:
+        if _FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+        elif not in_fence and line.startswith('# '):
+            line = '#' * level + line[1:]
+        result.append(line)
+    return result
+
+
+def _stitch_table(prev_lines: List[str], lines: List[str]) -> List[str]:
+    """
+    上一段以表格行结尾、本段以表格开头时视为同一表格被截断：
+    去掉本段表格的分隔行，若其表头与上一段表格的表头相同（续表重复表头）则一并去掉
+    """
+    if len(lines) < 2 or not _TABLE_SEPARATOR_PATTERN.match(lines[1].strip()):
+        return lines
+    header_index = len(prev_lines) - 1
+    while header_index > 0 and _is_table_row(prev_lines[header_index - 1]):
+        header_index -= 1
+    if lines[0].strip() == prev_lines[header_index].strip():
+        return lines[2:]
+    return lines[:1] + lines[2:]
+
+
+def join_markdown_parts(markdown_parts: List[str]) -> str:
+    """
+    拼接按页码区间等方式独立产生的整段markdown，各段去除首尾空白后以空行分隔，并在分段处做衔接：
+    - 上一段以表格行结尾、下一段以表格开头时合并为同一表格（去掉续表的分隔行和重复的表头）；
+    - 上一段以未结束的普通段落结尾、下一段以普通段落开头时合并为同一段落；
+    - 第一段之后出现的一级标题降为此前出现过的最高非一级标题级别（默认二级），
+      避免分段解析时把各段开头的标题误识别为文档标题造成层级不一致。
+    仅依据分段处的行格式判断，无法识别的情况（如被截断的列表项、代码块）仍按独立的块拼接。
+    """
+    lines: List[str] = []
+    has_title = False
+    section_level = None
+    for part in markdown_parts:
+        part = part.strip()
+        if not part:
+            continue
+        part_lines = part.split('\n')
+        if lines and has_title:
+            part_lines = _demote_title_headings(part_lines, section_level or 2)
+        levels = _heading_levels(part_lines)
+        has_title = has_title or 1 in levels
+        section_levels = [level for level in levels if level > 1]
+        if section_levels:
+            section_level = min(section_levels + ([section_level] if section_level else []))
+
+        if not lines:
+            lines = part_lines
+        elif _is_table_row(lines[-1]) and _is_table_row(part_lines[0]):
+            lines.extend(_stitch_table(lines, part_lines))
+        elif (_is_paragraph_line(lines[-1]) and _is_paragraph_line(part_lines[0])
+              and not lines[-1].rstrip().endswith(_PARAGRAPH_TERMINATORS)):
+            prev_line = lines[-1].rstrip()
+            next_line = part_lines[0].lstrip()
+            # 中日韩文字之间直接相连，其他情况以空格相连
+            separator = "" if _CJK_PATTERN.match(prev_line[-1]) and _CJK_PATTERN.match(next_line[0]) else " "
+            lines[-1] = prev_line + separator + next_line
+            lines.extend(part_lines[1:])
+        else:
+            lines.append("")
+            lines.extend(part_lines)
+    return "\n".join(lines)
+
 if __name__ == '__main__':
     from pathlib import Path
     from collabtrans.utils.markdown_utils import clean_markdown_math_block
@@ -10,7 +10,7 @@ import threading
 import uuid
 import zipfile
 from pathlib import Path
-import tempfile
+from typing import BinaryIO
 
 
 class MaskDict:
@@ -42,6 +42,16 @@ class MaskDict:
         with self._lock:
             return item in self._dict
 
+    def to_dict(self) -> dict:
+        with self._lock:
+            return dict(self._dict)
+
+    @classmethod
+    def from_dict(cls, mapping: dict):
+        mask_dict = cls()
+        mask_dict._dict.update(mapping)
+        return mask_dict
+
 
 # def uris2placeholder(markdown:str, mask_dict:MaskDict):
 ##替换整个uri
@@ -84,9 +94,15 @@ def placeholder2uris(markdown: str, mask_dict: MaskDict):
     return markdown
 
 
-def find_markdown_in_zip(zip_bytes: bytes):
-    zip_file_bytes = io.BytesIO(zip_bytes)
-    with zipfile.ZipFile(zip_file_bytes, 'r') as zip_ref:
+def _open_zip_source(zip_source: bytes | str | Path | BinaryIO):
+    """ZipFile可直接接受路径或文件对象，bytes则包装为BytesIO"""
+    if isinstance(zip_source, (bytes, bytearray)):
+        return io.BytesIO(zip_source)
+    return zip_source
+
+
+def find_markdown_in_zip(zip_source: bytes | str | Path | BinaryIO):
+    with zipfile.ZipFile(_open_zip_source(zip_source), 'r') as zip_ref:
         # 获取 ZIP 中所有文件名
         all_files = zip_ref.namelist()
         # 筛选出 .md 文件
@@ -100,11 +116,13 @@ def find_markdown_in_zip(zip_bytes: bytes):
             raise ValueError("ZIP 中没有 Markdown 文件")
 
 
-def embed_inline_image_from_zip(zip_bytes: bytes, filename_in_zip: str, encoding="utf-8"):
-    zip_file_bytes = io.BytesIO(zip_bytes)
-
-    print(f"正在尝试打开内存中的ZIP存档...")
-    with zipfile.ZipFile(zip_file_bytes, 'r') as archive:
+def embed_inline_image_from_zip(zip_source: bytes | str | Path | BinaryIO, filename_in_zip: str, encoding="utf-8"):
+    """
+    zip_source可以是zip的bytes，也可以是磁盘上zip文件的路径或文件对象。
+    传入路径时按需读取压缩包成员，不会把整个压缩包载入内存。
+    """
+    print(f"正在尝试打开ZIP存档...")
+    with zipfile.ZipFile(_open_zip_source(zip_source), 'r') as archive:
         print(f"ZIP存档已打开。正在查找文件 '{filename_in_zip}'...")
 
         if filename_in_zip not in archive.namelist():
@@ -187,30 +205,41 @@ def embed_inline_image_from_zip(zip_bytes: bytes, filename_in_zip: str, encoding
         return modified_md_content
 
 
-def unembed_base64_images_to_zip(markdown:str,markdown_name:str,image_folder_name="images")->bytes:
-    with tempfile.TemporaryDirectory() as temp_dir:
-        image_folder=os.path.join(temp_dir,image_folder_name)
-        os.makedirs(image_folder,exist_ok=True)
-        pattern=r"!\[(.*?)\]\(data:(.*?);.*base64,(.*)\)"
-        def unembed_base64_images(match:re.Match)->str:
+# 本身已压缩的图片格式，写入zip时直接存储，避免再次deflate
+_COMPRESSED_IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".jpe", ".gif", ".webp", ".avif", ".heic"}
+
+
+def write_unembedded_markdown_zip(markdown: str, markdown_name: str, target: str | Path | BinaryIO,
+                                  image_folder_name="images"):
+    """
+    将markdown中的base64内联图片提取为独立文件，与markdown一起单次写入zip。
+    target可以是文件路径或可写的二进制流（不要求可seek，可直接写入流式响应）。
+    相同的图片只写入一次；png、jpeg等已压缩的图片不再压缩。
+    """
+    pattern = r"!\[(.*?)\]\(data:(.*?);.*base64,(.*)\)"
+    with zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        written = set()
+
+        def unembed_base64_images(match: re.Match) -> str:
             b64data = match.group(3)
-            extension=mimetypes.guess_extension(match.group(2))
-            image_id=hashlib.md5(b64data.encode()).hexdigest()[:8]
-            image_name=f"{image_id}{extension}"
-            url=f"./{image_folder_name}/{image_name}"
-            #创建对应的image文件
-            with open(os.path.join(image_folder,image_name),"wb") as f:
-                f.write(base64.b64decode(b64data))
-            return f"![{match.group(1)}]({url})"
-        modified_md_content = re.sub(pattern, unembed_base64_images,markdown)
-        with open(os.path.join(temp_dir,f"{markdown_name}"),"w",encoding="utf-8") as f:
-            f.write(modified_md_content)
-        zip_buffer=io.BytesIO()
-        folder_path=Path(temp_dir)
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for file in folder_path.rglob('*'):
-                if file.is_file():
-                    zipf.write(file, file.relative_to(folder_path))
+            extension = mimetypes.guess_extension(match.group(2))
+            image_id = hashlib.md5(b64data.encode()).hexdigest()[:8]
+            image_name = f"{image_id}{extension}"
+            if image_name not in written:
+                written.add(image_name)
+                compress_type = zipfile.ZIP_STORED if (extension or "").lower() in _COMPRESSED_IMAGE_EXTENSIONS \
+                    else zipfile.ZIP_DEFLATED
+                zipf.writestr(f"{image_folder_name}/{image_name}", base64.b64decode(b64data),
+                              compress_type=compress_type)
+            return f"![{match.group(1)}](./{image_folder_name}/{image_name})"
+
+        modified_md_content = re.sub(pattern, unembed_base64_images, markdown)
+        zipf.writestr(markdown_name, modified_md_content.encode("utf-8"))
+
+
+def unembed_base64_images_to_zip(markdown:str,markdown_name:str,image_folder_name="images")->bytes:
+    zip_buffer = io.BytesIO()
+    write_unembedded_markdown_zip(markdown, markdown_name, zip_buffer, image_folder_name=image_folder_name)
     return zip_buffer.getvalue()
 
 
@@ -0,0 +1,146 @@
+# SPDX-FileCopyrightText: 2025 QinHan
+# SPDX-License-Identifier: MPL-2.0
+"""
+OOXML（docx、xlsx）部件的流式读取与重写。
+部件按顶层单元处理：根元素的子元素，以及指定容器元素（如 w:body、sheetData）的子元素。
+每个单元处理完即从树中释放，内存占用只与单个单元的大小相关。
+"""
+import re
+from typing import BinaryIO, Callable, Iterable, Iterator
+
+from lxml import etree
+
+XML_NS = "http://www.w3.org/XML/1998/namespace"
+XML_SPACE = f"{{{XML_NS}}}space"
+
+_WRITE_BUFFER_SIZE = 1024 * 1024
+_XML_DECLARATION = b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\r\n'
+_XMLNS_PATTERN = re.compile(rb'\s+xmlns(?::([\w.-]+))?="([^"]*)"')
+_XMLNS_BLOCK_PATTERN = re.compile(rb'(?:\s+xmlns(?::[\w.-]+)?="[^"]*")+')
+
+
+def iter_units(stream: BinaryIO, container_tag: str | None,
+               on_start: Callable[[etree._Element], None] | None = None,
+               on_container_end: Callable[[etree._Element], None] | None = None) -> Iterator[etree._Element]:
+    """
+    逐个产出部件的顶层单元，单元被处理后即从树中释放。
+    on_start在根元素与容器元素开始时调用，on_container_end在容器元素结束时调用。
+    """
+    container = None
+    inside_container = False
+    depth = 0
+    for event, element in etree.iterparse(stream, events=("start", "end"), huge_tree=True, resolve_entities=False):
+        if event == "start":
+            depth += 1
+            if depth == 2 and element.tag == container_tag and container is None:
+                container = element
+                inside_container = True
+            if on_start is not None and (depth == 1 or element is container):
+                on_start(element)
+            continue
+        depth -= 1
+        # 结束事件中depth为元素父级的深度：1表示根元素的子元素，2且位于容器内表示容器的子元素
+        if depth == 1:
+            if element is container:
+                inside_container = False
+                if on_container_end is not None:
+                    on_container_end(element)
+                continue
+        elif depth != 2 or not inside_container:
+            continue
+        parent = element.getparent()
+        yield element
+        element.clear()
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+def iter_elements(stream: BinaryIO, tag: str) -> Iterator[etree._Element]:
+    """只读场景下逐个产出指定标签的元素（该标签不能嵌套），元素被处理后即释放"""
+    for _, element in etree.iterparse(stream, events=("end",), tag=tag, huge_tree=True, resolve_entities=False):
+        yield element
+        element.clear()
+        parent = element.getparent()
+        if parent is not None:
+            while element.getprevious() is not None:
+                del parent[0]
+
+
+_stripped_declarations: dict[tuple[bytes, tuple], bytes] = {}
+
+
+def serialize_in_scope(element: etree._Element, nsmap: dict) -> bytes:
+    """序列化元素，并去掉起始标签上与根元素重复的命名空间声明"""
+    data = etree.tostring(element, encoding="UTF-8", xml_declaration=False)
+    match = _XMLNS_BLOCK_PATTERN.search(data, 0, data.index(b">"))
+    if match is None:
+        return data
+    # 同一部件中各单元继承的命名空间声明相同，缓存去重后的结果
+    block = match.group(0)
+    key = (block, tuple(sorted(nsmap.items(), key=lambda item: item[0] or "")))
+    stripped = _stripped_declarations.get(key)
+    if stripped is None:
+        def strip(declaration: re.Match) -> bytes:
+            prefix = declaration.group(1).decode() if declaration.group(1) else None
+            return b"" if nsmap.get(prefix) == declaration.group(2).decode() else declaration.group(0)
+
+        stripped = _XMLNS_PATTERN.sub(strip, block)
+        if len(_stripped_declarations) < 256:
+            _stripped_declarations[key] = stripped
+    return data[:match.start()] + stripped + data[match.end():]
+
+
+def _open_tag(element: etree._Element, nsmap: dict) -> tuple[bytes, bytes]:
+    """返回元素的起始标签与结束标签（不含子元素）"""
+    shell = etree.Element(element.tag, attrib=dict(element.attrib), nsmap=element.nsmap)
+    data = serialize_in_scope(shell, nsmap)
+    qname = data[1:].split(b" ", 1)[0].split(b"/", 1)[0]
+    return data[:-2] + b">", b"</" + qname + b">"
+
+
+def rewrite_part(stream: BinaryIO, output: BinaryIO, container_tag: str | None,
+                 transform: Callable[[etree._Element], None] | None = None,
+                 on_start: Callable[[etree._Element], None] | None = None,
+                 extra_units: Callable[[dict], Iterable[etree._Element]] | None = None):
+    """
+    流式重写部件：每个顶层单元经transform修改后写出。
+    on_start可在起始标签写出前修改根元素或容器元素的属性；
+    extra_units以根元素的命名空间映射为参数，返回的元素追加在所有单元之后（用于没有容器元素的部件）。
+    """
+    closing: list[bytes] = []
+    root_nsmap: dict = {}
+    # 合并小块写入，减少对压缩流的调用次数
+    buffer = bytearray()
+
+    def write(data: bytes):
+        buffer.extend(data)
+        if len(buffer) >= _WRITE_BUFFER_SIZE:
+            output.write(buffer)
+            buffer.clear()
+
+    def write_start(element: etree._Element):
+        nonlocal root_nsmap
+        if on_start is not None:
+            on_start(element)
+        if element.getparent() is None:
+            write(_XML_DECLARATION)
+            open_tag, close_tag = _open_tag(element, {})
+            root_nsmap = dict(element.nsmap)
+        else:
+            open_tag, close_tag = _open_tag(element, root_nsmap)
+        write(open_tag)
+        closing.append(close_tag)
+
+    def write_container_end(_: etree._Element):
+        write(closing.pop())
+
+    for unit in iter_units(stream, container_tag, on_start=write_start, on_container_end=write_container_end):
+        if transform is not None:
+            transform(unit)
+        write(serialize_in_scope(unit, root_nsmap))
+    if extra_units is not None:
+        for element in extra_units(root_nsmap):
+            write(serialize_in_scope(element, root_nsmap))
+    for close_tag in reversed(closing):
+        write(close_tag)
+    output.write(buffer)
@@ -0,0 +1,85 @@
+# SPDX-FileCopyrightText: 2025 QinHan
+# SPDX-License-Identifier: MPL-2.0
+"""
+CPU密集型预处理/后处理（markdown遮罩与分块、BeautifulSoup解析、openpyxl加载等）使用的进程池。
+提交的函数必须是模块级函数，参数与返回值均为可pickle的简单数据（文档以bytes传递）。
+未启用进程池时退化为asyncio.to_thread。
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Iterable, Iterator
+
+_executor: ProcessPoolExecutor | None = None
+_max_workers: int = 0
+_lock = threading.Lock()
+
+
+def configure_process_pool(max_workers: int | None):
+    """
+    设置进程池大小。None或0表示使用CPU核数，负数表示禁用进程池（使用线程）。
+    进程池在首次使用时创建，修改大小后旧进程池处理完已提交的任务后退出。
+    """
+    global _executor, _max_workers
+    workers = max_workers if max_workers else (os.cpu_count() or 1)
+    with _lock:
+        if workers == _max_workers:
+            return
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+        _max_workers = max(workers, 0)
+
+
+def get_process_pool() -> ProcessPoolExecutor | None:
+    global _executor
+    with _lock:
+        if _max_workers <= 0:
+            return None
+        if _executor is None:
+            # 使用spawn，避免在多线程的服务进程中fork
+            _executor = ProcessPoolExecutor(max_workers=_max_workers,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def shutdown_process_pool():
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+async def run_cpu_bound(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """在进程池中运行CPU密集型函数，不阻塞事件循环"""
+    executor = get_process_pool()
+    if executor is None:
+        return await asyncio.to_thread(func, *args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+
+
+def map_batched(func: Callable[..., Any], args: Iterable[tuple], batch_size: int = 64) -> Iterator:
+    """
+    按批将任务分发到进程池（未启用时在当前线程依次执行），结果按提交顺序产出。
+    参数按需从args中读取，同时驻留内存的任务数据不超过一批。
+    """
+    executor = get_process_pool()
+    batch = []
+
+    def run(items: list[tuple]):
+        if executor is None or len(items) == 1:
+            return [func(*item) for item in items]
+        return list(executor.map(func, *zip(*items)))
+
+    for item in args:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield from run(batch)
+            batch = []
+    if batch:
+        yield from run(batch)
@@ -1,8 +1,11 @@
 # SPDX-FileCopyrightText: 2025 QinHan
 # SPDX-License-Identifier: MPL-2.0
 import sys
+import threading
 from pathlib import Path
 
+import jinja2
+
 def resource_path(relative_path):
     """ 获取资源的绝对路径，适用于开发环境和 PyInstaller 打包后的环境 """
     try:
@@ -14,4 +17,35 @@ def resource_path(relative_path):
         # 或者，如果你的 static 目录总是和 app.py 在同一级（开发时）
         # base_path = Path(__file__).resolve().parent
     # print(f"base_path:{base_path}")
-    return base_path / relative_path
\ No newline at end of file
+    return base_path / relative_path
+
+# 静态资源与模板缓存，按文件修改时间失效
+_resource_text_cache: dict[Path, tuple[int, str]] = {}
+_template_cache: dict[Path, tuple[int, jinja2.Template]] = {}
+_cache_lock = threading.Lock()
+
+
+def read_resource_text(relative_path, encoding="utf-8") -> str:
+    """ 读取资源文件文本，文件未修改时直接返回缓存内容 """
+    path = resource_path(relative_path)
+    mtime = path.stat().st_mtime_ns
+    cached = _resource_text_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    text = path.read_text(encoding=encoding)
+    with _cache_lock:
+        _resource_text_cache[path] = (mtime, text)
+    return text
+
+
+def load_template(relative_path) -> jinja2.Template:
+    """ 获取编译后的jinja2模板，模板文件未修改时复用 """
+    path = resource_path(relative_path)
+    mtime = path.stat().st_mtime_ns
+    cached = _template_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    template = jinja2.Template(path.read_text(encoding="utf-8"))
+    with _cache_lock:
+        _template_cache[path] = (mtime, template)
+    return template
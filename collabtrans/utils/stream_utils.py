@@ -0,0 +1,17 @@
+# SPDX-FileCopyrightText: 2025 QinHan
+# SPDX-License-Identifier: MPL-2.0
+"""
+与具体格式无关的流式读取工具。
+"""
+import io
+from pathlib import Path
+from typing import BinaryIO
+
+
+def open_binary_source(source: bytes | str | Path | BinaryIO) -> BinaryIO:
+    """以二进制流打开内存中的内容、文件路径或已打开的流（原样返回）"""
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    if isinstance(source, (str, Path)):
+        return open(source, "rb")
+    return source
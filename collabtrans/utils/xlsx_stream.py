@@ -0,0 +1,375 @@
+# SPDX-FileCopyrightText: 2025 QinHan
+# SPDX-License-Identifier: MPL-2.0
+"""
+xlsx的流式处理：逐行扫描共享字符串表与工作表XML，不加载openpyxl工作簿。
+翻译区域只与实际存在的单元格求交，不会按整列高度展开。
+写回时只重写包含译文的工作表与共享字符串表，其余zip条目按原始压缩数据复制。
+"""
+import posixpath
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, List
+
+from lxml import etree
+from openpyxl.utils.cell import range_boundaries, column_index_from_string
+
+from collabtrans.utils.ooxml_stream import XML_SPACE, iter_elements, rewrite_part
+from collabtrans.utils.zip_utils import open_zip, copy_zip_entry_raw, new_zip_info
+
+S_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PR_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+OFFICE_DOCUMENT_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+SHARED_STRINGS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings"
+
+
+def _s(tag: str) -> str:
+    return f"{{{S_NS}}}{tag}"
+
+
+S_SHEET_DATA = _s("sheetData")
+S_ROW = _s("row")
+S_C = _s("c")
+S_V = _s("v")
+S_IS = _s("is")
+S_T = _s("t")
+S_R = _s("r")
+S_SI = _s("si")
+
+
+@dataclass
+class XlsxStreamSegments:
+    """
+    流式提取的结果。
+    refs[i] 为 texts[i] 对应的 (工作表序号, 行号, 列号, 是否为共享字符串)，行列号从1开始。
+    按共享字符串翻译时，texts 在 refs 之后依次为 string_refs 中各共享字符串条目的原文；
+    partial_strings 为同时被区域外单元格引用的条目，写回时复制为新条目，只有区域内的单元格指向译文。
+    """
+    sheets: list[tuple[str, str]] = field(default_factory=list)  # (工作表名, 部件路径)
+    shared_strings_part: str | None = None
+    shared_strings_count: int = 0
+    refs: list[tuple[int, int, int, bool]] = field(default_factory=list)
+    texts: list[str] = field(default_factory=list)
+    warnings: list[str] = field(default_factory=list)
+    string_refs: list[int] = field(default_factory=list)
+    partial_strings: set[int] = field(default_factory=set)
+    # 含有需重定向的区域内单元格的工作表序号，以及用于判断单元格是否在区域内的区域边界
+    remap_sheets: set[int] = field(default_factory=set)
+    regions: dict[str, list[tuple]] | None = None
+
+
+def _relationships(archive: zipfile.ZipFile, part: str) -> dict[str, tuple[str, str]]:
+    """读取部件的关系，返回 rId -> (类型, 目标部件路径)"""
+    directory, name = posixpath.split(part)
+    rels_path = posixpath.join(directory, "_rels", f"{name}.rels")
+    try:
+        root = etree.fromstring(archive.read(rels_path))
+    except KeyError:
+        return {}
+    result = {}
+    for rel in root.iter(f"{{{PR_NS}}}Relationship"):
+        target = rel.get("Target", "")
+        if rel.get("TargetMode") == "External":
+            continue
+        path = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(directory, target))
+        result[rel.get("Id")] = (rel.get("Type"), path)
+    return result
+
+
+def read_workbook_parts(archive: zipfile.ZipFile) -> tuple[list[tuple[str, str]], str | None]:
+    """返回按工作簿顺序排列的 (工作表名, 部件路径) 以及共享字符串表的部件路径"""
+    workbook_part = "xl/workbook.xml"
+    for rel_type, path in _relationships(archive, "").values():
+        if rel_type == OFFICE_DOCUMENT_REL:
+            workbook_part = path
+    rels = _relationships(archive, workbook_part)
+    root = etree.fromstring(archive.read(workbook_part))
+    sheets = []
+    for sheet in root.iter(_s("sheet")):
+        rel = rels.get(sheet.get(f"{{{R_NS}}}id"))
+        # 图表工作表等没有对应的工作表部件
+        if rel and rel[1] in archive.NameToInfo:
+            sheets.append((sheet.get("name"), rel[1]))
+    shared_strings = next((path for rel_type, path in rels.values() if rel_type == SHARED_STRINGS_REL), None)
+    if shared_strings not in archive.NameToInfo:
+        shared_strings = None
+    return sheets, shared_strings
+
+
+def _string_item_text(item: etree._Element) -> str:
+    """共享字符串或内联字符串的纯文本（忽略注音 rPh）"""
+    parts = []
+    for child in item:
+        if child.tag == S_T:
+            parts.append(child.text or "")
+        elif child.tag == S_R:
+            for t in child.iter(S_T):
+                parts.append(t.text or "")
+    return "".join(parts)
+
+
+def read_shared_strings(stream: BinaryIO) -> list[str]:
+    return [_string_item_text(item) for item in iter_elements(stream, S_SI)]
+
+
+def parse_regions(translate_regions: Optional[List[str]], sheet_names: list[str]
+                  ) -> tuple[dict[str, list[tuple]] | None, list[str]]:
+    """
+    将翻译区域解析为每个工作表的 (最小列, 最小行, 最大列, 最大行) 列表，None表示该方向不限。
+    未指定区域时返回None，表示翻译全部单元格。
+    """
+    if not translate_regions:
+        return None, []
+    regions: dict[str, list[tuple]] = {name: [] for name in sheet_names}
+    warnings = []
+    for region in translate_regions:
+        sheet_name, cell_range = region.split("!", 1) if "!" in region else (None, region)
+        try:
+            bounds = range_boundaries(cell_range)
+        except (ValueError, TypeError) as e:
+            for name in ([sheet_name] if sheet_name else sheet_names):
+                warnings.append(f"跳过无效的区域 '{cell_range}' 在工作表 '{name}'. 错误: {e}")
+            continue
+        for name in ([sheet_name] if sheet_name else sheet_names):
+            if name in regions:
+                regions[name].append(bounds)
+    return regions, warnings
+
+
+def _in_regions(bounds_list: list[tuple], row: int, col: int) -> bool:
+    for min_col, min_row, max_col, max_row in bounds_list:
+        if (min_col is None or col >= min_col) and (max_col is None or col <= max_col) and \
+                (min_row is None or row >= min_row) and (max_row is None or row <= max_row):
+            return True
+    return False
+
+
+def _iter_cells(row: etree._Element) -> Iterator[tuple[int, etree._Element]]:
+    """产出 (列号, 单元格)，省略 r 属性的单元格按位置推算列号"""
+    col_index = 0
+    for cell in row:
+        if cell.tag != S_C:
+            continue
+        ref = cell.get("r")
+        col_index = column_index_from_string(ref.rstrip("0123456789")) if ref else col_index + 1
+        yield col_index, cell
+
+
+def _iter_rows(units: Iterator[etree._Element]) -> Iterator[tuple[int, etree._Element]]:
+    """产出 (行号, 行元素)，省略 r 属性的行按位置推算行号"""
+    row_index = 0
+    for unit in units:
+        if unit.tag != S_ROW:
+            continue
+        ref = unit.get("r")
+        row_index = int(ref) if ref else row_index + 1
+        yield row_index, unit
+
+
+def _cell_text(cell: etree._Element, shared_strings: list[str]) -> str | None:
+    """字符串单元格的文本，非字符串单元格返回None"""
+    cell_type = cell.get("t")
+    if cell_type == "s":
+        value = cell.find(S_V)
+        if value is None or value.text is None:
+            return None
+        return shared_strings[int(value.text)]
+    if cell_type == "inlineStr":
+        item = cell.find(S_IS)
+        return _string_item_text(item) if item is not None else None
+    return None
+
+
+def extract_xlsx_stream(source: bytes | str | Path | BinaryIO, translate_regions: Optional[List[str]] = None,
+                        translate_shared_strings: bool = False) -> XlsxStreamSegments:
+    """
+    translate_shared_strings为True时，共享字符串单元格不再逐个提取，
+    而是将区域内引用到的每个共享字符串条目只提取一次。
+    """
+    segments = XlsxStreamSegments()
+    with open_zip(source) as archive:
+        segments.sheets, segments.shared_strings_part = read_workbook_parts(archive)
+        shared_strings = []
+        if segments.shared_strings_part:
+            with archive.open(segments.shared_strings_part) as stream:
+                shared_strings = read_shared_strings(stream)
+        segments.shared_strings_count = len(shared_strings)
+        regions, segments.warnings = parse_regions(translate_regions, [name for name, _ in segments.sheets])
+        segments.regions = regions
+
+        by_string = translate_shared_strings and bool(shared_strings)
+        # 每个共享字符串条目被区域内单元格引用的次数与被全部单元格引用的次数
+        in_scope_counts = [0] * len(shared_strings) if by_string else None
+        total_counts = [0] * len(shared_strings) if by_string and regions is not None else None
+        sheet_strings: dict[int, set[int]] = {}
+
+        for sheet_index, (sheet_name, part) in enumerate(segments.sheets):
+            bounds_list = regions.get(sheet_name) if regions is not None else None
+            # 按共享字符串翻译时，区域外的工作表也要扫描，以统计条目是否被区域外的单元格引用
+            if regions is not None and not bounds_list and total_counts is None:
+                continue
+            with archive.open(part) as stream:
+                for row_index, row in _iter_rows(iter_elements(stream, S_ROW)):
+                    for col_index, cell in _iter_cells(row):
+                        in_scope = regions is None or (
+                                bool(bounds_list) and _in_regions(bounds_list, row_index, col_index))
+                        if by_string and cell.get("t") == "s":
+                            value = cell.find(S_V)
+                            if value is None or value.text is None:
+                                continue
+                            string_index = int(value.text)
+                            if total_counts is not None:
+                                total_counts[string_index] += 1
+                            if in_scope:
+                                in_scope_counts[string_index] += 1
+                                sheet_strings.setdefault(sheet_index, set()).add(string_index)
+                            continue
+                        if not in_scope:
+                            continue
+                        text = _cell_text(cell, shared_strings)
+                        if text is not None:
+                            segments.refs.append((sheet_index, row_index, col_index, cell.get("t") == "s"))
+                            segments.texts.append(text)
+
+        if by_string:
+            for string_index, count in enumerate(in_scope_counts):
+                if not count:
+                    continue
+                segments.string_refs.append(string_index)
+                segments.texts.append(shared_strings[string_index])
+                if total_counts is not None and count < total_counts[string_index]:
+                    segments.partial_strings.add(string_index)
+            segments.remap_sheets = {sheet_index for sheet_index, indexes in sheet_strings.items()
+                                     if not indexes.isdisjoint(segments.partial_strings)}
+    return segments
+
+
+def _set_inline_text(cell: etree._Element, text: str):
+    for child in list(cell):
+        if child.tag in (S_IS, S_V):
+            cell.remove(child)
+    item = etree.SubElement(cell, S_IS)
+    _append_text(item, text)
+
+
+def _append_text(item: etree._Element, text: str):
+    t = etree.SubElement(item, S_T)
+    t.text = text
+    if len(text.strip()) < len(text):
+        t.set(XML_SPACE, "preserve")
+
+
+def _rewrite_sheet(stream: BinaryIO, output: BinaryIO, cell_writes: dict[tuple[int, int], str | int],
+                   string_remap: dict[int, int] | None = None, bounds_list: list[tuple] | None = None):
+    """
+    cell_writes: (行号, 列号) -> 共享字符串序号（int）或内联文本（str）
+    string_remap: 区域（bounds_list）内引用旧共享字符串序号的单元格改为引用的新序号
+    """
+    row_index = 0
+    rows = {position[0] for position in cell_writes}
+
+    def transform(unit: etree._Element):
+        nonlocal row_index
+        if unit.tag != S_ROW:
+            return
+        ref = unit.get("r")
+        row_index = int(ref) if ref else row_index + 1
+        if row_index not in rows and not string_remap:
+            return
+        for col_index, cell in _iter_cells(unit):
+            value = cell_writes.get((row_index, col_index))
+            if value is None and string_remap and cell.get("t") == "s":
+                v = cell.find(S_V)
+                if v is not None and v.text is not None and \
+                        (bounds_list is None or _in_regions(bounds_list, row_index, col_index)):
+                    value = string_remap.get(int(v.text))
+            if value is None:
+                continue
+            if isinstance(value, int):
+                cell.find(S_V).text = str(value)
+            else:
+                _set_inline_text(cell, value)
+
+    rewrite_part(stream, output, S_SHEET_DATA, transform)
+
+
+def _rewrite_shared_strings(stream: BinaryIO, output: BinaryIO, new_strings: list[str],
+                            replacements: dict[int, str] | None = None):
+    """在共享字符串表末尾追加new_strings，并将replacements中序号对应的条目原地替换为新文本"""
+    string_index = 0
+
+    def on_start(root: etree._Element):
+        if root.get("uniqueCount") is not None:
+            root.set("uniqueCount", str(int(root.get("uniqueCount")) + len(new_strings)))
+
+    def transform(unit: etree._Element):
+        nonlocal string_index
+        if unit.tag != S_SI:
+            return
+        text = replacements.get(string_index) if replacements else None
+        string_index += 1
+        if text is not None:
+            # 富文本与注音一并替换为纯文本
+            for child in list(unit):
+                unit.remove(child)
+            _append_text(unit, text)
+
+    def extra_units(nsmap: dict):
+        for text in new_strings:
+            item = etree.Element(S_SI, nsmap=nsmap)
+            _append_text(item, text)
+            yield item
+
+    rewrite_part(stream, output, None, transform, on_start=on_start, extra_units=extra_units)
+
+
+def write_xlsx_stream(source: bytes | str | Path | BinaryIO, segments: XlsxStreamSegments, final_texts: list[str],
+                      target: str | Path | BinaryIO):
+    """
+    将译文写回。共享字符串单元格指向追加到共享字符串表末尾的新条目（相同译文只追加一次），
+    内联字符串单元格直接替换文本。
+    按共享字符串翻译的条目：只被区域内单元格引用的直接原地替换；同时被区域外引用的复制为新条目，
+    区域内的单元格改为引用新条目。
+    """
+    sheet_writes: dict[str, dict[tuple[int, int], str | int]] = {}
+    new_strings: dict[str, int] = {}
+
+    def new_string_index(text: str) -> int:
+        if text not in new_strings:
+            new_strings[text] = segments.shared_strings_count + len(new_strings)
+        return new_strings[text]
+
+    for (sheet_index, row_index, col_index, shared), text in zip(segments.refs, final_texts):
+        value = new_string_index(text) if shared else text
+        sheet_writes.setdefault(segments.sheets[sheet_index][1], {})[(row_index, col_index)] = value
+
+    replacements: dict[int, str] = {}
+    string_remap: dict[int, int] = {}
+    for string_index, text in zip(segments.string_refs, final_texts[len(segments.refs):]):
+        if string_index in segments.partial_strings:
+            string_remap[string_index] = new_string_index(text)
+        else:
+            replacements[string_index] = text
+    remap_parts = {}
+    for sheet_index in (segments.remap_sheets if string_remap else ()):
+        sheet_name, part = segments.sheets[sheet_index]
+        remap_parts[part] = segments.regions.get(sheet_name) if segments.regions is not None else None
+
+    with open_zip(source) as archive:
+        with zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as output:
+            for info in archive.infolist():
+                if info.filename in sheet_writes or info.filename in remap_parts:
+                    with archive.open(info) as stream, \
+                            output.open(new_zip_info(info), "w", force_zip64=True) as out:
+                        if info.filename in remap_parts:
+                            _rewrite_sheet(stream, out, sheet_writes.get(info.filename, {}), string_remap,
+                                           remap_parts[info.filename])
+                        else:
+                            _rewrite_sheet(stream, out, sheet_writes[info.filename])
+                elif info.filename == segments.shared_strings_part and (new_strings or replacements):
+                    with archive.open(info) as stream, \
+                            output.open(new_zip_info(info), "w", force_zip64=True) as out:
+                        _rewrite_shared_strings(stream, out, list(new_strings), replacements)
+                else:
+                    copy_zip_entry_raw(archive, info, output)
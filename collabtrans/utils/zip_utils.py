@@ -0,0 +1,100 @@
+# SPDX-FileCopyrightText: 2025 QinHan
+# SPDX-License-Identifier: MPL-2.0
+"""
+zip包（docx、xlsx、epub等）重新打包的工具函数。
+未修改的条目直接复制压缩后的原始数据，不解压也不重新压缩；修改过的条目可以预先在工作进程中压缩后写入。
+"""
+import copy
+import struct
+import zipfile
+import zlib
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+
+# 本地文件头的固定长度部分，文件名长度与扩展字段长度位于第26~30字节
+_LOCAL_HEADER_SIZE = 30
+_ZIP64_EXTRA_ID = 1
+# 通用标志位第3位：压缩数据后附带数据描述符
+_FLAG_DATA_DESCRIPTOR = 0x08
+
+
+def _strip_zip64_extra(extra: bytes) -> bytes:
+    """移除扩展字段中的zip64记录，写入时会按需要重新生成"""
+    result = b""
+    i = 0
+    while i + 4 <= len(extra):
+        header_id, size = struct.unpack("<HH", extra[i:i + 4])
+        if header_id != _ZIP64_EXTRA_ID:
+            result += extra[i:i + 4 + size]
+        i += 4 + size
+    return result
+
+
+def open_zip(source: bytes | str | Path | BinaryIO) -> zipfile.ZipFile:
+    return zipfile.ZipFile(BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def _append_raw_entry(target: zipfile.ZipFile, info: zipfile.ZipInfo, chunks: Iterable[bytes]):
+    """写入本地文件头与已压缩的数据，并登记到target的中央目录。info中的大小与CRC须已确定"""
+    # 大小与CRC已知，直接写入本地文件头，不再需要数据描述符
+    info.flag_bits &= ~_FLAG_DATA_DESCRIPTOR
+    zip64 = info.file_size > zipfile.ZIP64_LIMIT or info.compress_size > zipfile.ZIP64_LIMIT
+    out = target.fp
+    info.header_offset = out.tell()
+    out.write(info.FileHeader(zip64))
+    for chunk in chunks:
+        out.write(chunk)
+    target.filelist.append(info)
+    target.NameToInfo[info.filename] = info
+    target.start_dir = out.tell()
+    target._didModify = True
+
+
+def copy_zip_entry_raw(source: zipfile.ZipFile, info: zipfile.ZipInfo, target: zipfile.ZipFile):
+    """
+    将source中的条目按原始压缩数据写入target。
+    target须以'w'或'a'模式打开，且调用期间没有其他正在写入的条目。
+    """
+    fp = source.fp
+    fp.seek(info.header_offset)
+    header = fp.read(_LOCAL_HEADER_SIZE)
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    fp.seek(info.header_offset + _LOCAL_HEADER_SIZE + name_length + extra_length)
+
+    def chunks() -> Iterator[bytes]:
+        remaining = info.compress_size
+        while remaining > 0:
+            data = fp.read(min(remaining, 1024 * 1024))
+            if not data:
+                raise zipfile.BadZipFile(f"条目 {info.filename} 的数据不完整")
+            yield data
+            remaining -= len(data)
+
+    new_info = copy.copy(info)
+    new_info.extra = _strip_zip64_extra(info.extra)
+    _append_raw_entry(target, new_info, chunks())
+
+
+def deflate_data(data: bytes) -> tuple[bytes, int, int]:
+    """按zip的deflate格式压缩，返回 (压缩数据, CRC32, 原始大小)。可在工作进程中调用，再由write_compressed_entry写入"""
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(), zlib.crc32(data), len(data)
+
+
+def write_compressed_entry(target: zipfile.ZipFile, info: zipfile.ZipInfo, compressed: tuple[bytes, int, int]):
+    """将deflate_data的结果作为info对应的条目写入target，不再重新压缩"""
+    data, crc, file_size = compressed
+    new_info = new_zip_info(info, zipfile.ZIP_DEFLATED)
+    new_info.CRC = crc
+    new_info.file_size = file_size
+    new_info.compress_size = len(data)
+    _append_raw_entry(target, new_info, (data,))
+
+
+def new_zip_info(info: zipfile.ZipInfo, compress_type: int = zipfile.ZIP_DEFLATED) -> zipfile.ZipInfo:
+    """以原条目的文件名、时间和属性创建用于写入新内容的条目信息"""
+    new_info = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    new_info.external_attr = info.external_attr
+    new_info.compress_type = compress_type
+    return new_info
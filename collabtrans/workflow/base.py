@@ -1,7 +1,7 @@
 # SPDX-FileCopyrightText: 2025 QinHan
 # SPDX-License-Identifier: MPL-2.0
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from logging import Logger
 from pathlib import Path
 from typing import Self, Generic, TypeVar
@@ -40,6 +40,28 @@ class Workflow(ABC, Generic[T_Config, T_original, T_Translated]):
         self.document_original = document
         return self
 
+    async def prepare_async(self) -> Self:
+        """
+        翻译前可以在多个目标语言间共用的准备工作（如文档解析），默认无操作。
+        多语言翻译时先调用一次，再通过 fork_for_language 创建其余语言的工作流。
+        """
+        return self
+
+    def fork_for_language(self, to_lang: str, **translator_overrides) -> Self:
+        """
+        创建翻译到另一目标语言的工作流：共用原文档与 prepare_async 的结果，
+        翻译器的目标语言（及translator_overrides中的配置）不同，译文与附件相互独立。
+        """
+        translator_config = self.config.translator_config
+        glossary_agent_config = translator_config.glossary_agent_config
+        if glossary_agent_config is not None:
+            glossary_agent_config = replace(glossary_agent_config, to_lang=to_lang)
+        translator_config = replace(translator_config, to_lang=to_lang, glossary_agent_config=glossary_agent_config,
+                                    **translator_overrides)
+        workflow = type(self)(config=replace(self.config, translator_config=translator_config))
+        workflow.document_original = self.document_original
+        return workflow
+
     @abstractmethod
     def translate(self, *args, **kwargs) -> Self:
         ...
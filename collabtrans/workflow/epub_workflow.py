@@ -1,8 +1,8 @@
 # SPDX-FileCopyrightText: 2025 QinHan
 # SPDX-License-Identifier: MPL-2.0
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Self
+from typing import BinaryIO, Self
 
 from collabtrans.exporter.base import ExporterConfig
 from collabtrans.exporter.epub.epub2epub_exporter import Epub2EpubExporter
@@ -12,7 +12,7 @@ from collabtrans.glossary.glossary import Glossary
 from collabtrans.ir.document import Document
 from collabtrans.translator.ai_translator.epub_translator import EpubTranslatorConfig, EpubTranslator
 from collabtrans.workflow.base import Workflow, WorkflowConfig
-from collabtrans.workflow.interfaces import HTMLExportable, EpubExportable
+from collabtrans.workflow.interfaces import HTMLExportable, EpubExportable, PagedHTMLExportable
 
 
 @dataclass(kw_only=True)
@@ -22,7 +22,7 @@ class EpubWorkflowConfig(WorkflowConfig):
 
 
 class EpubWorkflow(Workflow[EpubWorkflowConfig, Document, Document], HTMLExportable[Epub2HTMLExporterConfig],
-                   EpubExportable[ExporterConfig]):
+                   PagedHTMLExportable[Epub2HTMLExporterConfig], EpubExportable[ExporterConfig]):
     def __init__(self, config: EpubWorkflowConfig):
         super().__init__(config=config)
         if config.logger:
@@ -57,6 +57,24 @@ class EpubWorkflow(Workflow[EpubWorkflowConfig, Document, Document], HTMLExporta
         docu = self._export(Epub2HTMLExporter(config))
         return docu.content.decode()
 
+    def _paged_exporter(self, config: Epub2HTMLExporterConfig | None) -> Epub2HTMLExporter:
+        if self.document_translated is None:
+            raise RuntimeError("Document has not been translated yet. Call translate() first.")
+        return Epub2HTMLExporter(replace(config or self.config.html_exporter_config, paginate=True))
+
+    def export_to_paged_html(self, config: Epub2HTMLExporterConfig = None) -> str:
+        docu = self._export(self._paged_exporter(config))
+        return docu.content.decode()
+
+    def write_paged_html(self, output: BinaryIO, config: Epub2HTMLExporterConfig = None) -> None:
+        self._paged_exporter(config).write_index(self.document_translated, output)
+
+    def write_html_chapter(self, index: int, output: BinaryIO, config: Epub2HTMLExporterConfig = None) -> None:
+        self._paged_exporter(config).write_chapter(self.document_translated, index, output)
+
+    def read_html_resource(self, path: str) -> bytes | None:
+        return self._paged_exporter(None).read_resource(self.document_translated, path)
+
     def export_to_epub(self, _: ExporterConfig | None = None) -> bytes:
         docu = self._export(Epub2EpubExporter())
         return docu.content
@@ -0,0 +1,71 @@
+# SPDX-FileCopyrightText: 2025 QinHan
+# SPDX-License-Identifier: MPL-2.0
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Self
+
+from collabtrans.exporter.base import ExporterConfig
+from collabtrans.exporter.html.html2htmlzip_exporter import Html2HtmlZipExporter
+from collabtrans.glossary.glossary import Glossary
+
+from collabtrans.ir.document import Document
+from collabtrans.translator.ai_translator.html_site_translator import HtmlSiteTranslatorConfig, HtmlSiteTranslator
+from collabtrans.workflow.base import Workflow, WorkflowConfig
+from collabtrans.workflow.interfaces import HtmlZipExportable
+
+
+@dataclass(kw_only=True)
+class HtmlSiteWorkflowConfig(WorkflowConfig):
+    translator_config: HtmlSiteTranslatorConfig
+
+
+class HtmlSiteWorkflow(Workflow[HtmlSiteWorkflowConfig, Document, Document], HtmlZipExportable[ExporterConfig]):
+    """翻译打包为zip的多页面HTML站点，输出保持原有目录结构的zip"""
+
+    def __init__(self, config: HtmlSiteWorkflowConfig):
+        super().__init__(config=config)
+        if config.logger:
+            for sub_config in [self.config.translator_config]:
+                if sub_config:
+                    sub_config.logger = config.logger
+
+    def _pre_translate(self, document_original: Document):
+        document = document_original.copy()
+        translate_config = self.config.translator_config
+        translator = HtmlSiteTranslator(translate_config)
+        return document, translator
+
+    def translate(self) -> Self:
+        document, translator = self._pre_translate(self.document_original)
+        translator.translate(document)
+        if translator.glossary_dict_gen:
+            self.attachment.add_document("glossary", Glossary.glossary_dict2csv(translator.glossary_dict_gen))
+        self.document_translated = document
+        return self
+
+    async def translate_async(self) -> Self:
+        document, translator = self._pre_translate(self.document_original)
+        await translator.translate_async(document)
+        if translator.glossary_dict_gen:
+            self.attachment.add_document("glossary", Glossary.glossary_dict2csv(translator.glossary_dict_gen))
+        self.document_translated = document
+        return self
+
+    def export_to_html_zip(self, _: ExporterConfig | None = None) -> bytes:
+        docu = self._export(Html2HtmlZipExporter())
+        return docu.content
+
+    def write_html_zip(self, output: BinaryIO, _: ExporterConfig | None = None) -> None:
+        docu = self._export(Html2HtmlZipExporter())
+        if docu.is_file_backed:
+            # 以文件引用保存的译文站点按块复制，不读入内存
+            with open(docu.path, "rb") as f:
+                shutil.copyfileobj(f, output)
+        else:
+            output.write(docu.content)
+
+    def save_as_html_zip(self, name: str = None, output_dir: Path | str = "./output",
+                         _: ExporterConfig | None = None) -> Self:
+        self._save(exporter=Html2HtmlZipExporter(), name=name, output_dir=output_dir)
+        return self
@@ -1,7 +1,7 @@
 # SPDX-FileCopyrightText: 2025 QinHan
 # SPDX-License-Identifier: MPL-2.0
 from pathlib import Path
-from typing import Protocol, Self, TypeVar, runtime_checkable
+from typing import BinaryIO, Protocol, Self, TypeVar, runtime_checkable
 
 from collabtrans.exporter.base import ExporterConfig
 
@@ -17,6 +17,23 @@ class HTMLExportable(Protocol[T_ExporterConfig]):
         ...
 
 
+@runtime_checkable
+class PagedHTMLExportable(Protocol[T_ExporterConfig]):
+    """分章节导出HTML：索引页与章节片段分别流式写出，资源按需读取"""
+
+    def export_to_paged_html(self, config: T_ExporterConfig | None = None) -> str:
+        ...
+
+    def write_paged_html(self, output: BinaryIO, config: T_ExporterConfig | None = None) -> None:
+        ...
+
+    def write_html_chapter(self, index: int, output: BinaryIO, config: T_ExporterConfig | None = None) -> None:
+        ...
+
+    def read_html_resource(self, path: str) -> bytes | None:
+        ...
+
+
 @runtime_checkable
 class MDExportable(Protocol[T_ExporterConfig]):
 
@@ -33,6 +50,9 @@ class MDZIPExportable(Protocol[T_ExporterConfig]):
     def export_to_markdown_zip(self, config: T_ExporterConfig | None = None) -> bytes:
         ...
 
+    def write_markdown_zip(self, output: BinaryIO, config: T_ExporterConfig | None = None) -> None:
+        ...
+
     def save_as_markdown_zip(self, name: str, output_dir: Path | str, config: T_ExporterConfig | None = None) -> Self:
         ...
 
@@ -96,6 +116,18 @@ class SrtExportable(Protocol[T_ExporterConfig]):
         ...
 
 
+@runtime_checkable
+class HtmlZipExportable(Protocol[T_ExporterConfig]):
+    def export_to_html_zip(self, config: T_ExporterConfig | None = None) -> bytes:
+        ...
+
+    def write_html_zip(self, output: BinaryIO, config: T_ExporterConfig | None = None) -> None:
+        ...
+
+    def save_as_html_zip(self, name: str, output_dir: Path | str, config: T_ExporterConfig | None = None) -> Self:
+        ...
+
+
 @runtime_checkable
 class EpubExportable(Protocol[T_ExporterConfig]):
     def export_to_epub(self, config: T_ExporterConfig | None = None) -> bytes:
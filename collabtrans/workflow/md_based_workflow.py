@@ -3,7 +3,7 @@
 import asyncio
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Self, Tuple, Type
+from typing import BinaryIO, Self, Tuple, Type
 
 from collabtrans.cacher import md_based_convert_cacher
 from collabtrans.exporter.base import ExporterConfig
@@ -23,7 +23,10 @@ from collabtrans.exporter.md.md2mdzip_exporter import MD2MDZipExporter
 from collabtrans.exporter.md.types import ConvertEngineType
 from collabtrans.workflow.base import Workflow, WorkflowConfig
 from collabtrans.workflow.interfaces import MDFormatsExportable, HTMLExportable
-from collabtrans.translator.ai_translator.md_translator import MDTranslatorConfig, MDTranslator
+from collabtrans.translator.ai_translator.md_translator import MDTranslatorConfig, MDTranslator, \
+    mask_and_split_markdown
+from collabtrans.utils.markdown_splitter import join_markdown_parts
+from collabtrans.utils.process_pool import run_cpu_bound
 
 
 @dataclass(kw_only=True)
@@ -32,6 +35,8 @@ class MarkdownBasedWorkflowConfig(WorkflowConfig):
     converter_config: X2MarkdownConverterConfig | None
     translator_config: MDTranslatorConfig
     html_exporter_config: MD2HTMLExporterConfig
+    # 流水线模式：解析引擎分段产出markdown时，边解析边翻译（仅异步翻译有效）
+    stream_translate: bool = False
 
 
 class MarkdownBasedWorkflow(Workflow[MarkdownBasedWorkflowConfig, Document, MarkdownDocument],
@@ -53,8 +58,12 @@ class MarkdownBasedWorkflow(Workflow[MarkdownBasedWorkflowConfig, Document, Mark
                                self.config.html_exporter_config]:
                 if sub_config:
                     sub_config.logger = config.logger
+        # prepare_async 的解析结果，多个目标语言的工作流共用
+        self.document_converted: MarkdownDocument | None = None
+        # document_converted 遮罩并分块的结果 (分块, 占位符映射)，同样由各语言共用
+        self.document_segmented: tuple[list[str], dict[str, str]] | None = None
 
-    def _get_document_md(self, convert_engin: ConvertEngineType, convert_config: X2MarkdownConverterConfig):
+    def _get_cached_document_md(self, convert_engin: ConvertEngineType, convert_config: X2MarkdownConverterConfig):
         if self.document_original is None:
             raise RuntimeError("File has not been read yet. Call read_path or read_bytes first.")
 
@@ -63,9 +72,9 @@ class MarkdownBasedWorkflow(Workflow[MarkdownBasedWorkflowConfig, Document, Mark
                                                                     convert_config)
         if document_cached:
             self.attachment.add_document("md_cached",document_cached)
-            return document_cached
+        return document_cached
 
-        # 未缓存则解析文件
+    def _create_converter(self, convert_engin: ConvertEngineType, convert_config: X2MarkdownConverterConfig):
         if convert_engin in self._converter_factory:
             converter_class, config_class = self._converter_factory[convert_engin]
             if config_class and not isinstance(convert_config, config_class):
@@ -74,13 +83,52 @@ class MarkdownBasedWorkflow(Workflow[MarkdownBasedWorkflowConfig, Document, Mark
             converter = converter_class(convert_config)
         else:
             raise ValueError(f"不存在{convert_engin}解析引擎")
-        document_md = converter.convert(self.document_original)
+        return converter
+
+    def _collect_converter_result(self, converter, document_md: MarkdownDocument, convert_engin: ConvertEngineType,
+                                  convert_config: X2MarkdownConverterConfig):
         if hasattr(converter,"attachments"):
             for attachment in converter.attachments:
                 self.attachment.add_attachment(attachment)
         # 获取缓存解析后文件
         md_based_convert_cacher.cache_result(document_md, self.document_original, convert_engin, convert_config)
 
+    def _get_document_md(self, convert_engin: ConvertEngineType, convert_config: X2MarkdownConverterConfig):
+        if self.document_converted is not None:
+            # 翻译器原地替换文档内容，使用副本
+            return self.document_converted.copy()
+        document_cached = self._get_cached_document_md(convert_engin, convert_config)
+        if document_cached:
+            return document_cached
+
+        # 未缓存则解析文件
+        converter = self._create_converter(convert_engin, convert_config)
+        document_md = converter.convert(self.document_original)
+        self._collect_converter_result(converter, document_md, convert_engin, convert_config)
+        return document_md
+
+    async def _translate_stream_async(self, convert_engin: ConvertEngineType,
+                                      convert_config: X2MarkdownConverterConfig,
+                                      translator: MDTranslator) -> MarkdownDocument:
+        """边解析边翻译，解析结果拼接后仍写入缓存；已有缓存时按常规方式翻译"""
+        document_cached = self._get_cached_document_md(convert_engin, convert_config)
+        if document_cached:
+            await translator.translate_async(document_cached)
+            return document_cached
+
+        converter = self._create_converter(convert_engin, convert_config)
+        parts: list[str] = []
+
+        async def source():
+            async for part in converter.convert_stream_async(self.document_original):
+                parts.append(part)
+                yield part
+
+        document_md = MarkdownDocument.from_bytes(content=b"", suffix=".md", stem=self.document_original.stem)
+        await translator.translate_stream_async(source(), document_md)
+        document_converted = MarkdownDocument.from_bytes(content=(join_markdown_parts(parts) + "\n").encode(),
+                                                         suffix=".md", stem=self.document_original.stem)
+        self._collect_converter_result(converter, document_converted, convert_engin, convert_config)
         return document_md
 
     def _pre_translate(self, document: Document):
@@ -90,6 +138,22 @@ class MarkdownBasedWorkflow(Workflow[MarkdownBasedWorkflowConfig, Document, Mark
         translator = MDTranslator(translator_config)
         return convert_engine, convert_config, translator_config, translator
 
+    async def prepare_async(self) -> Self:
+        """解析原文档并遮罩、分块，保存结果，多语言翻译时解析（及MinerU等的额度）与分块只进行一次"""
+        convert_engine: ConvertEngineType = "identity" if self.document_original.suffix == ".md" \
+            else self.convert_engine
+        self.document_converted = await asyncio.to_thread(self._get_document_md, convert_engine,
+                                                          self.config.converter_config)
+        self.document_segmented = await run_cpu_bound(mask_and_split_markdown, self.document_converted.content,
+                                                      self.config.translator_config.chunk_size)
+        return self
+
+    def fork_for_language(self, to_lang: str, **translator_overrides) -> Self:
+        workflow = super().fork_for_language(to_lang, **translator_overrides)
+        workflow.document_converted = self.document_converted
+        workflow.document_segmented = self.document_segmented
+        return workflow
+
     def translate(self) -> Self:
         convert_engine, convert_config, translator_config, translator = self._pre_translate(self.document_original)
         document_md = self._get_document_md(convert_engine, convert_config)
@@ -101,8 +165,11 @@ class MarkdownBasedWorkflow(Workflow[MarkdownBasedWorkflowConfig, Document, Mark
 
     async def translate_async(self) -> Self:
         convert_engine, convert_config, translator_config, translator = self._pre_translate(self.document_original)
-        document_md = await asyncio.to_thread(self._get_document_md, convert_engine, convert_config)
-        await translator.translate_async(document_md)
+        if self.config.stream_translate and convert_engine != "identity" and self.document_converted is None:
+            document_md = await self._translate_stream_async(convert_engine, convert_config, translator)
+        else:
+            document_md = await asyncio.to_thread(self._get_document_md, convert_engine, convert_config)
+            await translator.translate_async(document_md, self.document_segmented)
         if translator.glossary_dict_gen:
             self.attachment.add_document("glossary", Glossary.glossary_dict2csv(translator.glossary_dict_gen))
         self.document_translated = document_md
@@ -121,6 +188,9 @@ class MarkdownBasedWorkflow(Workflow[MarkdownBasedWorkflowConfig, Document, Mark
         docu = self._export(MD2MDZipExporter())
         return docu.content
 
+    def write_markdown_zip(self, output: BinaryIO, _: ExporterConfig | None = None) -> None:
+        MD2MDZipExporter().write(self.document_translated, output)
+
     def save_as_html(self, name: str = None, output_dir: Path | str = "./output",
                      config: MD2HTMLExporterConfig | None = None) -> Self:
         config = config or self.config.html_exporter_config
@@ -135,6 +205,11 @@ class MarkdownBasedWorkflow(Workflow[MarkdownBasedWorkflowConfig, Document, Mark
 
     def save_as_markdown_zip(self, name: str = None, output_dir: Path | str = "./output",
                              _: ExporterConfig | None = None) -> Self:
-
-        self._save(exporter=MD2MDZipExporter(), name=name, output_dir=output_dir)
+        if self.document_translated is None:
+            raise RuntimeError("Document has not been translated yet. Call translate() first.")
+        output_path = Path(output_dir) / Path(name or f"{self.document_translated.stem}.zip")
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        # 直接写入目标文件，不在内存中生成整个zip
+        MD2MDZipExporter().write(self.document_translated, output_path)
+        self.logger.info(f"文件已保存到{output_path.resolve()}")
         return self
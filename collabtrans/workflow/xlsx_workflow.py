@@ -1,20 +1,22 @@
 # SPDX-FileCopyrightText: 2025 QinHan
 # SPDX-License-Identifier: MPL-2.0
 import asyncio
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from pathlib import Path
-from typing import Self
+from typing import Self, Literal
 
 from collabtrans.converter.base import ConverterConfig
 from collabtrans.converter.converter_identity import ConverterIdentity
 from collabtrans.converter.x2xlsx.base import X2XlsxConverter
 from collabtrans.converter.x2xlsx.converter_csv2xlsx import ConverterCsv2Xlsx, ConverterCsv2XlsxConfig
-from collabtrans.exporter.base import ExporterConfig
+from collabtrans.exporter.base import ExporterConfig, Exporter
 from collabtrans.exporter.xlsx.xlsx2csv_exporter import Xlsx2CsvExporter
 from collabtrans.exporter.xlsx.xlsx2html_exporter import Xlsx2HTMLExporterConfig, Xlsx2HTMLExporter
 from collabtrans.exporter.xlsx.xlsx2xlsx_exporter import Xlsx2XlsxExporter
 from collabtrans.glossary.glossary import Glossary
 from collabtrans.ir.document import Document
+from collabtrans.translator.ai_translator.base import AiTranslatorConfig
+from collabtrans.translator.ai_translator.csv_translator import CsvTranslatorConfig, CsvTranslator
 from collabtrans.translator.ai_translator.xlsx_translator import XlsxTranslatorConfig, XlsxTranslator
 from collabtrans.workflow.base import Workflow, WorkflowConfig
 from collabtrans.workflow.interfaces import HTMLExportable, XlsxExportable, CsvExportable
@@ -24,6 +26,9 @@ from collabtrans.workflow.interfaces import HTMLExportable, XlsxExportable, CsvE
 class XlsxWorkflowConfig(WorkflowConfig):
     translator_config: XlsxTranslatorConfig
     html_exporter_config: Xlsx2HTMLExporterConfig
+    # csv的翻译方式：native 流式逐行翻译csv，按列选择翻译区域（translate_regions只取列范围）；
+    # xlsx 先转换为xlsx再翻译
+    csv_engine: Literal["native", "xlsx"] = "native"
 
 
 class XlsxWorkflow(Workflow[XlsxWorkflowConfig, Document, Document], HTMLExportable[Xlsx2HTMLExporterConfig],
@@ -52,6 +57,19 @@ class XlsxWorkflow(Workflow[XlsxWorkflowConfig, Document, Document], HTMLExporta
 
         return converter.convert(document)
 
+    def _use_native_csv(self) -> bool:
+        return self.document_original.suffix == ".csv" and self.config.csv_engine == "native"
+
+    def _csv_translator(self) -> CsvTranslator:
+        xlsx_config = self.config.translator_config
+        translator_args = {f.name: getattr(xlsx_config, f.name) for f in fields(AiTranslatorConfig)}
+        return CsvTranslator(CsvTranslatorConfig(
+            **translator_args,
+            insert_mode=xlsx_config.insert_mode,
+            separator=xlsx_config.separator,
+            translate_columns=xlsx_config.translate_regions
+        ))
+
     def _pre_translate(self, document_pre_translate: Document):
         document = document_pre_translate.copy()
         translate_config = self.config.translator_config
@@ -59,8 +77,11 @@ class XlsxWorkflow(Workflow[XlsxWorkflowConfig, Document, Document], HTMLExporta
         return document, translator
 
     def translate(self) -> Self:
-        document_xlsx = self._get_document_xlsx(self.document_original)
-        document, translator = self._pre_translate(document_xlsx)
+        if self._use_native_csv():
+            document, translator = self.document_original.copy(), self._csv_translator()
+        else:
+            document_xlsx = self._get_document_xlsx(self.document_original)
+            document, translator = self._pre_translate(document_xlsx)
         translator.translate(document)
         if translator.glossary_dict_gen:
             self.attachment.add_document("glossary", Glossary.glossary_dict2csv(translator.glossary_dict_gen))
@@ -68,14 +89,26 @@ class XlsxWorkflow(Workflow[XlsxWorkflowConfig, Document, Document], HTMLExporta
         return self
 
     async def translate_async(self) -> Self:
-        document_xlsx = await asyncio.to_thread(self._get_document_xlsx, self.document_original)
-        document, translator = self._pre_translate(document_xlsx)
+        if self._use_native_csv():
+            document, translator = self.document_original.copy(), self._csv_translator()
+        else:
+            document_xlsx = await asyncio.to_thread(self._get_document_xlsx, self.document_original)
+            document, translator = self._pre_translate(document_xlsx)
         await translator.translate_async(document)
         if translator.glossary_dict_gen:
             self.attachment.add_document("glossary", Glossary.glossary_dict2csv(translator.glossary_dict_gen))
         self.document_translated = document
         return self
 
+    def _export(self, exporter: Exporter) -> Document:
+        document = self.document_translated
+        if document is None or document.suffix != ".csv":
+            return super()._export(exporter)
+        # csv原生翻译的结果：导出csv时直接使用，导出其他格式时才转换为xlsx
+        if isinstance(exporter, Xlsx2CsvExporter):
+            return document.copy()
+        return exporter.export(self._get_document_xlsx(document))
+
     def export_to_html(self, config: Xlsx2HTMLExporterConfig = None) -> str:
         config = config or self.config.html_exporter_config
         docu = self._export(Xlsx2HTMLExporter(config))
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+测试CSV流式翻译：窗口写出时使用的译文不受缓存淘汰影响
+"""
+
+import asyncio
+
+from collabtrans.ir.document import Document
+from collabtrans.translator.ai_translator.csv_translator import CsvTranslator, CsvTranslatorConfig
+
+
+class UpperCaseAgent:
+    """以大写代替翻译结果的翻译Agent"""
+
+    def send_segments(self, segments, chunk_size):
+        return [segment.upper() for segment in segments]
+
+    async def send_segments_async(self, segments, chunk_size):
+        return self.send_segments(segments, chunk_size)
+
+
+def _translate(content: bytes, run_async: bool, **config) -> str:
+    translator = CsvTranslator(CsvTranslatorConfig(skip_translate=True, **config))
+    translator.translate_agent = UpperCaseAgent()
+    document = Document.from_bytes(content=content, suffix=".csv", stem="test")
+    if run_async:
+        asyncio.run(translator.translate_async(document))
+    else:
+        translator.translate(document)
+    return document.content.decode("utf-8")
+
+
+def test_cache_eviction_keeps_window_translations():
+    """当前窗口用到的已缓存译文在写出前被淘汰时，仍应写出译文而不是原文"""
+    content = b"alpha\nbeta\ngamma\nalpha\ndelta\n"
+    for run_async in (False, True):
+        result = _translate(content, run_async, window_rows=3, cache_size=3)
+        assert result.split() == ["ALPHA", "BETA", "GAMMA", "ALPHA", "DELTA"], result
+
+
+def test_repeated_values_translated_once():
+    """跨窗口重复出现的值只翻译一次"""
+    content = b"alpha\nbeta\nalpha\nbeta\n"
+    translator = CsvTranslator(CsvTranslatorConfig(skip_translate=True, window_rows=2))
+    agent = UpperCaseAgent()
+    calls = []
+    translator.translate_agent = agent
+    original = agent.send_segments
+    agent.send_segments = lambda segments, chunk_size: calls.append(list(segments)) or original(segments, chunk_size)
+    document = Document.from_bytes(content=content, suffix=".csv", stem="test")
+    translator.translate(document)
+    assert document.content.decode("utf-8").split() == ["ALPHA", "BETA", "ALPHA", "BETA"]
+    assert calls == [["alpha", "beta"]]
+
+
+if __name__ == "__main__":
+    test_cache_eviction_keeps_window_translations()
+    test_repeated_values_translated_once()
+    print("✅ CSV流式翻译测试通过")